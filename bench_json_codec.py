@@ -0,0 +1,110 @@
+"""Microbenchmark for the courtroom WebSocket JSON codec.
+
+Compares stdlib json against the active codec (orjson when installed) on update_room
+frames, which carry the whole user list, plus outbound message frames.
+
+Usage:
+    python bench_json_codec.py                     # synthetic rooms of 10/50/200 users
+    python bench_json_codec.py --frames frames.txt # recorded frames, one per line
+"""
+import argparse
+import json
+import random
+import string
+import timeit
+
+import courtroom_protocol
+from courtroom_protocol import JSON_BACKEND, decode_socketio_frame, encode_event
+
+_stdlib_decoder = json.JSONDecoder()
+
+
+def stdlib_decode(frame):
+    """Baseline: the pre-codec decode path (stdlib raw_decode from the JSON array)"""
+    payload, _ = _stdlib_decoder.raw_decode(frame, frame.index('['))
+    return payload
+
+
+def stdlib_encode(event, *args):
+    return '42' + json.dumps([event, *args])
+
+
+def make_update_room_frame(user_count):
+    """Build an update_room frame shaped like the ones objection.lol sends"""
+    rng = random.Random(user_count)
+    users = []
+    for i in range(user_count):
+        name = ''.join(rng.choices(string.ascii_letters + string.digits, k=rng.randint(4, 16)))
+        users.append({
+            'id': f"{rng.getrandbits(64):016x}-{i:04d}",
+            'username': name,
+            'isSpectator': rng.random() < 0.3,
+            'isMod': rng.random() < 0.1,
+            'characterId': rng.randint(1, 500),
+            'poseId': rng.randint(1, 5000),
+        })
+    room = {
+        'id': 'benchroom',
+        'title': 'Benchmark Courtroom',
+        'users': users,
+        'mods': [u['id'] for u in users if u['isMod']],
+        'owner': users[0]['id'] if users else None,
+        'aspectRatio': '16:9',
+        'enableSpectating': True,
+        'slowModeDelay': 0,
+        'textBoxAppearance': 'default',
+        'evidence': [{'id': n, 'name': f"Evidence {n}", 'url': f"https://example.com/{n}.png"} for n in range(20)],
+    }
+    return '42' + json.dumps(['update_room', room])
+
+
+def make_message_args():
+    return ('message', {
+        'character': {'characterId': 408, 'poseId': 4412},
+        'message': {'text': "[#ts5] 💬 Relay test message with some unicode: ¡Objeción! " * 2},
+        'settings': {'textSpeed': 35},
+    })
+
+
+def bench(func, arg, number):
+    best = min(timeit.repeat(lambda: func(*arg), number=number, repeat=5))
+    return best / number * 1e6  # µs per call
+
+
+def report(label, frames, number):
+    stdlib_us = sum(bench(stdlib_decode, (f,), number) for f in frames) / len(frames)
+    codec_us = sum(bench(decode_socketio_frame, (f,), number) for f in frames) / len(frames)
+    size = sum(len(f) for f in frames) / len(frames)
+    print(f"{label:<24} {size:>9.0f} B  json {stdlib_us:>9.1f} µs  {JSON_BACKEND} {codec_us:>9.1f} µs"
+          f"  x{stdlib_us / codec_us:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', help="file of recorded 42[...] frames, one per line")
+    parser.add_argument('--number', type=int, default=200, help="calls per timing run")
+    args = parser.parse_args()
+
+    print(f"Active codec: {JSON_BACKEND} ({courtroom_protocol.__file__})")
+    print("Decode (update_room frames):")
+    if args.frames:
+        with open(args.frames, 'r', encoding='utf-8') as f:
+            frames = [line.rstrip('\n') for line in f if line.startswith('42["update_room"')]
+        if not frames:
+            print("No update_room frames found in", args.frames)
+            return
+        report(f"recorded ({len(frames)} frames)", frames, args.number)
+    else:
+        for user_count in (10, 50, 200):
+            report(f"{user_count} users", [make_update_room_frame(user_count)], args.number)
+
+    message_args = make_message_args()
+    stdlib_us = bench(stdlib_encode, message_args, args.number * 10)
+    codec_us = bench(encode_event, message_args, args.number * 10)
+    print("Encode (message frame):")
+    print(f"{'message':<24} {len(encode_event(*message_args)):>9} B  json {stdlib_us:>9.1f} µs  "
+          f"{JSON_BACKEND} {codec_us:>9.1f} µs  x{stdlib_us / codec_us:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,20 @@
 import websockets
 import asyncio
+import cProfile
+import io
+import pstats
 import threading
+import tracemalloc
 import queue
 import discord
 from discord import app_commands
 from discord.ext import commands
+import copy
 import json
+import logging
+import logging.handlers
 import os
+import sqlite3
 import aioconsole
 import sys
 import aiohttp
@@ -14,19 +22,34 @@ import re
 import signal
 import time
 import random
+import uuid
+from collections import deque
 from datetime import datetime, timezone
 import re
+from courtroom_protocol import BoundedExecutor, CourtroomProtocolClient, RoomState, encode_event
+from relay_metrics import loop_monitor, metrics, start_metrics_server
 
-# Nickname storage file
+try:
+    import re2  # Linear-time regex engine (google-re2); regex autobans are disabled without it
+except ImportError:
+    re2 = None
+
+# User preference database (nicknames, colors, characters, ping nicknames, autoban patterns)
+PREFS_DB_FILE = '/app/data/preferences.db'
+# Legacy JSON preference files - imported into PREFS_DB_FILE on first start
 NICKNAME_FILE = '/app/data/nicknames.json'
-# Color storage file
 COLOR_FILE = '/app/data/colors.json'
-# Character/Pose storage file
 CHARACTER_FILE = '/app/data/characters.json'
-# Autoban patterns storage file
 AUTOBAN_FILE = '/app/data/autobans.json'
-# Ping nickname storage file (for courtroom users to ping Discord users)
 PING_NICKNAME_FILE = '/app/data/ping_nicknames.json'
+# Durable Discord->Courtroom outbox (append-only log of pending relay messages)
+OUTBOX_FILE = '/app/data/outbox.jsonl'
+# Last known room state (users, mods, bans) used as provisional state after a restart
+ROOM_SNAPSHOT_FILE = '/app/data/room_snapshot.json'
+# Sampled per-message relay trace spans (rotated; see RelayTracer)
+TRACE_FILE = '/app/data/relay_trace.jsonl'
+# Reports from the terminal 'profile' and 'mem' commands
+DIAGNOSTICS_DIR = '/app/data'
 
 # Predefined color options for easy access
 PRESET_COLORS = {
@@ -61,190 +84,898 @@ PRESET_TEXTBOXES = {
     'blue-archive': 'f4b2811d-9c67-496b-a962-e69a5173a408'
 }
 
-def load_nicknames():
-    if os.path.exists(NICKNAME_FILE):
+class PreferenceStore:
+    """SQLite (WAL) store for user preferences.
+    
+    Each preference kind ('nicknames', 'colors', 'characters', 'ping_nicknames', 'autobans')
+    is a set of key -> JSON value rows, changed with row-level upserts/deletes. Callers keep
+    the loaded dicts as their in-memory cache, so reads never touch the database.
+    
+    Writes are write-behind: put/delete/clear only record the change (later changes to the
+    same row replace earlier ones) and a debounced flush commits them in one transaction on
+    a worker thread, so slow storage never blocks the event loop. close() flushes the rest.
+    """
+    # kind -> legacy JSON file imported on first start
+    LEGACY_FILES = {
+        'nicknames': NICKNAME_FILE,
+        'colors': COLOR_FILE,
+        'characters': CHARACTER_FILE,
+        'ping_nicknames': PING_NICKNAME_FILE,
+        'autobans': AUTOBAN_FILE,
+    }
+    
+    def __init__(self, path=PREFS_DB_FILE, write_delay=1.0):
+        self.path = path
+        self.write_delay = write_delay  # Seconds to coalesce changes before committing
+        self._pending = {}  # (kind, key) -> JSON value, or None for a delete
+        self._cleared = set()  # Kinds to wipe before applying _pending
+        self._flush_task = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared between the event loop and writer threads, serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS prefs ("
+                "kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (kind, key))"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._migrate_json_files()
+    
+    def _migrate_json_files(self):
+        """Import the legacy JSON files once, then rename them to *.migrated"""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return
+            migrated = []
+            self._conn.execute("BEGIN")
+            try:
+                for kind, path in self.LEGACY_FILES.items():
+                    if not os.path.exists(path):
+                        continue
+                    try:
+                        with open(path, 'r') as f:
+                            data = json.load(f)
+                    except Exception as e:
+                        print(f"❌ Error reading {path} for migration: {e}")
+                        continue
+                    # Autobans are a list of patterns; everything else is {discord_user_id: value}
+                    rows = [(kind, pattern, 'null') for pattern in data] if kind == 'autobans' else \
+                           [(kind, str(key), json.dumps(value)) for key, value in data.items()]
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO prefs (kind, key, value) VALUES (?, ?, ?)", rows)
+                    migrated.append((path, len(rows)))
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(time.time()),))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        for path, count in migrated:
+            print(f"📦 Migrated {count} entries from {path} into {self.path}")
+            try:
+                os.replace(path, path + '.migrated')
+            except OSError as e:
+                print(f"⚠️ Could not rename {path}: {e}")
+    
+    def load(self, kind):
+        """All rows of a kind as {key: value}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM prefs WHERE kind = ? ORDER BY rowid", (kind,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+    
+    def load_list(self, kind):
+        """Keys of a kind in insertion order (used for list-shaped kinds like autobans)"""
+        return list(self.load(kind))
+    
+    def put(self, kind, key, value=None):
+        """Insert or update one row"""
+        self._pending[(kind, key)] = json.dumps(value)
+        self._schedule_flush()
+    
+    def delete(self, kind, key):
+        self._pending[(kind, key)] = None
+        self._schedule_flush()
+    
+    def clear(self, kind):
+        """Delete every row of a kind (changes queued after this still apply)"""
+        self._pending = {row: value for row, value in self._pending.items() if row[0] != kind}
+        self._cleared.add(kind)
+        self._schedule_flush()
+    
+    def _schedule_flush(self):
+        if self._flush_task and not self._flush_task.done():
+            return  # The running flush loops until nothing is queued
         try:
-            with open(NICKNAME_FILE, 'r') as f:
-                return json.load(f)
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_now()  # No event loop to defer to
+            return
+        self._flush_task = loop.create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        # Changes made while a batch is being written (or re-queued by a failed one) are
+        # picked up by the next pass, after another write_delay
+        while self._pending or self._cleared:
+            await asyncio.sleep(self.write_delay)
+            await self.flush()
+    
+    def _take_batch(self):
+        batch = (self._cleared, self._pending)
+        self._cleared, self._pending = set(), {}
+        return batch
+    
+    async def flush(self):
+        """Commit queued changes on a worker thread"""
+        cleared, pending = self._take_batch()
+        if cleared or pending:
+            await asyncio.to_thread(self._write_batch, cleared, pending)
+    
+    def flush_now(self):
+        """Commit queued changes on the calling thread (shutdown)"""
+        cleared, pending = self._take_batch()
+        if cleared or pending:
+            self._write_batch(cleared, pending)
+    
+    def _write_batch(self, cleared, pending):
+        """Apply one batch atomically; on failure the changes are re-queued for the next flush"""
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    for kind in cleared:
+                        self._conn.execute("DELETE FROM prefs WHERE kind = ?", (kind,))
+                    for (kind, key), value in pending.items():
+                        if value is None:
+                            self._conn.execute("DELETE FROM prefs WHERE kind = ? AND key = ?", (kind, key))
+                        else:
+                            self._conn.execute(
+                                "INSERT INTO prefs (kind, key, value) VALUES (?, ?, ?) "
+                                "ON CONFLICT (kind, key) DO UPDATE SET value = excluded.value",
+                                (kind, key, value))
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
         except Exception as e:
-            print(f"❌ Error loading nicknames: {e}")
-            return {}
-    return {}
-
-def save_nicknames(nicknames):
-    try:
-        with open(NICKNAME_FILE, 'w') as f:
-            json.dump(nicknames, f, indent=2)
-    except Exception as e:
-        print(f"❌ Error saving nicknames: {e}")
-
-def load_colors():
-    if os.path.exists(COLOR_FILE):
+            print(f"❌ Error saving preferences: {e}")
+            # Newer changes queued meanwhile take precedence over the failed batch
+            self._cleared |= cleared
+            for row, value in pending.items():
+                self._pending.setdefault(row, value)
+    
+    def close(self):
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        self.flush_now()
+        with self._lock:
+            self._conn.close()
+
+_preference_store = None
+
+def get_preference_store():
+    """Shared PreferenceStore, opened (and migrated) on first use"""
+    global _preference_store
+    if _preference_store is None:
+        _preference_store = PreferenceStore()
+    return _preference_store
+
+def load_room_snapshot():
+    """Load the last saved room state snapshot"""
+    if os.path.exists(ROOM_SNAPSHOT_FILE):
         try:
-            with open(COLOR_FILE, 'r') as f:
+            with open(ROOM_SNAPSHOT_FILE, 'r') as f:
                 return json.load(f)
         except Exception as e:
-            print(f"❌ Error loading colors: {e}")
-            return {}
+            print(f"❌ Error loading room snapshot: {e}")
     return {}
 
-def save_colors(colors):
+def save_room_snapshot(snapshot):
+    """Save room state snapshot to file (atomic temp file + rename)"""
     try:
-        with open(COLOR_FILE, 'w') as f:
-            json.dump(colors, f, indent=2)
+        os.makedirs(os.path.dirname(ROOM_SNAPSHOT_FILE), exist_ok=True)
+        tmp_path = ROOM_SNAPSHOT_FILE + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, ROOM_SNAPSHOT_FILE)
     except Exception as e:
-        print(f"❌ Error saving colors: {e}")
+        print(f"❌ Error saving room snapshot: {e}")
 
-def load_characters():
-    if os.path.exists(CHARACTER_FILE):
+class RelayOutbox:
+    """Durable outbox for Discord->Courtroom messages.
+    
+    Every queued message is appended to an append-only JSONL log and only removed
+    (via an "ack" record) once the courtroom send succeeds. Pending entries survive
+    disconnects and restarts and are replayed in order after reconnecting. Entries
+    older than max_age seconds are dropped instead of being replayed.
+    
+    Records are buffered and appended (and fsynced) in batches on a worker thread, so
+    the relay path never touches the disk. The log is compacted down to the pending
+    entries once it holds COMPACT_RECORDS records. close() writes whatever is left.
+    """
+    COMPACT_RECORDS = 1000
+    RETRY_DELAY = 1.0  # Seconds before retrying a failed write
+    
+    def __init__(self, path=OUTBOX_FILE, max_age=300):
+        self.path = path
+        self.max_age = max_age
+        self.pending = {}  # id -> entry, insertion-ordered
+        self._buffer = []  # Records not yet written to the log
+        self._log_records = 0  # Records currently in the log file
+        self._flush_task = None
+        self._file_lock = threading.Lock()  # Serializes the writer thread and close()
+        self._load()
+    
+    def _load(self):
+        """Rebuild pending entries from the log, then compact it"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # Torn write from a crash - skip it
+                        if record.get('op') == 'add':
+                            self.pending[record['id']] = record
+                        elif record.get('op') == 'ack':
+                            self.pending.pop(record.get('id'), None)
+            except Exception as e:
+                print(f"❌ Error loading outbox: {e}")
+        self.expire()
+        self._compact(list(self.pending.values()))
+        if self.pending:
+            print(f"📮 Outbox has {len(self.pending)} pending message(s) from a previous session")
+    
+    def add(self, username, text, character_id=None, pose_id=None):
+        """Record a message and return its outbox ID"""
+        entry = {
+            'op': 'add',
+            'id': os.urandom(6).hex(),
+            'ts': time.time(),
+            'username': username,
+            'text': text,
+            'character_id': character_id,
+            'pose_id': pose_id
+        }
+        self.pending[entry['id']] = entry
+        self._buffer.append(entry)
+        self._schedule_flush()
+        return entry['id']
+    
+    def ack(self, entry_id):
+        """Mark a message as delivered (or deliberately dropped)"""
+        if entry_id is None or self.pending.pop(entry_id, None) is None:
+            return
+        self._buffer.append({'op': 'ack', 'id': entry_id})
+        self._schedule_flush()
+    
+    def expire(self):
+        """Drop entries older than max_age, returning how many were dropped"""
+        cutoff = time.time() - self.max_age
+        expired = [entry_id for entry_id, entry in self.pending.items() if entry.get('ts', 0) < cutoff]
+        for entry_id in expired:
+            del self.pending[entry_id]
+        return len(expired)
+    
+    def _schedule_flush(self):
+        if self._flush_task and not self._flush_task.done():
+            return  # The running flush loops until the buffer is empty
         try:
-            with open(CHARACTER_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"❌ Error loading characters: {e}")
-            return {}
-    return {}
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_now()  # No event loop to defer to
+            return
+        self._flush_task = loop.create_task(self._flush())
+    
+    def _should_compact(self):
+        # Don't keep rewriting a log that is mostly pending entries (e.g. during an outage)
+        return self._log_records >= max(self.COMPACT_RECORDS, 2 * len(self.pending))
+    
+    async def _flush(self):
+        """Write buffered records on a worker thread until none are left"""
+        while self._buffer:
+            records, self._buffer = self._buffer, []
+            if not await asyncio.to_thread(self._append, records):
+                self._buffer[:0] = records  # Keep order ahead of newer records
+                await asyncio.sleep(self.RETRY_DELAY)
+                continue
+            if self._should_compact():
+                # The snapshot covers everything buffered so far, so those records are redundant
+                entries, covered, self._buffer = list(self.pending.values()), self._buffer, []
+                if not await asyncio.to_thread(self._compact, entries):
+                    self._buffer[:0] = covered  # The old log is still in place; append them after all
+    
+    def flush_now(self):
+        """Write buffered records on the calling thread (shutdown)"""
+        records, self._buffer = self._buffer, []
+        if records and not self._append(records):
+            self._buffer[:0] = records
+    
+    def close(self):
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        self.flush_now()
+    
+    def _append(self, records):
+        """Append records and fsync; returns False if the write failed"""
+        with self._file_lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write("".join(json.dumps(record) + "\n" for record in records))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._log_records += len(records)
+                return True
+            except Exception as e:
+                print(f"❌ Error writing outbox: {e}")
+                return False
+    
+    def _compact(self, entries):
+        """Rewrite the log with only the given entries (fsynced temp file + atomic rename);
+        returns False if the rewrite failed"""
+        with self._file_lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._log_records = len(entries)
+                return True
+            except Exception as e:
+                print(f"❌ Error compacting outbox: {e}")
+                return False
+    
+    def pending_entries(self):
+        """Non-expired pending entries in original order"""
+        dropped = self.expire()
+        if dropped:
+            # Expired entries are skipped again on load, so the log is left for the next compaction
+            print(f"📮 Dropped {dropped} expired outbox message(s) older than {self.max_age}s")
+        return list(self.pending.values())
+
+class LatencyStats:
+    """Rolling per-stage latency samples for the relay pipeline (in-memory only)"""
+    # Stage key -> display label, in pipeline order
+    STAGES = {
+        'd2c_queue': 'Discord→Court queue wait',
+        'd2c_username': 'Discord→Court username change',
+        'd2c_send': 'Discord→Court send',
+        'd2c_total': 'Discord→Court end-to-end',
+        'c2d_queue': 'Court→Discord queue wait',
+        'c2d_send': 'Court→Discord post',
+        'c2d_total': 'Court→Discord end-to-end',
+    }
+    
+    def __init__(self, window=500):
+        self.samples = {stage: deque(maxlen=window) for stage in self.STAGES}
+    
+    def record(self, stage, seconds):
+        if seconds is not None and seconds >= 0:
+            self.samples[stage].append(seconds)
+    
+    def percentiles(self, stage):
+        """Return (p50, p95, p99, count) in seconds, or None if there are no samples"""
+        values = sorted(self.samples[stage])
+        if not values:
+            return None
+        last = len(values) - 1
+        return (values[int(last * 0.50)], values[int(last * 0.95)], values[int(last * 0.99)], len(values))
+    
+    @staticmethod
+    def _format(seconds):
+        return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
+    
+    def summary_lines(self):
+        """Human-readable p50/p95/p99 line per stage that has samples"""
+        lines = []
+        for stage, label in self.STAGES.items():
+            result = self.percentiles(stage)
+            if result:
+                p50, p95, p99, count = result
+                lines.append(f"{label}: p50 {self._format(p50)} · p95 {self._format(p95)} · p99 {self._format(p99)} (n={count})")
+        return lines
+
+class RaidDetector:
+    """Sliding-window join-rate detector: raid mode starts when `threshold` joins land within
+    `window` seconds and lasts until `cooldown` seconds pass without a join"""
+    
+    def __init__(self, threshold=8, window=10.0, cooldown=60.0):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.joins = deque()
+        self.active = False
+        self.until = 0.0
+        self.raids = 0
+    
+    def record_join(self, now):
+        """Record a join; returns True only for the join that starts a raid"""
+        self.joins.append(now)
+        while self.joins and now - self.joins[0] > self.window:
+            self.joins.popleft()
+        if self.active:
+            self.until = now + self.cooldown
+            return False
+        if len(self.joins) >= self.threshold:
+            self.active = True
+            self.until = now + self.cooldown
+            self.raids += 1
+            return True
+        return False
+    
+    def rate(self, now):
+        """Joins in the current window"""
+        return sum(1 for t in self.joins if now - t <= self.window)
 
-def save_characters(characters):
-    try:
-        with open(CHARACTER_FILE, 'w') as f:
-            json.dump(characters, f, indent=2)
-    except Exception as e:
-        print(f"❌ Error saving characters: {e}")
 
-def load_autobans():
-    """Load autoban patterns from file"""
-    if os.path.exists(AUTOBAN_FILE):
-        try:
-            with open(AUTOBAN_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"❌ Error loading autobans: {e}")
-            return []
-    return []
+class RelayProfile:
+    """Precomputed relay identity for one Discord user (username, prefix, color wrapper, character)"""
+    __slots__ = ('discord_name', 'base_name', 'display_name', 'target_username', 'prefix',
+                 'color_open', 'color_close', 'character_id', 'pose_id')
+    
+    def __init__(self, discord_name, base_name, nickname=None, color=None, character=None):
+        self.discord_name = discord_name
+        self.base_name = base_name
+        self.display_name = nickname if nickname else discord_name
+        new_username = f"{self.display_name} ({base_name})"
+        # objection.lol usernames are limited to 30 characters; longer names fall back to
+        # the base name and prefix the message with the user's name instead
+        if len(new_username) <= 30:
+            self.target_username = new_username
+            self.prefix = ''
+        else:
+            self.target_username = base_name
+            self.prefix = f"{self.display_name}: "
+        self.color_open = f"[#/c{color}]" if color else ''
+        self.color_close = '[/#]' if color else ''
+        self.character_id = character['character_id'] if character else None
+        self.pose_id = character['pose_id'] if character else None
+    
+    def matches(self, discord_name, base_name):
+        return self.discord_name == discord_name and self.base_name == base_name
+    
+    def render(self, content, fast_text=False):
+        """Wrap relayed content in the user's prefix and color (plus [#ts15] for media)"""
+        speed = '[#ts15]' if fast_text else ''
+        return f"{self.prefix}{speed}{self.color_open}{content}{self.color_close}"
 
-def save_autobans(autobans):
-    """Save autoban patterns to file"""
-    try:
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(AUTOBAN_FILE), exist_ok=True)
-        with open(AUTOBAN_FILE, 'w') as f:
-            json.dump(autobans, f, indent=2)
-    except Exception as e:
-        print(f"❌ Error saving autobans: {e}")
 
-def load_ping_nicknames():
-    """Load ping nicknames from file. Format: {discord_user_id: [nick1, nick2, ...]}"""
-    if os.path.exists(PING_NICKNAME_FILE):
+class RelayTracer:
+    """Sampled per-message trace spans written to a rotating JSONL file.
+    
+    A sampled message gets a short correlation ID at ingress, stored in the same `stamps`
+    dict the relay already carries for latency stats. Each checkpoint stamped along the way
+    becomes a span, and finish() writes one line per message from a background thread.
+    Discord message IDs of traced messages are remembered (bounded) so a later retention
+    delete is logged against the same trace.
+    """
+    # Checkpoints in pipeline order -> name of the span that ends there
+    CHECKPOINTS = {
+        'd2c': (('ingress', None), ('enqueue', 'ingress'), ('dequeue', 'queue'),
+                ('username_done', 'username'), ('sent', 'send')),
+        'c2d': (('ingress', None), ('enqueue', 'ingress'), ('dequeue', 'queue'), ('resolved', 'resolve'),
+                ('assets_done', 'assets'), ('posted', 'post')),
+    }
+    MAX_LINKED = 2000
+    
+    def __init__(self, path=TRACE_FILE, sample_rate=0.0, max_bytes=5_000_000, backups=3):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.traced = 0
+        self._linked = {}  # Discord message ID -> trace ID
+        self._logger = None
+        self._listener = None
+    
+    def start(self, stamps):
+        """Sample this message; returns its trace ID (also stored in stamps) or None"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        trace_id = uuid.uuid4().hex[:12]
+        stamps['trace'] = trace_id
+        return trace_id
+    
+    def finish(self, stamps, direction, status, **attrs):
+        """Write the spans for a traced message (no-op for unsampled ones)"""
+        trace_id = stamps.get('trace')
+        if trace_id is None:
+            return
+        spans = {}
+        previous = None
+        for checkpoint, span in self.CHECKPOINTS[direction]:
+            at = stamps.get(checkpoint)
+            if at is None:
+                continue
+            if previous is not None and span:
+                spans[span] = round((at - previous) * 1000, 1)
+            previous = at
+        start = stamps.get('ingress') or stamps.get('enqueue')
+        record = {
+            'trace': trace_id,
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'dir': direction,
+            'status': status,
+            'total_ms': round((previous - start) * 1000, 1) if previous and start else None,
+            'spans': spans,
+        }
+        record.update(attrs)
+        for key in ('discord_message', 'source_message'):
+            if attrs.get(key):
+                self._link(attrs[key], trace_id)
+        self._write(record)
+    
+    def deleted(self, message_id):
+        """Record the retention cleanup of a traced Discord message"""
+        trace_id = self._linked.pop(message_id, None)
+        if trace_id is not None:
+            self._write({'trace': trace_id, 'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                         'event': 'retention_delete', 'discord_message': message_id})
+    
+    def _link(self, message_id, trace_id):
+        self._linked[message_id] = trace_id
+        if len(self._linked) > self.MAX_LINKED:
+            del self._linked[next(iter(self._linked))]
+    
+    def _write(self, record):
+        if self._logger is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(self.path, maxBytes=self.max_bytes,
+                                                                backupCount=self.backups, encoding='utf-8')
+            file_handler.setFormatter(logging.Formatter('%(message)s'))
+            trace_queue = queue.SimpleQueue()
+            self._logger = logging.getLogger('courtbot.trace')
+            self._logger.addHandler(logging.handlers.QueueHandler(trace_queue))
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            self._listener = logging.handlers.QueueListener(trace_queue, file_handler)
+            self._listener.start()
+        self.traced += 1
+        self._logger.info(json.dumps(record, ensure_ascii=False, default=str))
+    
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+class AutobanMatcher:
+    """Autoban patterns compiled once into a single case-insensitive alternation.
+    
+    Patterns are regexes; ones that don't compile fall back to a case-insensitive exact
+    username match, like before. Regex patterns only ever run on google-re2's linear-time
+    engine: the stdlib engine can backtrack for minutes on a crafted username (e.g.
+    '(a|a)*b'), and the matcher runs on the event loop for every join. Without re2
+    installed, patterns with no regex metacharacters still apply as case-insensitive
+    substring matches; the remaining regex patterns are disabled.
+    """
+    ENGINE = 're2' if re2 is not None else 'literal-only'
+    METACHARACTERS = frozenset('.^$*+?{}[]()|\\')
+    MAX_USERNAME = 64
+    BUDGET = 0.005  # Seconds per join before a slow evaluation is reported
+    
+    def __init__(self, patterns=()):
+        self.patterns = []
+        self.skipped = []
+        self._combined = None
+        self._singles = []  # (pattern, compiled) when patterns can't share one alternation
+        self._group_patterns = {}
+        self._exact = {}
+        self._literals = []  # (lowercased pattern, pattern) substring matches when re2 is missing
+        self.last_eval = 0.0
+        self.max_eval = 0.0
+        self.evaluations = 0
+        self.compile(patterns)
+    
+    @staticmethod
+    def _compile_one(pattern):
+        return re2.compile(f"(?i){pattern}")
+    
+    @classmethod
+    def is_literal(cls, pattern):
+        """True if the pattern has no regex metacharacters (a plain substring)"""
+        return not cls.METACHARACTERS.intersection(pattern)
+    
+    @classmethod
+    def check_pattern(cls, pattern):
+        """Return an error string if the pattern can't be used as a regex, else None"""
         try:
-            with open(PING_NICKNAME_FILE, 'r') as f:
-                return json.load(f)
+            re.compile(pattern)
+        except re.error as e:
+            return f"Invalid regex pattern: {e}"
+        if re2 is None:
+            if cls.is_literal(pattern):
+                return None
+            return "Regex autobans need google-re2 (pip install google-re2); plain-text patterns still work"
+        try:
+            cls._compile_one(pattern)
         except Exception as e:
-            print(f"❌ Error loading ping nicknames: {e}")
-            return {}
-    return {}
+            return f"Pattern not supported by the re2 engine (no backreferences or lookarounds): {e}"
+        return None
+    
+    def compile(self, patterns):
+        """Rebuild the matcher from the full pattern list"""
+        self.patterns = list(patterns)
+        self.skipped = []
+        self._exact = {}
+        self._literals = []
+        regexes = []
+        for pattern in self.patterns:
+            try:
+                re.compile(pattern)
+            except re.error:
+                self._exact.setdefault(pattern.lower(), pattern)
+                continue
+            if re2 is None:
+                if self.is_literal(pattern):
+                    self._literals.append((pattern.lower(), pattern))
+                else:
+                    self.skipped.append(pattern)
+                continue
+            try:
+                self._compile_one(pattern)
+            except Exception as e:
+                print(f"⚠️ AUTOBAN: Pattern '{pattern}' not supported by the re2 engine: {e}")
+                self.skipped.append(pattern)
+                continue
+            regexes.append(pattern)
+        if self.skipped and re2 is None:
+            print(f"⚠️ AUTOBAN: google-re2 is not installed - {len(self.skipped)} regex pattern(s) disabled: {', '.join(self.skipped)}")
+        
+        self._combined = None
+        self._singles = []
+        self._group_patterns = {}
+        if regexes:
+            alternation = '|'.join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(regexes))
+            try:
+                self._combined = self._compile_one(alternation)
+                self._group_patterns = {f"p{i}": pattern for i, pattern in enumerate(regexes)}
+            except Exception:
+                # e.g. two patterns using the same group name - match them one at a time
+                self._combined = None
+                self._singles = [(pattern, self._compile_one(pattern)) for pattern in regexes]
+    
+    def match(self, username):
+        """Return the first pattern matching the username, or None. Records evaluation time."""
+        start = time.perf_counter()
+        matched = self._exact.get(username.lower())
+        if matched is None:
+            subject = username[:self.MAX_USERNAME]
+            if self._combined is not None:
+                m = self._combined.search(subject)
+                if m:
+                    matched = self._group_patterns.get(m.lastgroup)
+                    if matched is None:
+                        # lastgroup can name an inner group; find the outer wrapper that matched
+                        matched = next((p for name, p in self._group_patterns.items() if m.group(name) is not None), None)
+            else:
+                matched = next((pattern for pattern, regex in self._singles if regex.search(subject)), None)
+            if matched is None and self._literals:
+                lowered = subject.lower()
+                matched = next((pattern for literal, pattern in self._literals if literal in lowered), None)
+        elapsed = time.perf_counter() - start
+        self.last_eval = elapsed
+        self.max_eval = max(self.max_eval, elapsed)
+        self.evaluations += 1
+        if elapsed > self.BUDGET:
+            print(f"⚠️ AUTOBAN: Pattern check for '{username}' took {elapsed * 1000:.1f}ms "
+                  f"(budget {self.BUDGET * 1000:.0f}ms, {len(self.patterns)} patterns)")
+        return matched
+    
+    def status(self):
+        return (f"{len(self.patterns)} patterns ({self.ENGINE}"
+                f"{', combined' if self._combined is not None else ''}"
+                f"{f', {len(self.skipped)} skipped' if self.skipped else ''}) · "
+                f"last {self.last_eval * 1e6:.0f}µs · max {self.max_eval * 1e6:.0f}µs · n={self.evaluations}")
+
+
+class ConfigSnapshot:
+    """One loaded version of the configuration plus its precompiled ignore matcher.
+    
+    Config swaps in a new snapshot on reload instead of mutating the old one, so a
+    handler always sees a consistent set of values; treat `data` as read-only.
+    """
+    __slots__ = ('data', 'mtime', 'ignore_patterns', '_ignore_regex')
+    
+    def __init__(self, data, mtime=None):
+        self.data = data
+        self.mtime = mtime
+        patterns = data.get('settings', {}).get('ignore_patterns') or []
+        self.ignore_patterns = tuple(patterns)
+        # Substring patterns folded into one alternation: a single scan per message
+        self._ignore_regex = re.compile('|'.join(map(re.escape, patterns))) if patterns else None
+    
+    def is_ignored(self, text):
+        return self._ignore_regex is not None and self._ignore_regex.search(text) is not None
 
-def save_ping_nicknames(ping_nicknames):
-    """Save ping nicknames to file"""
-    try:
-        os.makedirs(os.path.dirname(PING_NICKNAME_FILE), exist_ok=True)
-        with open(PING_NICKNAME_FILE, 'w') as f:
-            json.dump(ping_nicknames, f, indent=2)
-    except Exception as e:
-        print(f"❌ Error saving ping nicknames: {e}")
 
 class Config:
+    # Read once at startup - edits to these need a restart
+    RESTART_KEYS = {('discord', 'token'), ('discord', 'channel_id'), ('discord', 'guild_id'), ('objection', 'room_id')}
+    
     def __init__(self, config_file='/app/data/config.json'):
         self.config_file = config_file
+        self._announced_overrides = set()
         self.load_config()
     
+    @property
+    def data(self):
+        return self.snapshot.data
+    
+    def _file_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+    
     def load_config(self):
         """Load configuration from JSON file and override with environment variables"""
         if not os.path.exists(self.config_file):
             self.create_default_config()
         try:
             with open(self.config_file, 'r') as f:
-                self.data = json.load(f)
+                data = json.load(f)
         except Exception as e:
             print(f"❌ Error loading config: {e}")
             print("Creating default config...")
-            self.create_default_config()
+            data = self.create_default_config()
         
         # Override with environment variables if they exist
-        self.apply_env_overrides()
+        self.snapshot = self._build_snapshot(data, self._file_mtime())
+    
+    def reload_if_changed(self, force=False):
+        """Re-read config.json if its mtime changed. Returns the changed (section, key) pairs.
+        
+        Unlike load_config, a file that fails to parse (e.g. caught mid-save) leaves the
+        current snapshot in place rather than rewriting the defaults.
+        """
+        mtime = self._file_mtime()
+        if mtime is None or (mtime == self.snapshot.mtime and not force):
+            return []
+        previous = self.snapshot
+        try:
+            with open(self.config_file, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"❌ Config reload failed, keeping current settings: {e}")
+            self.snapshot = ConfigSnapshot(previous.data, mtime)  # Don't retry until it changes again
+            return []
+        # The old snapshot is never touched; handlers see either it or the new one
+        self.snapshot = self._build_snapshot(data, mtime)
+        
+        changed = []
+        for section in set(previous.data) | set(self.snapshot.data):
+            old, new = previous.data.get(section, {}), self.snapshot.data.get(section, {})
+            if not isinstance(old, dict) or not isinstance(new, dict):
+                continue
+            changed.extend((section, key) for key in set(old) | set(new) if old.get(key) != new.get(key))
+        if changed:
+            print(f"🔄 Config reloaded: {', '.join(f'{s}.{k}' for s, k in sorted(changed))}")
+            restart = [f"{s}.{k}" for s, k in changed if (s, k) in self.RESTART_KEYS]
+            if restart:
+                print(f"⚠️ These settings only take effect after a restart: {', '.join(sorted(restart))}")
+        return changed
     
-    def apply_env_overrides(self):
-        """Apply environment variable overrides to configuration"""
+    def is_ignored(self, text):
+        """Check text against the ignore_patterns of the current snapshot"""
+        return self.snapshot.is_ignored(text)
+    
+    def apply_env_overrides(self, data):
+        """Apply environment variable overrides to a freshly loaded config dict (in place)"""
         # Initialize sections if they don't exist
-        if 'discord' not in self.data:
-            self.data['discord'] = {}
-        if 'objection' not in self.data:
-            self.data['objection'] = {}
-        if 'settings' not in self.data:
-            self.data['settings'] = {}
+        if 'discord' not in data:
+            data['discord'] = {}
+        if 'objection' not in data:
+            data['objection'] = {}
+        if 'settings' not in data:
+            data['settings'] = {}
         
         # Discord settings (sensitive and deployment-specific)
         if os.getenv('DISCORD_TOKEN'):
-            self.data['discord']['token'] = os.getenv('DISCORD_TOKEN')
-            print("🔐 Discord token loaded from environment variable")
+            data['discord']['token'] = os.getenv('DISCORD_TOKEN')
+            self._announce_override("🔐 Discord token loaded from environment variable")
         if os.getenv('DISCORD_CHANNEL_ID'):
             try:
-                self.data['discord']['channel_id'] = int(os.getenv('DISCORD_CHANNEL_ID'))
-                print("🔐 Discord channel ID loaded from environment variable")
+                data['discord']['channel_id'] = int(os.getenv('DISCORD_CHANNEL_ID'))
+                self._announce_override("🔐 Discord channel ID loaded from environment variable")
             except ValueError:
-                print(f"❌ Invalid DISCORD_CHANNEL_ID environment variable")
+                self._announce_override(f"❌ Invalid DISCORD_CHANNEL_ID environment variable")
         if os.getenv('DISCORD_GUILD_ID'):
             try:
-                self.data['discord']['guild_id'] = int(os.getenv('DISCORD_GUILD_ID'))
-                print("🔐 Discord guild ID loaded from environment variable")
+                data['discord']['guild_id'] = int(os.getenv('DISCORD_GUILD_ID'))
+                self._announce_override("🔐 Discord guild ID loaded from environment variable")
             except ValueError:
-                print(f"❌ Invalid DISCORD_GUILD_ID environment variable")
+                self._announce_override(f"❌ Invalid DISCORD_GUILD_ID environment variable")
         
         # Objection.lol settings
         if os.getenv('ROOM_ID'):
-            self.data['objection']['room_id'] = os.getenv('ROOM_ID')
-            print("🌍 Room ID loaded from environment variable")
+            data['objection']['room_id'] = os.getenv('ROOM_ID')
+            self._announce_override("🌍 Room ID loaded from environment variable")
+        if os.getenv('OBJECTION_SERVER_URL'):
+            data['objection']['server_url'] = os.getenv('OBJECTION_SERVER_URL')
+            self._announce_override("🌍 Objection server URL loaded from environment variable")
         if os.getenv('BOT_USERNAME'):
-            self.data['objection']['bot_username'] = os.getenv('BOT_USERNAME')
-            print("🌍 Bot username loaded from environment variable")
+            data['objection']['bot_username'] = os.getenv('BOT_USERNAME')
+            self._announce_override("🌍 Bot username loaded from environment variable")
         
         # Bot settings
         if os.getenv('CHARACTER_ID'):
             try:
-                self.data['settings']['character_id'] = int(os.getenv('CHARACTER_ID'))
-                print("🌍 Character ID loaded from environment variable")
+                data['settings']['character_id'] = int(os.getenv('CHARACTER_ID'))
+                self._announce_override("🌍 Character ID loaded from environment variable")
             except ValueError:
-                print(f"❌ Invalid CHARACTER_ID environment variable")
+                self._announce_override(f"❌ Invalid CHARACTER_ID environment variable")
         if os.getenv('POSE_ID'):
             try:
-                self.data['settings']['pose_id'] = int(os.getenv('POSE_ID'))
-                print("🌍 Pose ID loaded from environment variable")
+                data['settings']['pose_id'] = int(os.getenv('POSE_ID'))
+                self._announce_override("🌍 Pose ID loaded from environment variable")
             except ValueError:
-                print(f"❌ Invalid POSE_ID environment variable")
+                self._announce_override(f"❌ Invalid POSE_ID environment variable")
         if os.getenv('MAX_MESSAGES'):
             try:
-                self.data['settings']['max_messages'] = int(os.getenv('MAX_MESSAGES'))
-                print("🌍 Max messages loaded from environment variable")
+                data['settings']['max_messages'] = int(os.getenv('MAX_MESSAGES'))
+                self._announce_override("🌍 Max messages loaded from environment variable")
             except ValueError:
-                print(f"❌ Invalid MAX_MESSAGES environment variable")
+                self._announce_override(f"❌ Invalid MAX_MESSAGES environment variable")
         if os.getenv('DELETE_COMMANDS'):
             delete_commands_str = os.getenv('DELETE_COMMANDS').lower()
-            self.data['settings']['delete_commands'] = delete_commands_str in ('true', '1', 'yes', 'on')
-            print(f"🌍 Delete commands loaded from environment variable: {self.data['settings']['delete_commands']}")
+            data['settings']['delete_commands'] = delete_commands_str in ('true', '1', 'yes', 'on')
+            self._announce_override(f"🌍 Delete commands loaded from environment variable: {data['settings']['delete_commands']}")
         if os.getenv('SHOW_JOIN_LEAVE'):
             show_join_leave_str = os.getenv('SHOW_JOIN_LEAVE').lower()
-            self.data['settings']['show_join_leave'] = show_join_leave_str in ('true', '1', 'yes', 'on')
-            print(f"🌍 Show join/leave loaded from environment variable: {self.data['settings']['show_join_leave']}")
+            data['settings']['show_join_leave'] = show_join_leave_str in ('true', '1', 'yes', 'on')
+            self._announce_override(f"🌍 Show join/leave loaded from environment variable: {data['settings']['show_join_leave']}")
         if os.getenv('VERBOSE'):
             verbose_str = os.getenv('VERBOSE').lower()
-            self.data['settings']['verbose'] = verbose_str in ('true', '1', 'yes', 'on')
-            print(f"🌍 Verbose logging loaded from environment variable: {self.data['settings']['verbose']}")
+            data['settings']['verbose'] = verbose_str in ('true', '1', 'yes', 'on')
+            self._announce_override(f"🌍 Verbose logging loaded from environment variable: {data['settings']['verbose']}")
+        if os.getenv('LOG_FORMAT'):
+            data['settings']['log_format'] = os.getenv('LOG_FORMAT').lower()
+            self._announce_override(f"🌍 Log format loaded from environment variable: {data['settings']['log_format']}")
         if os.getenv('ENABLE_PINGS'):
             pings_str = os.getenv('ENABLE_PINGS').lower()
-            self.data['settings']['enable_pings'] = pings_str in ('true', '1', 'yes', 'on')
-            print(f"🌍 Pings loaded from environment variable: {self.data['settings']['enable_pings']}")
+            data['settings']['enable_pings'] = pings_str in ('true', '1', 'yes', 'on')
+            self._announce_override(f"🌍 Pings loaded from environment variable: {data['settings']['enable_pings']}")
+        if os.getenv('METRICS_PORT'):
+            try:
+                data['settings']['metrics_port'] = int(os.getenv('METRICS_PORT'))
+                self._announce_override("🌍 Metrics port loaded from environment variable")
+            except ValueError:
+                self._announce_override(f"❌ Invalid METRICS_PORT environment variable")
+        if os.getenv('TRACE_SAMPLE_RATE'):
+            try:
+                data['settings']['trace_sample_rate'] = float(os.getenv('TRACE_SAMPLE_RATE'))
+                self._announce_override("🌍 Trace sample rate loaded from environment variable")
+            except ValueError:
+                self._announce_override(f"❌ Invalid TRACE_SAMPLE_RATE environment variable")
+        if os.getenv('METRICS_HOST'):
+            data['settings']['metrics_host'] = os.getenv('METRICS_HOST')
+            self._announce_override("🌍 Metrics host loaded from environment variable")
         
-        print("🌍 Environment variable overrides applied")
+        self._announce_override("🌍 Environment variable overrides applied")
+    
+    def _announce_override(self, message):
+        """Print an override message the first time only (overrides are re-applied on every reload)"""
+        if message not in self._announced_overrides:
+            self._announced_overrides.add(message)
+            print(message)
+    
+    def _build_snapshot(self, raw, mtime):
+        """Snapshot of the file contents with the environment overrides applied to a copy"""
+        data = copy.deepcopy(raw)
+        self.apply_env_overrides(data)
+        return ConfigSnapshot(data, mtime)
     def create_default_config(self):
         """Create a default configuration file"""
         default_config = {
@@ -261,7 +992,19 @@ class Config:
                 "delete_commands": True,
                 "show_join_leave": True,
                 "verbose": False,
-                "enable_pings": False
+                "log_format": "text",
+                "enable_pings": False,
+                "outbox_max_age": 300,
+                "hot_standby": False,
+                "raid_join_threshold": 8,
+                "raid_window": 10,
+                "raid_cooldown": 60,
+                "raid_slowmode": 10,
+                "metrics_port": 0,
+                "metrics_host": "127.0.0.1",
+                "loop_slow_threshold": 0.1,
+                "trace_sample_rate": 0.0,
+                "loop_debug": False
             }
         }
         
@@ -270,9 +1013,9 @@ class Config:
         
         with open(self.config_file, 'w') as f:
             json.dump(default_config, f, indent=2)
-        self.data = default_config
         print(f"📝 Created default config file: {self.config_file}")
         print("Discord settings will be loaded from environment variables.")
+        return default_config
     def get(self, section, key=None):
         """Get configuration value"""
         if key is None:
@@ -299,19 +1042,103 @@ class Config:
 
 # Global logging configuration
 VERBOSE_MODE = True
+logger = logging.getLogger('courtbot')
+_log_listener = None
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line (for Docker log collectors)"""
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class _PrintToLog(io.TextIOBase):
+    """sys.stdout replacement that turns every printed line into a log record.
+    
+    print() output then goes through the same queue as logger calls: one ordered stream,
+    written off the event loop, and in the configured format (JSON lines included).
+    Partial lines are buffered per thread so concurrent prints don't interleave.
+    """
+    def __init__(self):
+        self._local = threading.local()
+    
+    def writable(self):
+        return True
+    
+    def write(self, text):
+        *lines, self._local.partial = (getattr(self._local, 'partial', '') + text).split('\n')
+        for line in lines:
+            self._emit(line)
+        return len(text)
+    
+    def flush(self):
+        # Prompts (input/ainput) flush without a newline - show them rather than hold them
+        partial = getattr(self._local, 'partial', '')
+        if partial:
+            self._local.partial = ''
+            self._emit(partial)
+    
+    @staticmethod
+    def _emit(line):
+        level = logging.ERROR if line.startswith('❌') else logging.WARNING if line.startswith('⚠') else logging.INFO
+        logger.log(level, line)
 
-def log_verbose(message):
-    """Log message only if verbose mode is enabled"""
+def setup_logging(log_format='text'):
+    """Send bot logs and print() output through a queue to a background thread that writes stdout.
+    
+    Handlers only pay the level check and the %-formatting; a slow or blocked stdout
+    (e.g. a stalled Docker log driver) holds up the listener thread, not the event loop.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonLogFormatter() if log_format == 'json' else logging.Formatter('%(message)s'))
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    _log_listener = logging.handlers.QueueListener(log_queue, stream)
+    _log_listener.start()
+    # The handler above keeps the real stdout; everything else printed now joins the queue
+    sys.stdout = _PrintToLog()
+
+def stop_logging():
+    """Flush queued log records and stop the writer thread"""
+    global _log_listener
+    if _log_listener is not None:
+        sys.stdout.flush()
+        sys.stdout = _log_listener.handlers[0].stream  # The stdout setup_logging replaced
+        _log_listener.stop()
+        _log_listener = None
+
+def log_verbose(message, *args):
+    """Log message only if verbose mode is enabled.
+    
+    Pass values as %-style args (log_verbose("Got %s", x)) so nothing is formatted
+    when verbose mode is off.
+    """
     if VERBOSE_MODE:
-        print(message)
+        if _log_listener is not None:
+            logger.debug(message, *args)
+        else:
+            print(message % args if args else message)
 
 def log_message(source, username, message):
     """Log a message in simple format for non-verbose mode"""
     if VERBOSE_MODE:
         # In verbose mode, this is handled by existing logs
         pass
-    else:
+    elif _log_listener is not None:
         # Simple format: (Source) Username: message
+        logger.info("(%s) %s: %s", source, username, message)
+    else:
         print(f"({source}) {username}: {message}")
 
 class DiscordCourtBot(discord.Client):
@@ -320,6 +1147,7 @@ class DiscordCourtBot(discord.Client):
         intents.message_content = True
         intents.members = True  # Required for guild member lookup (ping feature)
         super().__init__(intents=intents)
+        self._count_rest_calls()
         
         self.objection_bot = objection_bot
         self.config = config
@@ -336,10 +1164,14 @@ class DiscordCourtBot(discord.Client):
         self.startup_message = None  # Track startup message to avoid deleting it
         
         # Load persistent data for nickname, color, and character customization
-        self.nicknames = load_nicknames()
-        self.colors = load_colors()
-        self.characters = load_characters()
-        self.ping_nicknames = load_ping_nicknames()
+        # (kept in memory; changes are written through as single-row updates)
+        self.prefs = get_preference_store()
+        self.nicknames = self.prefs.load('nicknames')
+        self.colors = self.prefs.load('colors')
+        self.characters = self.prefs.load('characters')
+        self.ping_nicknames = self.prefs.load('ping_nicknames')
+        # Per-user RelayProfile cache, dropped on preference or display-name changes
+        self._relay_profiles = {}
         
         # Rate limiting for pings: {discord_user_id: [timestamp1, timestamp2, ...]}
         self._ping_rate_limit = {}
@@ -353,6 +1185,15 @@ class DiscordCourtBot(discord.Client):
         self._discord_cdn_pattern = re.compile(r'https?://(?:media\.discordapp\.net|cdn\.discordapp\.com|cdn\.discord\.com)/attachments/\S+')
         self._discord_domain_pattern = re.compile(r'^https?://[^/]*discord(?:app)?\.(?:com|net)(?:/|$)', re.IGNORECASE)
     
+    def _count_rest_calls(self):
+        """Count Discord REST requests for the metrics endpoint (wraps this client's HTTP layer)"""
+        request = self.http.request
+        
+        async def counted_request(*args, **kwargs):
+            metrics.inc('courtbot_discord_rest_calls_total')
+            return await request(*args, **kwargs)
+        self.http.request = counted_request
+    
     async def fetch_music_url(self, bgm_id, validate_url=False):
         """Fetch the actual external URL for a BGM ID from objection.lol's API
         
@@ -364,6 +1205,7 @@ class DiscordCourtBot(discord.Client):
             # Use the correct API endpoint discovered from testing
             api_url = f"https://objection.lol/api/assets/music/{bgm_id}"
             
+            metrics.inc('courtbot_asset_api_calls_total{kind="music"}')
             async with aiohttp.ClientSession() as session:
                 async with session.get(api_url) as response:
                     if response.status == 200:
@@ -384,17 +1226,17 @@ class DiscordCourtBot(discord.Client):
                                     # Use HEAD request to check if URL is accessible without downloading
                                     async with session.head(external_url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=5)) as url_check:
                                         if url_check.status == 404:
-                                            log_verbose(f"❌ BGM {bgm_id} URL returns 404: {external_url}")
+                                            log_verbose("❌ BGM %s URL returns 404: %s", bgm_id, external_url)
                                             return None
                                         elif url_check.status >= 400:
-                                            log_verbose(f"❌ BGM {bgm_id} URL returns error {url_check.status}: {external_url}")
+                                            log_verbose("❌ BGM %s URL returns error %s: %s", bgm_id, url_check.status, external_url)
                                             return None
                                         
                                         # Check Content-Type to ensure it's actually an audio file
                                         content_type = url_check.headers.get('Content-Type', '').lower()
                                         valid_audio_types = ['audio/', 'application/ogg', 'application/octet-stream']
                                         if content_type and not any(t in content_type for t in valid_audio_types):
-                                            log_verbose(f"❌ BGM {bgm_id} URL is not audio (Content-Type: {content_type}): {external_url}")
+                                            log_verbose("❌ BGM %s URL is not audio (Content-Type: %s): %s", bgm_id, content_type, external_url)
                                             return None
                                         
                                         # Check Content-Length to ensure file has reasonable size (> 1KB)
@@ -403,23 +1245,23 @@ class DiscordCourtBot(discord.Client):
                                             try:
                                                 size = int(content_length)
                                                 if size < 1024:  # Less than 1KB is likely invalid
-                                                    log_verbose(f"❌ BGM {bgm_id} URL file too small ({size} bytes): {external_url}")
+                                                    log_verbose("❌ BGM %s URL file too small (%s bytes): %s", bgm_id, size, external_url)
                                                     return None
                                             except ValueError:
                                                 pass  # Ignore invalid Content-Length header
                                 except asyncio.TimeoutError:
-                                    log_verbose(f"⚠️ BGM {bgm_id} URL timeout, assuming valid: {external_url}")
+                                    log_verbose("⚠️ BGM %s URL timeout, assuming valid: %s", bgm_id, external_url)
                                     # Don't fail on timeout - the URL might still work
                                 except aiohttp.ClientConnectorError as conn_error:
                                     # DNS resolution failure, connection refused, etc. - definitely invalid
-                                    log_verbose(f"❌ BGM {bgm_id} URL connection failed (DNS/network error): {conn_error}")
+                                    log_verbose("❌ BGM %s URL connection failed (DNS/network error): %s", bgm_id, conn_error)
                                     return None
                                 except aiohttp.ClientError as client_error:
                                     # Other client errors - likely invalid
-                                    log_verbose(f"❌ BGM {bgm_id} URL client error: {client_error}")
+                                    log_verbose("❌ BGM %s URL client error: %s", bgm_id, client_error)
                                     return None
                                 except Exception as url_error:
-                                    log_verbose(f"⚠️ BGM {bgm_id} URL check failed: {url_error}")
+                                    log_verbose("⚠️ BGM %s URL check failed: %s", bgm_id, url_error)
                                     # Don't fail on other errors - the URL might still work
                             
                             print(f"🎵 Found music for BGM {bgm_id}: '{music_name}' -> {external_url}")
@@ -458,6 +1300,7 @@ class DiscordCourtBot(discord.Client):
             # Use the sound effect API endpoint
             api_url = f"https://objection.lol/api/assets/sound/{sfx_id}"
             
+            metrics.inc('courtbot_asset_api_calls_total{kind="sfx"}')
             async with aiohttp.ClientSession() as session:
                 async with session.get(api_url) as response:
                     if response.status == 200:
@@ -478,17 +1321,17 @@ class DiscordCourtBot(discord.Client):
                                     # Use HEAD request to check if URL is accessible without downloading
                                     async with session.head(external_url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=5)) as url_check:
                                         if url_check.status == 404:
-                                            log_verbose(f"❌ SFX {sfx_id} URL returns 404: {external_url}")
+                                            log_verbose("❌ SFX %s URL returns 404: %s", sfx_id, external_url)
                                             return None
                                         elif url_check.status >= 400:
-                                            log_verbose(f"❌ SFX {sfx_id} URL returns error {url_check.status}: {external_url}")
+                                            log_verbose("❌ SFX %s URL returns error %s: %s", sfx_id, url_check.status, external_url)
                                             return None
                                         
                                         # Check Content-Type to ensure it's actually an audio file
                                         content_type = url_check.headers.get('Content-Type', '').lower()
                                         valid_audio_types = ['audio/', 'application/ogg', 'application/octet-stream']
                                         if content_type and not any(t in content_type for t in valid_audio_types):
-                                            log_verbose(f"❌ SFX {sfx_id} URL is not audio (Content-Type: {content_type}): {external_url}")
+                                            log_verbose("❌ SFX %s URL is not audio (Content-Type: %s): %s", sfx_id, content_type, external_url)
                                             return None
                                         
                                         # Check Content-Length to ensure file has reasonable size (> 1KB)
@@ -497,23 +1340,23 @@ class DiscordCourtBot(discord.Client):
                                             try:
                                                 size = int(content_length)
                                                 if size < 1024:  # Less than 1KB is likely invalid
-                                                    log_verbose(f"❌ SFX {sfx_id} URL file too small ({size} bytes): {external_url}")
+                                                    log_verbose("❌ SFX %s URL file too small (%s bytes): %s", sfx_id, size, external_url)
                                                     return None
                                             except ValueError:
                                                 pass  # Ignore invalid Content-Length header
                                 except asyncio.TimeoutError:
-                                    log_verbose(f"⚠️ SFX {sfx_id} URL timeout, assuming valid: {external_url}")
+                                    log_verbose("⚠️ SFX %s URL timeout, assuming valid: %s", sfx_id, external_url)
                                     # Don't fail on timeout - the URL might still work
                                 except aiohttp.ClientConnectorError as conn_error:
                                     # DNS resolution failure, connection refused, etc. - definitely invalid
-                                    log_verbose(f"❌ SFX {sfx_id} URL connection failed (DNS/network error): {conn_error}")
+                                    log_verbose("❌ SFX %s URL connection failed (DNS/network error): %s", sfx_id, conn_error)
                                     return None
                                 except aiohttp.ClientError as client_error:
                                     # Other client errors - likely invalid
-                                    log_verbose(f"❌ SFX {sfx_id} URL client error: {client_error}")
+                                    log_verbose("❌ SFX %s URL client error: %s", sfx_id, client_error)
                                     return None
                                 except Exception as url_error:
-                                    log_verbose(f"⚠️ SFX {sfx_id} URL check failed: {url_error}")
+                                    log_verbose("⚠️ SFX %s URL check failed: %s", sfx_id, url_error)
                                     # Don't fail on other errors - the URL might still work
                             
                             print(f"🔊 Found sound effect for SFX {sfx_id}: '{sfx_name}' -> {external_url}")
@@ -557,6 +1400,7 @@ class DiscordCourtBot(discord.Client):
             # Use the evidence API endpoint
             api_url = f"https://objection.lol/api/assets/evidence/{evidence_id}"
             
+            metrics.inc('courtbot_asset_api_calls_total{kind="evidence"}')
             async with aiohttp.ClientSession() as session:
                 async with session.get(api_url) as response:
                     if response.status == 200:
@@ -578,17 +1422,17 @@ class DiscordCourtBot(discord.Client):
                                     # Use HEAD request to check if URL is accessible without downloading
                                     async with session.head(evidence_url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=5)) as url_check:
                                         if url_check.status == 404:
-                                            log_verbose(f"❌ Evidence {evidence_id} URL returns 404: {evidence_url}")
+                                            log_verbose("❌ Evidence %s URL returns 404: %s", evidence_id, evidence_url)
                                             return None
                                         elif url_check.status >= 400:
-                                            log_verbose(f"❌ Evidence {evidence_id} URL returns error {url_check.status}: {evidence_url}")
+                                            log_verbose("❌ Evidence %s URL returns error %s: %s", evidence_id, url_check.status, evidence_url)
                                             return None
                                         
                                         # Check Content-Type to ensure it's actually an image or video file
                                         content_type = url_check.headers.get('Content-Type', '').lower()
                                         valid_media_types = ['image/', 'video/']
                                         if content_type and not any(t in content_type for t in valid_media_types):
-                                            log_verbose(f"❌ Evidence {evidence_id} URL is not an image/video (Content-Type: {content_type}): {evidence_url}")
+                                            log_verbose("❌ Evidence %s URL is not an image/video (Content-Type: %s): %s", evidence_id, content_type, evidence_url)
                                             return None
                                         
                                         # Check Content-Length to ensure file has reasonable size
@@ -598,23 +1442,23 @@ class DiscordCourtBot(discord.Client):
                                             try:
                                                 size = int(content_length)
                                                 if size < 5120:  # Less than 5KB is likely an error placeholder
-                                                    log_verbose(f"❌ Evidence {evidence_id} URL file too small ({size} bytes): {evidence_url}")
+                                                    log_verbose("❌ Evidence %s URL file too small (%s bytes): %s", evidence_id, size, evidence_url)
                                                     return None
                                             except ValueError:
                                                 pass  # Ignore invalid Content-Length header
                                 except asyncio.TimeoutError:
-                                    log_verbose(f"⚠️ Evidence {evidence_id} URL timeout, assuming valid: {evidence_url}")
+                                    log_verbose("⚠️ Evidence %s URL timeout, assuming valid: %s", evidence_id, evidence_url)
                                     # Don't fail on timeout - the URL might still work
                                 except aiohttp.ClientConnectorError as conn_error:
                                     # DNS resolution failure, connection refused, etc. - definitely invalid
-                                    log_verbose(f"❌ Evidence {evidence_id} URL connection failed (DNS/network error): {conn_error}")
+                                    log_verbose("❌ Evidence %s URL connection failed (DNS/network error): %s", evidence_id, conn_error)
                                     return None
                                 except aiohttp.ClientError as client_error:
                                     # Other client errors - likely invalid
-                                    log_verbose(f"❌ Evidence {evidence_id} URL client error: {client_error}")
+                                    log_verbose("❌ Evidence %s URL client error: %s", evidence_id, client_error)
                                     return None
                                 except Exception as url_error:
-                                    log_verbose(f"⚠️ Evidence {evidence_id} URL check failed: {url_error}")
+                                    log_verbose("⚠️ Evidence %s URL check failed: %s", evidence_id, url_error)
                                     # Don't fail on other errors - the URL might still work
                             
                             print(f"📄 Found evidence {evidence_id}: '{evidence_name}' -> {evidence_url}")
@@ -644,6 +1488,7 @@ class DiscordCourtBot(discord.Client):
             # Use the character API endpoint
             api_url = f"https://objection.lol/api/assets/character/{character_id}"
             
+            metrics.inc('courtbot_asset_api_calls_total{kind="character"}')
             async with aiohttp.ClientSession() as session:
                 async with session.get(api_url) as response:
                     if response.status == 200:
@@ -662,7 +1507,7 @@ class DiscordCourtBot(discord.Client):
                                     if idle_image_url.startswith('/'):
                                         idle_image_url = f"https://objection.lol{idle_image_url}"
                                     
-                                    log_verbose(f"🎭 Found avatar for character {character_id} ({character_name}), pose {pose_id} ({pose_name}): {idle_image_url}")
+                                    log_verbose("🎭 Found avatar for character %s (%s), pose %s (%s): %s", character_id, character_name, pose_id, pose_name, idle_image_url)
                                     return {
                                         'url': idle_image_url,
                                         'character_name': character_name,
@@ -671,20 +1516,20 @@ class DiscordCourtBot(discord.Client):
                                         'pose_id': pose_id
                                     }
                                 else:
-                                    log_verbose(f"❌ No idle image URL found for character {character_id}, pose {pose_id}")
+                                    log_verbose("❌ No idle image URL found for character %s, pose %s", character_id, pose_id)
                                     return None
                         
                         # Pose not found
-                        log_verbose(f"❌ Pose {pose_id} not found for character {character_id}")
+                        log_verbose("❌ Pose %s not found for character %s", pose_id, character_id)
                         return None
                     elif response.status == 404:
-                        log_verbose(f"❌ Character ID {character_id} not found")
+                        log_verbose("❌ Character ID %s not found", character_id)
                         return None
                     else:
-                        log_verbose(f"❌ Failed to fetch character data for ID {character_id} (status: {response.status})")
+                        log_verbose("❌ Failed to fetch character data for ID %s (status: %s)", character_id, response.status)
                         return None
         except Exception as e:
-            log_verbose(f"❌ Error fetching character avatar for ID {character_id}: {e}")
+            log_verbose("❌ Error fetching character avatar for ID %s: %s", character_id, e)
             return None
 
     def strip_color_codes(self, text):
@@ -695,7 +1540,7 @@ class DiscordCourtBot(discord.Client):
         # [/#] - closing tags
         # [#ts123] - text speed commands with any number
         cleaned = self._color_code_pattern.sub('', text)
-        log_verbose(f"🎨 Color strip: '{text}' → '{cleaned}'")  # Debug line
+        log_verbose("🎨 Color strip: '%s' → '%s'", text, cleaned)  # Debug line
         return cleaned
 
     def _is_discord_url(self, url):
@@ -712,13 +1557,13 @@ class DiscordCourtBot(discord.Client):
             if (attachment.content_type and attachment.content_type.startswith('image/')) or \
                any(attachment.filename.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp']):
                 media_urls.append(attachment.url)
-                log_verbose(f"🖼️ Found image attachment: {attachment.filename} - {attachment.url}")
+                log_verbose("🖼️ Found image attachment: %s - %s", attachment.filename, attachment.url)
             
             # Check if it's a video by file extension or content type
             elif (attachment.content_type and attachment.content_type.startswith('video/')) or \
                  any(attachment.filename.lower().endswith(ext) for ext in ['.mp4', '.mov', '.avi', '.mkv', '.webm', '.flv', '.wmv', '.m4v']):
                 media_urls.append(attachment.url)
-                log_verbose(f"🎥 Found video attachment: {attachment.filename} - {attachment.url}")
+                log_verbose("🎥 Found video attachment: %s - %s", attachment.filename, attachment.url)
         
         # Extract from embeds (auto-generated previews from URLs)
         for embed in message.embeds:
@@ -729,7 +1574,7 @@ class DiscordCourtBot(discord.Client):
             # would duplicate/replace the original link if we extracted them here.
             # In that case, leave the original bare URL untouched and skip extraction.
             if embed.url and not self._is_discord_url(embed.url):
-                log_verbose(f"⏭️ Skipping embed media extraction for non-Discord link: {embed.url}")
+                log_verbose("⏭️ Skipping embed media extraction for non-Discord link: %s", embed.url)
                 continue
             
             # Image embeds (e.g. from pasted image URLs)
@@ -737,21 +1582,21 @@ class DiscordCourtBot(discord.Client):
                 url = embed.image.proxy_url or embed.image.url
                 if url not in media_urls:
                     media_urls.append(url)
-                    log_verbose(f"🖼️ Found image from embed: {url}")
+                    log_verbose("🖼️ Found image from embed: %s", url)
             
             # Thumbnail embeds (Discord often puts image previews here)
             if embed.thumbnail and embed.thumbnail.url:
                 url = embed.thumbnail.proxy_url or embed.thumbnail.url
                 if url not in media_urls:
                     media_urls.append(url)
-                    log_verbose(f"🖼️ Found thumbnail from embed: {url}")
+                    log_verbose("🖼️ Found thumbnail from embed: %s", url)
             
             # Video embeds
             if embed.video and embed.video.url:
                 url = embed.video.proxy_url or embed.video.url
                 if url not in media_urls:
                     media_urls.append(url)
-                    log_verbose(f"🎥 Found video from embed: {url}")
+                    log_verbose("🎥 Found video from embed: %s", url)
         
         return media_urls
 
@@ -786,7 +1631,7 @@ class DiscordCourtBot(discord.Client):
                     # Only store if the URL actually has auth params
                     if '?' in url and base_url not in url_map:
                         url_map[base_url] = url
-                        log_verbose(f"🔑 Found authenticated Discord CDN URL: {base_url} -> {url[:80]}...")
+                        log_verbose("🔑 Found authenticated Discord CDN URL: %s -> %s...", base_url, url[:80])
         
         return url_map
     async def setup_hook(self):
@@ -833,7 +1678,7 @@ class DiscordCourtBot(discord.Client):
                 await asyncio.sleep(0.5)
             
             # Get unique usernames and sort them
-            users = list(set(self.objection_bot.user_names.values()))
+            users = list(set(self.objection_bot.room.values()))
             users.sort()  # Sort alphabetically for consistent display
             user_count = len(users)
 
@@ -865,6 +1710,21 @@ class DiscordCourtBot(discord.Client):
                     value=admin_status,
                     inline=True
                 )
+                
+                # Relay latency percentiles per pipeline stage
+                latency_lines = self.objection_bot.latency.summary_lines()
+                embed.add_field(
+                    name="⏱️ Relay Latency",
+                    value='\n'.join(latency_lines) if latency_lines else "No relayed messages yet",
+                    inline=False
+                )
+                
+                # Event-loop lag and the code that blocked it the longest
+                embed.add_field(
+                    name="🐢 Event Loop",
+                    value='\n'.join(loop_monitor.summary_lines(n=3))[:1024],
+                    inline=False
+                )
             else:
                 embed = discord.Embed(
                     title="🔴 Bridge Status",
@@ -906,7 +1766,7 @@ class DiscordCourtBot(discord.Client):
                     )
                     # Send reconnection message to courtroom
                     await asyncio.sleep(0.5)  # Wait for connection to stabilize
-                    await self.objection_bot.send_message("Ruff (Relaying messages)")
+                    await self.objection_bot.send_as_bot("Ruff (Relaying messages)")
                     
                     # Remove old startup messages and send new one
                     await self.remove_previous_startup_messages()
@@ -1013,7 +1873,8 @@ class DiscordCourtBot(discord.Client):
             if nickname.lower() in ['reset', 'remove', 'clear', 'delete']:
                 if user_id in self.nicknames:
                     del self.nicknames[user_id]
-                    save_nicknames(self.nicknames)
+                    self.prefs.delete('nicknames', user_id)
+                    self.invalidate_relay_profile(user_id)
                     await interaction.response.send_message("✅ Your bridge nickname has been reset. Your Discord display name will now be used.", ephemeral=True)
                 else:
                     await interaction.response.send_message("ℹ️ You don't have a nickname set.", ephemeral=True)
@@ -1024,7 +1885,8 @@ class DiscordCourtBot(discord.Client):
                 return
 
             self.nicknames[user_id] = nickname
-            save_nicknames(self.nicknames)
+            self.prefs.put('nicknames', user_id, nickname)
+            self.invalidate_relay_profile(user_id)
             await interaction.response.send_message(f"✅ Your bridge nickname is now set to: **{nickname}**\nUse `/nickname reset` to remove it.", ephemeral=True)
 
         @self.tree.command(name="pingname", description="Manage your ping nicknames so courtroom users can mention you. Recommend prefixing with @", guild=discord.Object(id=self.guild_id))
@@ -1049,7 +1911,7 @@ class DiscordCourtBot(discord.Client):
             if action_lower == 'clear':
                 if user_id in self.ping_nicknames:
                     del self.ping_nicknames[user_id]
-                    save_ping_nicknames(self.ping_nicknames)
+                    self.prefs.delete('ping_nicknames', user_id)
                     await interaction.response.send_message("✅ All your ping nicknames have been cleared.", ephemeral=True)
                 else:
                     await interaction.response.send_message("ℹ️ You don't have any ping nicknames to clear.", ephemeral=True)
@@ -1076,7 +1938,7 @@ class DiscordCourtBot(discord.Client):
                     await interaction.response.send_message(f"ℹ️ You already have `{nick_lower}` as a ping nickname.", ephemeral=True)
                     return
                 self.ping_nicknames[user_id].append(nick_lower)
-                save_ping_nicknames(self.ping_nicknames)
+                self.prefs.put('ping_nicknames', user_id, self.ping_nicknames[user_id])
                 await interaction.response.send_message(f"✅ Added ping nickname: `{nick_lower}`\nCourtroom users can now ping you with `@{nick_lower}`", ephemeral=True)
                 return
             
@@ -1089,7 +1951,9 @@ class DiscordCourtBot(discord.Client):
                     self.ping_nicknames[user_id].remove(nick_lower)
                     if not self.ping_nicknames[user_id]:
                         del self.ping_nicknames[user_id]
-                    save_ping_nicknames(self.ping_nicknames)
+                        self.prefs.delete('ping_nicknames', user_id)
+                    else:
+                        self.prefs.put('ping_nicknames', user_id, self.ping_nicknames[user_id])
                     await interaction.response.send_message(f"✅ Removed ping nickname: `{nick_lower}`", ephemeral=True)
                 else:
                     await interaction.response.send_message(f"❌ You don't have `{nick_lower}` as a ping nickname.", ephemeral=True)
@@ -1110,7 +1974,8 @@ class DiscordCourtBot(discord.Client):
             if color.lower() in ['reset', 'remove', 'clear', 'delete']:
                 if user_id in self.colors:
                     del self.colors[user_id]
-                    save_colors(self.colors)
+                    self.prefs.delete('colors', user_id)
+                    self.invalidate_relay_profile(user_id)
                     await interaction.response.send_message("✅ Your message color has been reset. Messages will use default color.", ephemeral=True)
                 else:
                     await interaction.response.send_message("ℹ️ You don't have a custom color set.", ephemeral=True)
@@ -1120,7 +1985,8 @@ class DiscordCourtBot(discord.Client):
             preset_color = PRESET_COLORS.get(color.lower())
             if preset_color:
                 self.colors[user_id] = preset_color.lower()
-                save_colors(self.colors)
+                self.prefs.put('colors', user_id, self.colors[user_id])
+                self.invalidate_relay_profile(user_id)
                 await interaction.response.send_message(f"✅ Your message color is now set to: **{color.lower()}** (#{preset_color.upper()})\nYour messages will appear in color in the courtroom. Use `/color reset` to remove it.", ephemeral=True)
                 return
 
@@ -1134,7 +2000,8 @@ class DiscordCourtBot(discord.Client):
 
             # Store the color code (without #)
             self.colors[user_id] = clean_color.lower()
-            save_colors(self.colors)
+            self.prefs.put('colors', user_id, self.colors[user_id])
+            self.invalidate_relay_profile(user_id)
             await interaction.response.send_message(f"✅ Your message color is now set to: **#{clean_color.upper()}**\nYour messages will appear in color in the courtroom. Use `/color reset` to remove it.", ephemeral=True)
         
         @self.tree.command(name="character", description="Set your character and pose for the courtroom ('reset' to remove)", guild=discord.Object(id=self.guild_id))
@@ -1153,7 +2020,8 @@ class DiscordCourtBot(discord.Client):
             if character_id.lower() in ['reset', 'remove', 'clear', 'delete']:
                 if user_id in self.characters:
                     del self.characters[user_id]
-                    save_characters(self.characters)
+                    self.prefs.delete('characters', user_id)
+                    self.invalidate_relay_profile(user_id)
                     await interaction.response.send_message("✅ Your character/pose has been reset. The bot's default character will be used.", ephemeral=True)
                 else:
                     await interaction.response.send_message("ℹ️ You don't have a custom character set.", ephemeral=True)
@@ -1177,7 +2045,8 @@ class DiscordCourtBot(discord.Client):
                 'character_id': char_id_int,
                 'pose_id': pose_id_int
             }
-            save_characters(self.characters)
+            self.prefs.put('characters', user_id, self.characters[user_id])
+            self.invalidate_relay_profile(user_id)
             await interaction.response.send_message(
                 f"✅ Your character/pose is now set to:\n**Character ID:** {char_id_int}\n**Pose ID:** {pose_id_int}\n\nYour messages will appear with this character in the courtroom. Use `/character reset` to remove it.",
                 ephemeral=True
@@ -1208,7 +2077,7 @@ class DiscordCourtBot(discord.Client):
                 
                 # Convert any existing avatar embeds to plain text
                 try:
-                    log_verbose(f"🔍 Converting existing avatar embeds to plain text...")
+                    log_verbose("🔍 Converting existing avatar embeds to plain text...")
                     converted_count = 0
                     
                     async for message in self.bridge_channel.history(limit=50):
@@ -1227,9 +2096,9 @@ class DiscordCourtBot(discord.Client):
                                 converted_count += 1
                     
                     if converted_count > 0:
-                        log_verbose(f"✅ Converted {converted_count} existing avatar embed(s) to plain text")
+                        log_verbose("✅ Converted %s existing avatar embed(s) to plain text", converted_count)
                 except Exception as e:
-                    log_verbose(f"⚠️ Error converting existing embeds: {e}")
+                    log_verbose("⚠️ Error converting existing embeds: %s", e)
             
             embed = discord.Embed(
                 title=f"{status_emoji} Avatars {status_text.capitalize()}",
@@ -1254,13 +2123,12 @@ class DiscordCourtBot(discord.Client):
 
             try:
                 # Revert to original bot username when speaking as the bot itself
-                original_username = self.config.get('objection', 'bot_username')
-                log_verbose(f"🎭 Shaba command: Changing to bot username: {original_username}")
-                await self.objection_bot.change_username_and_wait(original_username)
-                log_verbose(f"🎭 Shaba command: Sending message with background color")
-                await self.objection_bot.send_message("[#bgs122964]")
+                log_verbose("🎭 Shaba command: Sending message with background color")
+                if not await self.objection_bot.send_as_bot("[#bgs122964]"):
+                    await interaction.followup.send("❌ Couldn't switch to the bot's username", ephemeral=True)
+                    return
                 await interaction.followup.send("What the dog doin??", ephemeral=False)
-                log_verbose(f"🎭 Shaba command: Successfully executed")
+                log_verbose("🎭 Shaba command: Successfully executed")
             except Exception as e:
                 print(f"❌ Shaba command error: {e}")
                 await interaction.followup.send(f"❌ Failed to execute shaba command: {str(e)}", ephemeral=True)
@@ -1659,9 +2527,9 @@ class DiscordCourtBot(discord.Client):
                 )
             
             # Show ban list
-            if self.objection_bot.banned_users:
+            if self.objection_bot.room.bans:
                 ban_list = []
-                for ban in self.objection_bot.banned_users:
+                for ban in self.objection_bot.room.bans:
                     username = ban.get('username', 'Unknown')
                     user_id = ban.get('id', 'Unknown ID')
                     # Truncate ID for display
@@ -1669,7 +2537,7 @@ class DiscordCourtBot(discord.Client):
                     ban_list.append(f"• **{username}** (`{short_id}`)")
                 
                 embed.add_field(
-                    name=f"Banned Users ({len(self.objection_bot.banned_users)})",
+                    name=f"Banned Users ({len(self.objection_bot.room.bans)})",
                     value="\n".join(ban_list),
                     inline=False
                 )
@@ -1741,15 +2609,40 @@ class DiscordCourtBot(discord.Client):
             self.startup_message = await self.bridge_channel.send(embed=embed)
         else:
             print(f'❌ Could not find Discord channel with ID: {self.channel_id}')
+    def get_relay_profile(self, user_id, discord_name, base_name):
+        """Return the cached RelayProfile for a user, rebuilding it if stale"""
+        profile = self._relay_profiles.get(user_id)
+        if profile is None or not profile.matches(discord_name, base_name):
+            metrics.inc('courtbot_relay_profile_cache_total{result="miss"}')
+            profile = RelayProfile(discord_name, base_name,
+                                   nickname=self.nicknames.get(user_id),
+                                   color=self.colors.get(user_id),
+                                   character=self.characters.get(user_id))
+            self._relay_profiles[user_id] = profile
+        else:
+            metrics.inc('courtbot_relay_profile_cache_total{result="hit"}')
+        return profile
+    
+    def invalidate_relay_profile(self, user_id):
+        self._relay_profiles.pop(user_id, None)
+    
+    async def on_member_update(self, before, after):
+        if before.display_name != after.display_name:
+            self.invalidate_relay_profile(str(after.id))
+    
+    async def on_user_update(self, before, after):
+        if before.display_name != after.display_name:
+            self.invalidate_relay_profile(str(after.id))
+    
     async def on_message(self, message):
+        received_at = time.monotonic()  # Ingress stamp for relay latency stats
         # Ignore messages from the bot itself
         if message.author == self.user:
             return
         # Only process messages from the bridge channel
         if message.channel.id == self.channel_id:
             # Check ignore patterns
-            ignore_patterns = self.config.get('settings', 'ignore_patterns')
-            if any(pattern in message.content for pattern in ignore_patterns):
+            if self.config.is_ignored(message.content):
                 return
             
             # Ignore messages with Discord user mentions (<@numbers>)
@@ -1771,9 +2664,9 @@ class DiscordCourtBot(discord.Client):
                 await asyncio.sleep(1.5)
                 try:
                     message = await message.channel.fetch_message(message.id)
-                    log_verbose(f"🔄 Re-fetched message for Discord CDN embed (got {len(message.embeds)} embeds)")
+                    log_verbose("🔄 Re-fetched message for Discord CDN embed (got %s embeds)", len(message.embeds))
                 except Exception as e:
-                    log_verbose(f"⚠️ Failed to re-fetch message for embeds: {e}")
+                    log_verbose("⚠️ Failed to re-fetch message for embeds: %s", e)
             
             # Extract image and video URLs from attachments and embeds
             media_urls = self.extract_media_urls(message)
@@ -1789,7 +2682,7 @@ class DiscordCourtBot(discord.Client):
                         base_url = bare_url.split('?')[0]
                         if base_url in auth_url_map:
                             message_content = message_content.replace(bare_url, auth_url_map[base_url])
-                            log_verbose(f"🔑 Replaced bare Discord CDN URL with authenticated version")
+                            log_verbose("🔑 Replaced bare Discord CDN URL with authenticated version")
             
             # Prepare message content with media
             content_parts = []
@@ -1816,82 +2709,41 @@ class DiscordCourtBot(discord.Client):
                 
             full_content = "\n".join(content_parts)
             
-            # Prepare new username and message content
+            # Resolve the cached relay identity (nickname, username limit, color, character)
             base_name = self.config.get('objection', 'bot_username')
             discord_name = message.author.display_name
             user_id = str(message.author.id)
+            profile = self.get_relay_profile(user_id, discord_name, base_name)
+            display_name = profile.display_name
+            target_username = profile.target_username
+            # Fast text for media URLs so links don't crawl across the textbox
+            send_content = profile.render(full_content, fast_text=bool(media_urls))
+            char_id = profile.character_id
+            p_id = profile.pose_id
             
-            # Batch lookup all user preferences at once (optimization)
-            user_prefs = {
-                'nickname': self.nicknames.get(user_id),
-                'color': self.colors.get(user_id),
-                'character': self.characters.get(user_id)
-            }
-            
-            # Use nickname if set, else display name
-            display_name = user_prefs['nickname'] if user_prefs['nickname'] else discord_name
-            new_username = f"{display_name} ({base_name})"
-            
-            # Debug logging to prevent impersonation issues
-            log_verbose(f"🔍 Processing message from Discord user: {discord_name} (ID: {user_id})")
-            log_verbose(f"🔍 Display name for message: {display_name}")
-            log_verbose(f"🔍 Constructed username: {new_username} (length: {len(new_username)})")
-            
-            # Apply user's custom color if set
-            if user_prefs['color']:
-                # Add fast text command for media URLs, then apply color
-                if media_urls:
-                    colored_content = f"[#ts15][#/c{user_prefs['color']}]{full_content}[/#]"
-                else:
-                    colored_content = f"[#/c{user_prefs['color']}]{full_content}[/#]"
-            else:
-                # Add fast text command for media URLs even without color
-                if media_urls:
-                    colored_content = f"[#ts15]{full_content}"
-                else:
-                    colored_content = full_content
-            
-            # Always check username length limit (30 characters for objection.lol)
-            # and always decide whether to prefix the message based on this check
-            if len(new_username) <= 30:
-                # Username fits, use it and send content without prefix
-                target_username = new_username
-                send_content = colored_content
-                log_verbose(f"✅ Username fits, using: {target_username}")
-            else:
-                # Username too long, ALWAYS use base name and ALWAYS prefix message with user's name
-                target_username = base_name
-                send_content = f"{display_name}: {colored_content}"
-                log_verbose(f"📏 Username too long, using base name: {target_username}, prefixing with: {display_name}")
-            
-            # Queue message for high-performance relay (NEW QUEUE SYSTEM)
-            # Get user's custom character/pose if set (already batched in user_prefs)
-            char_id = None
-            p_id = None
-            if user_prefs['character']:
-                char_id = user_prefs['character']['character_id']
-                p_id = user_prefs['character']['pose_id']
+            log_verbose("🔍 Processing message from Discord user: %s (ID: %s) as %s", discord_name, user_id, target_username)
             
             # Queue the message - it will be processed by the background queue processor
-            message_queued = await self.objection_bot.queue_message(target_username, send_content, character_id=char_id, pose_id=p_id)
+            message_queued = await self.objection_bot.queue_message(target_username, send_content, character_id=char_id, pose_id=p_id,
+                                                                    received_at=received_at, source_message_id=message.id)
             
             if message_queued:
                 # Reset avatar embed tracking so next courtroom message shows an embed
                 # This allows Discord-to-courtroom conversations to alternate with avatar embeds
                 self.last_message_username = None
                 self.last_message_pose_id = None
-                log_verbose(f"🔄 Reset avatar tracking after Discord message")
+                log_verbose("🔄 Reset avatar tracking after Discord message")
                 
                 # Log the message in simple format for non-verbose mode
                 log_message("Discord", display_name, message.content if message.content else "[media]")
-                log_verbose(f"🔄 Discord → Queue: {target_username}: {send_content[:50]}...")
+                log_verbose("🔄 Discord → Queue: %s: %s...", target_username, send_content[:50])
             else:
-                log_verbose(f"❌ Failed to queue message to objection.lol")
+                log_verbose("❌ Failed to queue message to objection.lol")
             
             await self.cleanup_messages()
 
-    async def send_to_discord(self, username, message, character_id=None, pose_id=None):
-        """Send a message from objection.lol to Discord"""
+    async def send_to_discord(self, username, message, character_id=None, pose_id=None, stamps=None):
+        """Send a message from objection.lol to Discord (stamps: relay checkpoints for tracing)"""
         if self.bridge_channel:
             # Strip color codes before sending to Discord
             cleaned_message = self.strip_color_codes(message)
@@ -1900,7 +2752,7 @@ class DiscordCourtBot(discord.Client):
             bgm_ids = self.extract_bgm_commands(message)
             if bgm_ids:
                 if len(bgm_ids) > 3:
-                    log_verbose(f"⚠️ BGM spam detected: {len(bgm_ids)} commands in one message, limiting to 3")
+                    log_verbose("⚠️ BGM spam detected: %s commands in one message, limiting to 3", len(bgm_ids))
                     bgm_ids = bgm_ids[:3]
                 for bgm_id in bgm_ids:
                     music_data = await self.fetch_music_url(bgm_id)
@@ -1932,13 +2784,13 @@ class DiscordCourtBot(discord.Client):
                             inline=False
                         )
                         await self.bridge_channel.send(embed=music_embed)
-                        log_verbose(f"🎵 Posted music info for BGM {bgm_id}: '{music_data['name']}' -> {music_data['url']}")
+                        log_verbose("🎵 Posted music info for BGM %s: '%s' -> %s", bgm_id, music_data['name'], music_data['url'])
             
             # Check for SFX commands and fetch sound effect URLs (limit to 3 per message to prevent spam)
             sfx_ids = self.extract_sfx_commands(message)
             if sfx_ids:
                 if len(sfx_ids) > 3:
-                    log_verbose(f"⚠️ SFX spam detected: {len(sfx_ids)} commands in one message, limiting to 3")
+                    log_verbose("⚠️ SFX spam detected: %s commands in one message, limiting to 3", len(sfx_ids))
                     sfx_ids = sfx_ids[:3]
                 for sfx_id in sfx_ids:
                     sfx_data = await self.fetch_sfx_url(sfx_id)
@@ -1970,13 +2822,13 @@ class DiscordCourtBot(discord.Client):
                             inline=False
                         )
                         await self.bridge_channel.send(embed=sfx_embed)
-                        log_verbose(f"🔊 Posted sound effect info for SFX {sfx_id}: '{sfx_data['name']}' -> {sfx_data['url']}")
+                        log_verbose("🔊 Posted sound effect info for SFX %s: '%s' -> %s", sfx_id, sfx_data['name'], sfx_data['url'])
             
             # Check for evidence commands and fetch evidence data (limit to 3 per message to prevent spam)
             evidence_ids = self.extract_evidence_commands(message)
             if evidence_ids:
                 if len(evidence_ids) > 3:
-                    log_verbose(f"⚠️ Evidence spam detected: {len(evidence_ids)} commands in one message, limiting to 3")
+                    log_verbose("⚠️ Evidence spam detected: %s commands in one message, limiting to 3", len(evidence_ids))
                     evidence_ids = evidence_ids[:3]
                 for evidence_id in evidence_ids:
                     evidence_data = await self.fetch_evidence_data(evidence_id)
@@ -2015,7 +2867,7 @@ class DiscordCourtBot(discord.Client):
                             )
                         
                         await self.bridge_channel.send(embed=evidence_embed)
-                        log_verbose(f"📄 Posted evidence {evidence_id}: '{evidence_data['name']}' -> {evidence_data['url']}")
+                        log_verbose("📄 Posted evidence %s: '%s' -> %s", evidence_id, evidence_data['name'], evidence_data['url'])
             
             # Fetch character avatar if character_id and pose_id are provided
             avatar_url = None
@@ -2024,12 +2876,14 @@ class DiscordCourtBot(discord.Client):
                     avatar_data = await self.fetch_character_avatar(character_id, pose_id)
                     if avatar_data:
                         avatar_url = avatar_data['url']
-                        log_verbose(f"🎭 Fetched avatar for {avatar_data['character_name']} - {avatar_data['pose_name']}")
+                        log_verbose("🎭 Fetched avatar for %s - %s", avatar_data['character_name'], avatar_data['pose_name'])
                     else:
-                        log_verbose(f"⚠️ Could not fetch avatar for character {character_id}, pose {pose_id} - will send as plain text")
+                        log_verbose("⚠️ Could not fetch avatar for character %s, pose %s - will send as plain text", character_id, pose_id)
                 except Exception as e:
-                    log_verbose(f"⚠️ Error fetching avatar for character {character_id}, pose {pose_id}: {e} - will send as plain text")
+                    log_verbose("⚠️ Error fetching avatar for character %s, pose %s: %s - will send as plain text", character_id, pose_id, e)
                     avatar_url = None
+            if stamps is not None:
+                stamps['assets_done'] = time.monotonic()
             
             unix_timestamp = int(time.time())
             
@@ -2047,13 +2901,13 @@ class DiscordCourtBot(discord.Client):
             showing_new_avatar = self.show_avatars and avatar_url and (user_changed or pose_changed) and not contains_url
             
             if contains_url and avatar_url:
-                log_verbose(f"🔗 Message contains URL, skipping avatar embed to avoid conflicts with link preview")
+                log_verbose("🔗 Message contains URL, skipping avatar embed to avoid conflicts with link preview")
             
             # Edit the last avatar embed to plain text BEFORE sending new message
             # Scan the last 10 messages to find and convert any avatar embeds (more robust than tracking)
             if showing_new_avatar:
                 try:
-                    log_verbose(f"🔍 Scanning last 10 messages for avatar embeds to convert...")
+                    log_verbose("🔍 Scanning last 10 messages for avatar embeds to convert...")
                     converted_count = 0
                     async for message in self.bridge_channel.history(limit=10):
                         # Skip messages that aren't from the bot
@@ -2070,7 +2924,7 @@ class DiscordCourtBot(discord.Client):
                                 # Skip link preview embeds (they have embed.url set)
                                 # Avatar embeds are created with set_image() and don't have a URL field
                                 if embed.url:
-                                    log_verbose(f"⏭️ Skipping link preview embed: {embed.title}")
+                                    log_verbose("⏭️ Skipping link preview embed: %s", embed.title)
                                     continue
                                 
                                 # Skip system embeds (BGM, SFX, Evidence, notifications, etc.)
@@ -2083,7 +2937,7 @@ class DiscordCourtBot(discord.Client):
                                 is_system_embed = any(embed_title.startswith(prefix) for prefix in system_prefixes)
                                 
                                 if is_system_embed:
-                                    log_verbose(f"⏭️ Skipping system embed: {embed_title}")
+                                    log_verbose("⏭️ Skipping system embed: %s", embed_title)
                                     continue
                                 
                                 # This is an avatar embed - convert it to plain text
@@ -2103,17 +2957,17 @@ class DiscordCourtBot(discord.Client):
                                     formatted_plain = f"**{embed_username}**:\n-# <t:{msg_timestamp}:T>"
                                 await message.edit(content=formatted_plain, embeds=[])
                                 converted_count += 1
-                                log_verbose(f"✏️ Converted avatar embed from {embed_username} to plain text")
+                                log_verbose("✏️ Converted avatar embed from %s to plain text", embed_username)
                             except discord.NotFound:
-                                log_verbose(f"⚠️ Message was deleted during conversion")
+                                log_verbose("⚠️ Message was deleted during conversion")
                             except discord.Forbidden:
-                                log_verbose(f"⚠️ No permission to edit message")
+                                log_verbose("⚠️ No permission to edit message")
                             except Exception as e:
-                                log_verbose(f"⚠️ Failed to convert embed: {e}")
+                                log_verbose("⚠️ Failed to convert embed: %s", e)
                     if converted_count > 0:
-                        log_verbose(f"✅ Converted {converted_count} avatar embed(s) to plain text")
+                        log_verbose("✅ Converted %s avatar embed(s) to plain text", converted_count)
                 except Exception as e:
-                    log_verbose(f"⚠️ Error scanning for avatar embeds: {e}")
+                    log_verbose("⚠️ Error scanning for avatar embeds: %s", e)
             
             # Now send the new message - ALWAYS send even if there are errors
             try:
@@ -2133,7 +2987,7 @@ class DiscordCourtBot(discord.Client):
                     )
                     avatar_embed.set_image(url=avatar_url)
                     sent_message = await self.bridge_channel.send(embed=avatar_embed)
-                    log_verbose(f"🖼️ Sent message as embed with avatar (user_changed={user_changed}, pose_changed={pose_changed})")
+                    log_verbose("🖼️ Sent message as embed with avatar (user_changed=%s, pose_changed=%s)", user_changed, pose_changed)
                 else:
                     # Send as plain text without avatar (no avatar available OR same user+pose as last message)
                     formatted_message = f"**{username}**:\n{cleaned_message}\n-# <t:{unix_timestamp}:T>"
@@ -2141,7 +2995,7 @@ class DiscordCourtBot(discord.Client):
             except Exception as e:
                 # If embed sending fails (e.g., bad avatar URL), fall back to plain text
                 print(f"⚠️ Failed to send message as embed: {e}")
-                log_verbose(f"⚠️ Falling back to plain text for: {username}: {cleaned_message}")
+                log_verbose("⚠️ Falling back to plain text for: %s: %s", username, cleaned_message)
                 try:
                     formatted_message = f"**{username}**:\n{cleaned_message}\n-# <t:{unix_timestamp}:T>"
                     sent_message = await self.bridge_channel.send(formatted_message)
@@ -2149,6 +3003,10 @@ class DiscordCourtBot(discord.Client):
                     print(f"❌ Failed to send message even as plain text: {e2}")
                     return  # Exit early if we can't send at all
             
+            if stamps is not None:
+                stamps['posted'] = time.monotonic()
+                stamps['discord_message'] = sent_message.id
+            
             # Update tracking for next message
             self.last_discord_message = sent_message
             self.last_message_username = username
@@ -2156,7 +3014,7 @@ class DiscordCourtBot(discord.Client):
             
             # Log the message in simple format for non-verbose mode
             log_message("Chatroom", username, cleaned_message)
-            log_verbose(f"🔄 Objection → Discord: {username}: {cleaned_message}")
+            log_verbose("🔄 Objection → Discord: %s: %s", username, cleaned_message)
             
             # --- Ping detection: scan for @mentions and nickname matches in courtroom messages ---
             if self.config.get('settings', 'enable_pings'):
@@ -2189,14 +3047,14 @@ class DiscordCourtBot(discord.Client):
                                 # Clean old timestamps (older than 60 seconds)
                                 self._ping_rate_limit[uid] = [t for t in self._ping_rate_limit[uid] if now - t < 60]
                                 if len(self._ping_rate_limit[uid]) >= 3:
-                                    log_verbose(f"📢 Rate limited: skipping ping for user {uid} (3 pings in last 60s)")
+                                    log_verbose("📢 Rate limited: skipping ping for user %s (3 pings in last 60s)", uid)
                                     continue
                                 
                                 pinged_user_ids.add(uid)
                                 self._ping_rate_limit[uid].append(now)
                                 ping_message = f"📢 Courtroom user **{username}** pinged <@{uid}>"
                                 await self.bridge_channel.send(ping_message)
-                                log_verbose(f"📢 Ping nickname match: '{nick}' → user ID {uid}")
+                                log_verbose("📢 Ping nickname match: '%s' → user ID %s", nick, uid)
                                 break  # Only ping once per user even if multiple nicknames match
                     
                     # 2. Check for @username mentions (requires @ prefix, for guild member lookup)
@@ -2210,7 +3068,7 @@ class DiscordCourtBot(discord.Client):
                             if (member.name.lower() == mention_lower or 
                                 (member.display_name and member.display_name.lower() == mention_lower)):
                                 resolved_user_id = str(member.id)
-                                log_verbose(f"📢 Guild member match: @{mention_name} → {member.name} (ID: {member.id})")
+                                log_verbose("📢 Guild member match: @%s → %s (ID: %s)", mention_name, member.name, member.id)
                                 break
                         
                         # Send ping notification if resolved and not already pinged (by nickname or earlier @)
@@ -2220,16 +3078,16 @@ class DiscordCourtBot(discord.Client):
                                 self._ping_rate_limit[resolved_user_id] = []
                             self._ping_rate_limit[resolved_user_id] = [t for t in self._ping_rate_limit[resolved_user_id] if now - t < 60]
                             if len(self._ping_rate_limit[resolved_user_id]) >= 3:
-                                log_verbose(f"📢 Rate limited: skipping ping for @{mention_name} (3 pings in last 60s)")
+                                log_verbose("📢 Rate limited: skipping ping for @%s (3 pings in last 60s)", mention_name)
                                 continue
                             
                             pinged_user_ids.add(resolved_user_id)
                             self._ping_rate_limit[resolved_user_id].append(now)
                             ping_message = f"📢 Courtroom user **{username}** pinged <@{resolved_user_id}>"
                             await self.bridge_channel.send(ping_message)
-                            log_verbose(f"📢 Sent ping notification: {username} → <@{resolved_user_id}>")
+                            log_verbose("📢 Sent ping notification: %s → <@%s>", username, resolved_user_id)
                 except Exception as e:
-                    log_verbose(f"⚠️ Error processing pings: {e}")
+                    log_verbose("⚠️ Error processing pings: %s", e)
             
             # Clean up old messages if needed
             await self.cleanup_messages()
@@ -2254,6 +3112,20 @@ class DiscordCourtBot(discord.Client):
         sent_message = await self.bridge_channel.send(embed=embed)
         # Clean up old messages if needed
         await self.cleanup_messages()
+    async def send_join_digest(self, usernames, note=None):
+        """Send one embed for a batch of joins (raid mode)"""
+        if not self.bridge_channel or not self.config.get('settings', 'show_join_leave'):
+            return
+        names = ", ".join(f"**{name}**" for name in usernames)
+        if len(names) > 3500:
+            names = names[:3500].rsplit(", ", 1)[0] + ", …"
+        embed = discord.Embed(
+            title=f"🚨 {len(usernames)} Users Joined",
+            description=f"{note}\n\n{names}" if note else names,
+            color=0xff0000
+        )
+        await self.bridge_channel.send(embed=embed)
+        await self.cleanup_messages()
     async def send_username_change_notification(self, old_username, new_username):
         """Send username change notifications to Discord"""
         if not self.bridge_channel or not self.config.get('settings', 'show_join_leave'):
@@ -2290,17 +3162,17 @@ class DiscordCourtBot(discord.Client):
                     try:
                         await message.delete()
                         deleted_count += 1
-                        log_verbose(f"🧹 Deleted previous startup message")
+                        log_verbose("🧹 Deleted previous startup message")
                     except discord.NotFound:
                         pass  # Message already deleted
                     except Exception as e:
-                        log_verbose(f"⚠️ Failed to delete startup message: {e}")
+                        log_verbose("⚠️ Failed to delete startup message: %s", e)
             
             if deleted_count > 0:
-                log_verbose(f"🧹 Cleaned up {deleted_count} old startup message(s)")
+                log_verbose("🧹 Cleaned up %s old startup message(s)", deleted_count)
                 
         except Exception as e:
-            log_verbose(f"⚠️ Error during startup message cleanup: {e}")
+            log_verbose("⚠️ Error during startup message cleanup: %s", e)
 
     async def cleanup_messages(self):
         """Delete old messages to maintain message limit"""
@@ -2321,30 +3193,31 @@ class DiscordCourtBot(discord.Client):
                     continue
                 messages.append(message)
 
-            log_verbose(f"🔍 Found {len(messages)} messages in channel (excluding startup message)")
+            log_verbose("🔍 Found %s messages in channel (excluding startup message)", len(messages))
 
             # Only start deleting if we have more than max_messages + buffer_threshold
             deletion_threshold = max_messages + buffer_threshold
 
             if len(messages) > deletion_threshold:
                 messages_to_delete = messages[max_messages:]  # Get messages beyond the limit
-                log_verbose(f"🧹 Need to delete {len(messages_to_delete)} old messages (threshold: {deletion_threshold})")
+                log_verbose("🧹 Need to delete %s old messages (threshold: %s)", len(messages_to_delete), deletion_threshold)
 
                 deleted_count = 0
                 for message in messages_to_delete:
                     try:
                         await message.delete()
                         deleted_count += 1
+                        self.objection_bot.tracer.deleted(message.id)
                     except discord.NotFound:
                         pass  # Message already deleted
                     except discord.Forbidden:
                         log_verbose("⚠️ Bot lacks permission to delete this message")
                     except Exception as e:
-                        log_verbose(f"⚠️ Failed to delete message: {e}")
+                        log_verbose("⚠️ Failed to delete message: %s", e)
 
-                log_verbose(f"🧹 Successfully deleted {deleted_count} old messages")
+                log_verbose("🧹 Successfully deleted %s old messages", deleted_count)
             else:
-                log_verbose(f"✅ No cleanup needed ({len(messages)}/{deletion_threshold} messages, threshold not reached)")
+                log_verbose("✅ No cleanup needed (%s/%s messages, threshold not reached)", len(messages), deletion_threshold)
 
         except Exception as e:
             print(f"⚠️ Error during message cleanup: {e}")
@@ -2490,7 +3363,10 @@ class ObjectionBot:
         self.user_id = None
         self.message_queue = asyncio.Queue()  # Changed to async queue
         self.discord_bot = None
-        self.user_names = {}  # Changed from users to match existing code
+        self.room = RoomState()  # Users, moderators and bans with O(1) lookups
+        self._room_snapshot_task = None  # Pending debounced snapshot write
+        self._room_snapshot_delay = 5.0  # Seconds to coalesce changes before writing
+        self._room_snapshot_dirty = False  # Room changed since the last snapshot was taken
         
         # Connection management
         self.ping_interval = 25000  # Default ping interval in ms
@@ -2502,14 +3378,21 @@ class ObjectionBot:
         self.max_reconnect_attempts = 10
         self.reconnect_delay = 5  # seconds between attempts
         self.reconnect_task = None
+        self._watchdog_task = None  # Heartbeat watchdog for the current connection
+        
+        # Optional hot standby: a second handshaked connection promoted when the primary dies
+        self.standby = None  # CourtroomProtocolClient of the standby connection
+        self._standby_task = None
+        self._standby_user_id = None
+        self._own_user_ids = set()  # User IDs of our standby/retired connections (not real users)
         
         # Admin and moderation settings
         self.is_admin = False
-        self.current_mods = set()  # Set of current moderator user IDs
-        self.banned_users = []  # List of banned users (only available when admin)
         
         # Autoban patterns (regex patterns for automatic banning)
-        self.autoban_patterns = load_autobans()
+        self.prefs = get_preference_store()
+        self.autoban_patterns = self.prefs.load_list('autobans')
+        self.autoban_matcher = AutobanMatcher(self.autoban_patterns)
         
         # For Discord bridge compatibility and message queueing
         self._username_change_event = asyncio.Event()
@@ -2518,24 +3401,135 @@ class ObjectionBot:
         self._message_lock = asyncio.Lock()  # Lock to prevent concurrent message sends
         self._current_username = self.username  # Track current username
         
+        # Username change confirmation (server echoes update_user/update_room for our user_id)
+        self._username_change_sent_at = None  # Monotonic time the pending change was sent
+        self._username_confirm_samples = deque(maxlen=50)  # Recent confirmation latencies (seconds)
+        self._username_confirm_min_timeout = 0.3  # Never wait less than this for confirmation
+        self._username_confirm_max_timeout = 3.0  # Never wait more than this (also used before we have samples)
+        
         # Advanced message queue system for high-performance relay
         self._relay_queue = asyncio.Queue()  # Queue for Discord->Courtroom messages
         self._queue_processor_task = None  # Background task processing the queue
         self._last_queued_username = None  # Track last username to skip redundant changes
         
+        # Durable outbox - queued relay messages persist until the courtroom send succeeds
+        self.outbox = RelayOutbox(max_age=config.get('settings', 'outbox_max_age') or 300)
+        
         # Queue for Courtroom->Discord messages (ensures order is preserved)
         self._discord_send_queue = asyncio.Queue()
         self._discord_queue_processor_task = None
         
+        # Relay latency instrumentation (shown in /status and terminal 'status')
+        self.latency = LatencyStats()
+        # Sampled per-message trace spans; off unless trace_sample_rate / TRACE_SAMPLE_RATE is set
+        self.tracer = RelayTracer(sample_rate=config.get('settings', 'trace_sample_rate') or 0.0)
+        self._last_send_at = None  # Time the last chat message frame was written to the socket
+        
         # Pre-compile regex patterns for performance
         self._mention_pattern = re.compile(r'<@\d+>')
         self._color_code_pattern = re.compile(r'\[#/[a-zA-Z]\]|\[#/c[a-fA-F0-9]{6}\]|\[/#\]|\[#ts\d+\]')
+        
+        # Shared courtroom protocol client (handshake, heartbeat replies, event registry)
+        self.protocol = CourtroomProtocolClient(self.ping_interval, self.ping_timeout, log=log_verbose)
+        # Chat commands, mod requests and autobans can take seconds (HTTP lookups, username
+        # changes) - run them off the event lanes so later frames aren't held up. Handlers
+        # may run concurrently with each other and the relay processor, so every reply must
+        # go through send_as_bot, which holds _message_lock across the rename and the send
+        self.command_executor = BoundedExecutor("command", max_concurrent=4, max_pending=32)
+        # Paced ban queue for autoban sweeps (user IDs, deduplicated via _ban_queued)
+        self._ban_queue = deque()
+        self._ban_queued = set()
+        self._ban_queue_task = None
+        self._sweep_on_room_update = False  # Screen the next full user list (set on connect)
+        # Restored user_id/is_admin are provisional until this connection's me and
+        # update_room_admin (or owner_transfer) confirm them; bans wait until then
+        self._user_id_confirmed = False
+        self._admin_confirmed = False
+        self._sweep_deferred = False
+        # Join-rate raid detection: slow mode, digest join notifications and queued bans
+        self.raid = RaidDetector(threshold=config.get('settings', 'raid_join_threshold') or 8,
+                                 window=config.get('settings', 'raid_window') or 10,
+                                 cooldown=config.get('settings', 'raid_cooldown') or 60)
+        self._raid_task = None
+        self._raid_joins = []  # Usernames waiting for the next digest
+        self._room_slowmode = 0  # Last slow mode reported by the server
+        self._register_default_events()
+        self._register_metrics()
+        
+        # Start from the last known room state so early messages get real names
+        self._restore_room_snapshot()
+        self.room.on_change = self._schedule_room_snapshot
     
-    async def connect_to_room(self):
-        """Connect to the courtroom WebSocket using raw websockets"""
+    def _register_metrics(self):
+        """Gauges read at scrape time (nothing is recorded on the relay path)"""
+        metrics.gauge('courtbot_queue_depth{queue="relay"}', self._relay_queue.qsize)
+        metrics.gauge('courtbot_queue_depth{queue="discord_send"}', self._discord_send_queue.qsize)
+        metrics.gauge('courtbot_queue_depth{queue="outbox"}', lambda: len(self.outbox.pending))
+        metrics.gauge('courtbot_queue_depth{queue="ban"}', lambda: len(self._ban_queue))
+        metrics.gauge('courtbot_connected', lambda: int(self.connected))
+    
+    def _restore_room_snapshot(self):
+        """Load the saved room snapshot as provisional state (same room only)"""
+        snapshot = load_room_snapshot()
+        if not snapshot or snapshot.get('room_id') != self.room_id:
+            return
+        self.room.load_snapshot(snapshot)
+        self.user_id = snapshot.get('user_id')
+        self.is_admin = bool(snapshot.get('is_admin'))
+        age = time.time() - snapshot.get('saved_at', 0)
+        print(f"🗂️ Restored room snapshot from {age:.0f}s ago: {len(self.room)} users, {len(self.room.mods)} mods, "
+              f"{len(self.room.bans)} bans (provisional until the first room update)")
+    
+    def _room_snapshot(self):
+        snapshot = self.room.to_snapshot()
+        snapshot.update({
+            'room_id': self.room_id,
+            'user_id': self.user_id,
+            'is_admin': self.is_admin,
+            'saved_at': time.time(),
+        })
+        return snapshot
+    
+    def _schedule_room_snapshot(self):
+        """Debounced snapshot write - bursts of joins/renames produce one write"""
+        if self.room.provisional:
+            return  # Nothing new to save until the server confirms the room state
+        self._room_snapshot_dirty = True
+        if self._room_snapshot_task and not self._room_snapshot_task.done():
+            return  # The pending write re-checks the dirty flag once it's done
+        try:
+            self._room_snapshot_task = asyncio.get_running_loop().create_task(self._write_room_snapshot())
+        except RuntimeError:
+            pass  # No running loop (e.g. during startup) - the next change will schedule it
+    
+    async def _write_room_snapshot(self):
+        # Changes made while a write is in flight set the dirty flag again and get another pass
+        while self._room_snapshot_dirty:
+            await asyncio.sleep(self._room_snapshot_delay)
+            self._room_snapshot_dirty = False
+            # Temp file + rename on a worker thread so slow storage can't stall the event loop
+            await asyncio.to_thread(save_room_snapshot, self._room_snapshot())
+    
+    def flush_room_snapshot(self):
+        """Write the snapshot now (shutdown), cancelling any pending debounced write"""
+        if self._room_snapshot_task and not self._room_snapshot_task.done():
+            self._room_snapshot_task.cancel()
+        if not self.room.provisional and self.room:
+            self._room_snapshot_dirty = False
+            save_room_snapshot(self._room_snapshot())
+    
+    def _websocket_url(self):
+        # server_url points the bot at another server, e.g. courtroom_emulator.py for load tests
+        server_url = self.config.get('objection', 'server_url')
+        if server_url:
+            return f"{server_url.rstrip('/')}/?roomId={self.room_id}&username={self.username}&password=&EIO=4&transport=websocket"
         base_url = "wss://objection.lol"
         # Convert HTTP URL to WebSocket URL and construct with parameters
-        websocket_url = f"{base_url}/courtroom-api/socket.io/?roomId={self.room_id}&username={self.username}&password=&EIO=4&transport=websocket"
+        return f"{base_url}/courtroom-api/socket.io/?roomId={self.room_id}&username={self.username}&password=&EIO=4&transport=websocket"
+    
+    async def connect_to_room(self):
+        """Connect to the courtroom WebSocket using raw websockets"""
+        websocket_url = self._websocket_url()
         
         try:
             # Disconnect first if already connected
@@ -2543,65 +3537,16 @@ class ObjectionBot:
                 await self.graceful_disconnect()
                 await asyncio.sleep(2)  # Wait longer for clean disconnection
 
+            # Events still queued from the previous socket must not reach the handlers
+            await self._retire_connection()
+            
             print(f"🔌 Connecting to WebSocket: {websocket_url}")
             # Use default WebSocket settings, let server handle ping/pong
-            self.websocket = await websockets.connect(websocket_url)
-            print(f"✅ WebSocket connection established")
-            
-            # Wait for initial handshake message
-            print("⏳ Waiting for server handshake...")
-            initial_message = await self.websocket.recv()
-            print(f"📨 Received handshake: {initial_message}")
+            await self.protocol.connect(websocket_url)
+            print("✅ Handshake completed successfully")
+            await self._start_session()
             
-            if initial_message.startswith('0'):
-                # Parse ping interval and timeout from handshake
-                try:
-                    handshake_data = json.loads(initial_message[1:])
-                    self.ping_interval = handshake_data.get('pingInterval', self.ping_interval)
-                    self.ping_timeout = handshake_data.get('pingTimeout', self.ping_timeout)
-                    print(f"⏱️ Ping interval: {self.ping_interval}ms, Timeout: {self.ping_timeout}ms")
-                except:
-                    print("⚠️ Could not parse handshake data, using defaults")
-                
-                # Send handshake acknowledgment
-                print("🤝 Sending handshake acknowledgment...")
-                await self.websocket.send("40")
-                
-                # Wait for server response
-                response = await self.websocket.recv()
-                print(f"📨 Server response: {response}")
-                
-                if response.startswith('40'):
-                    print("✅ Handshake completed successfully")
-                    self.connected = True
-                    self.reconnect_attempts = 0  # Reset reconnect attempts on successful connection
-                    
-                    # Send "me" message to get user info
-                    print("🔍 Sending 'me' message...")
-                    await self.websocket.send('42["me"]')
-                    
-                    # Send "get_room" message to join/get room info
-                    print("🏠 Sending 'get_room' message...")
-                    await self.websocket.send('42["get_room"]')
-                    
-                    # Start the message processing loop only - let server handle ping/pong
-                    asyncio.create_task(self.message_loop())
-                    
-                    # Start the relay queue processor for high-performance message relay
-                    self._queue_processor_task = asyncio.create_task(self._process_relay_queue())
-                    print("🚀 Started high-performance message queue processor")
-                    
-                    # Start the Discord send queue processor (ensures message order)
-                    self._discord_queue_processor_task = asyncio.create_task(self._process_discord_queue())
-                    print("📤 Started Discord message queue processor")
-                    
-                    return True
-                else:
-                    print(f"❌ Unexpected response after handshake: {response}")
-                    return False
-            else:
-                print(f"❌ Unexpected initial message: {initial_message}")
-                return False
+            return True
             
         except Exception as e:
             print(f"❌ Connection failed: {e}")
@@ -2612,202 +3557,247 @@ class ObjectionBot:
                     pass
             return False
     
-    async def message_loop(self):
-        """Main message processing loop"""
-        try:
-            async for message in self.websocket:
-                await self.process_message(message)
-        except websockets.exceptions.ConnectionClosed:
-            print("🔌 WebSocket connection closed")
-            self.connected = False
-            # Start auto-reconnect if enabled
-            if self.auto_reconnect:
-                await self.start_auto_reconnect()
-        except Exception as e:
-            print(f"❌ Error in message loop: {e}")
-            self.connected = False
-            # Start auto-reconnect if enabled
-            if self.auto_reconnect:
-                await self.start_auto_reconnect()
+    async def _retire_connection(self):
+        """Close the protocol client's current connection: stop its lane workers (their
+        queued events are stale) and drop the socket without waiting on a close handshake"""
+        old_websocket, self.protocol.websocket = self.protocol.websocket, None
+        self.websocket = None  # The old reader and watchdog see they were superseded and exit quietly
+        await self.protocol.close()
+        if old_websocket is not None and old_websocket.close_code is None:
+            old_websocket.transport.abort()
     
-    async def process_message(self, message: str):
-        """Process incoming WebSocket messages"""
-        try:
-            # PRIORITY: Handle ping/pong FIRST to prevent disconnects during high load
-            # Server pings must be answered quickly or connection will be closed
-            if message.startswith('2'):
-                # Ping message from server, respond with pong IMMEDIATELY
-                await self.websocket.send("3")
-                log_verbose("📡 Received ping, sent pong")
-                return
-            
-            if message.startswith('3'):
-                # Pong message from server (response to our ping)
-                log_verbose("📡 Received pong")
-                return
+    async def _start_session(self):
+        """Bring up everything that runs on top of a freshly handshaked protocol connection"""
+        self.websocket = self.protocol.websocket
+        self.ping_interval = self.protocol.ping_interval
+        self.ping_timeout = self.protocol.ping_timeout
+        print(f"⏱️ Ping interval: {self.ping_interval}ms, Timeout: {self.ping_timeout}ms")
+        self.connected = True
+        self.reconnect_attempts = 0  # Reset reconnect attempts on successful connection
+        
+        # Send "me" message to get user info
+        print("🔍 Sending 'me' message...")
+        await self.protocol.send_event('me')
+        
+        # Send "get_room" message to join/get room info
+        print("🏠 Sending 'get_room' message...")
+        await self.protocol.send_event('get_room')
+        
+        # Fresh connection joins under the configured username
+        self._current_username = self.username
+        self._last_queued_username = None
+        
+        # Users who joined while we were away were never screened by autoban
+        self._sweep_on_room_update = True
+        self._user_id_confirmed = False
+        self._admin_confirmed = False
+        
+        # Start the message processing loop only - let server handle ping/pong
+        asyncio.create_task(self.message_loop())
+        
+        # Watch for the server going silent (half-open connections never raise on read)
+        if self._watchdog_task and not self._watchdog_task.done():
+            self._watchdog_task.cancel()
+        self._watchdog_task = asyncio.create_task(self.heartbeat_watchdog())
+        
+        # Stop processors left over from the previous connection (they may be
+        # parked on queue.get() and would otherwise run alongside the new ones)
+        for task in (self._queue_processor_task, self._discord_queue_processor_task):
+            if task and not task.done():
+                task.cancel()
+        
+        # Re-queue anything that was still pending in the durable outbox
+        self._replay_outbox()
+        
+        # Start the relay queue processor for high-performance message relay
+        self._queue_processor_task = asyncio.create_task(self._process_relay_queue())
+        print("🚀 Started high-performance message queue processor")
+        
+        # Start the Discord send queue processor (ensures message order)
+        self._discord_queue_processor_task = asyncio.create_task(self._process_discord_queue())
+        print("📤 Started Discord message queue processor")
+        
+        # Keep a spare connection warm for near-instant failover
+        if self.config.get('settings', 'hot_standby') and (not self._standby_task or self._standby_task.done()):
+            self._standby_task = asyncio.create_task(self._maintain_standby())
+    
+    async def _maintain_standby(self):
+        """Keep a handshaked spare connection open while the primary is up.
+        
+        The standby joins the room under the bot's username (the server has no way to hold
+        a connection without joining), only answers pings, and is promoted by
+        _promote_standby when the primary dies.
+        """
+        failures = 0
+        while self.auto_reconnect and self.config.get('settings', 'hot_standby'):
+            if not self.connected:
+                await asyncio.sleep(1)  # Primary is down; promotion or a cold reconnect is in progress
+                continue
             
-            if message.startswith('42["message"'):
-                # Handle chat messages
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1 and isinstance(data[1], dict):
-                            await self.handle_message(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for message: {e}")
-            
-            elif message.startswith('42["plain_message"'):
-                # Handle plain messages (no avatar/character)
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1 and isinstance(data[1], dict):
-                            await self.handle_plain_message(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for plain message: {e}")
-            
-            elif message.startswith('42["update_room"'):
-                # Handle room updates
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1:
-                            await self.handle_room_update(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for room update: {e}")
-            
-            elif message.startswith('42["me"'):
-                # Handle "me" response
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1:
-                            await self.handle_me_response(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for me response: {e}")
-            
-            elif message.startswith('42["user_joined"'):
-                # Handle user joined events
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1:
-                            await self.handle_user_joined(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for user joined: {e}")
-            
-            elif message.startswith('42["user_left"'):
-                # Handle user left events
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1:
-                            await self.handle_user_left(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for user left: {e}")
-            
-            elif message.startswith('42["update_user"'):
-                # Handle user update events
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 2:
-                            await self.handle_update_user(data[1], data[2])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for user update: {e}")
-            
-            elif message.startswith('42["create_pair"'):
-                # Handle pairing requests
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1:
-                            await self.handle_create_pair(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for create pair: {e}")
-            
-            elif message.startswith('42["owner_transfer"'):
-                # Handle owner/admin transfer events
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 2:
-                            await self.handle_owner_transfer(data[1], data[2])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for owner transfer: {e}")
-            
-            elif message.startswith('42["update_mods"'):
-                # Handle moderator list updates
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1:
-                            await self.handle_update_mods(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for update mods: {e}")
-            
-            elif message.startswith('42["update_room_admin"'):
-                # Handle admin-only room updates (includes ban list)
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1:
-                            await self.handle_update_room_admin(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for update_room_admin: {e}")
-            
-            elif message.startswith('42["add_evidence"'):
-                # Handle evidence added events
-                start = message.find('[')
-                if start > 0:
-                    json_str = message[start:]
-                    try:
-                        data = json.loads(json_str)
-                        if len(data) > 1:
-                            await self.handle_add_evidence(data[1])
-                    except json.JSONDecodeError as e:
-                        print(f"JSON decode error for add_evidence: {e}")
+            standby = CourtroomProtocolClient(self.ping_interval, self.ping_timeout, log=log_verbose)
+            
+            async def on_me(data):
+                self._standby_user_id = (data.get('user') or {}).get('id')
+                if self._standby_user_id:
+                    self._own_user_ids.add(self._standby_user_id)
+            standby.on('me', on_me, arg_type=dict)
             
-            # Note: ping/pong (messages starting with '2' or '3') are handled at the TOP
-            # of this function for priority processing
+            try:
+                self._standby_user_id = None
+                self.standby = standby
+                await standby.connect(self._websocket_url())
+                await standby.send_event('me')
+                print("🛟 Hot-standby connection ready")
+                failures = 0
+                await standby.run()
+            except asyncio.CancelledError:
+                raise  # Promoted or shutting down - the socket now belongs to someone else
+            except Exception as e:
+                log_verbose("⚠️ Hot-standby connection lost: %s", e)
             
+            if self.standby is standby:
+                self.standby = None
+            await standby.close()
+            failures += 1
+            await asyncio.sleep(min(self.reconnect_delay * (2 ** (failures - 1)), 60) * random.uniform(0.5, 1.5))
+    
+    async def _promote_standby(self):
+        """Swap the hot standby in as the primary connection; returns False if none is ready"""
+        standby = self.standby
+        if not standby or not standby.websocket or standby.websocket.close_code is not None or not self._standby_user_id:
+            return False
+        
+        print("🛟 Promoting hot-standby connection to primary...")
+        # Stop the standby reader first so only the new primary reads from the socket
+        self.standby = None
+        if self._standby_task and not self._standby_task.done():
+            self._standby_task.cancel()
+            try:
+                await self._standby_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        
+        # Retire the old primary; its leave event must not look like a real user leaving
+        if self.user_id:
+            self._own_user_ids.add(self.user_id)
+        await self._retire_connection()
+        
+        self.protocol.adopt(standby)
+        self.user_id = self._standby_user_id
+        self._own_user_ids.discard(self.user_id)
+        self._standby_user_id = None
+        # Admin/owner rights belong to the old user ID and do not carry over
+        self.is_admin = False
+        
+        await self._start_session()
+        print(f"✅ Hot-standby promoted (user ID {self.user_id[:8]})")
+        return True
+    
+    async def message_loop(self):
+        """Main message processing loop"""
+        websocket = self.websocket
+        try:
+            await self.protocol.run(self.process_message)
+        except websockets.exceptions.ConnectionClosed:
+            if self.websocket is not websocket:
+                return  # Superseded (e.g. closed by the heartbeat watchdog and already reconnected)
+            print("🔌 WebSocket connection closed")
+            self.connected = False
+            # Start auto-reconnect if enabled
+            if self.auto_reconnect:
+                await self.start_auto_reconnect()
+        except Exception as e:
+            if self.websocket is not websocket:
+                return
+            print(f"❌ Error in message loop: {e}")
+            self.connected = False
+            # Start auto-reconnect if enabled
+            if self.auto_reconnect:
+                await self.start_auto_reconnect()
+    
+    def register_event(self, event, handler, arity=1, arg_type=None, lane='default'):
+        """Register a Socket.IO event handler.
+        
+        arity is the number of event arguments passed to the handler; frames with fewer
+        arguments are ignored. If arg_type is given, the first argument must be of that type.
+        Handlers in the same lane run one at a time in frame order.
+        """
+        self.protocol.on(event, handler, arity, arg_type, lane)
+    
+    def _register_default_events(self):
+        """Populate the event registry with the built-in courtroom handlers"""
+        # Chat stays ordered in its own lane; room/user state events share another so joins,
+        # leaves and renames apply in order; admin transfers don't hold up either
+        self.register_event('message', self.handle_message, arg_type=dict, lane='chat')
+        self.register_event('plain_message', self.handle_plain_message, arg_type=dict, lane='chat')
+        self.register_event('update_room', self.handle_room_update, lane='room')
+        self.register_event('me', self.handle_me_response, lane='room')
+        self.register_event('user_joined', self.handle_user_joined, lane='room')
+        self.register_event('user_left', self.handle_user_left, lane='room')
+        self.register_event('update_user', self.handle_update_user, arity=2, lane='room')
+        self.register_event('create_pair', self.handle_create_pair, lane='room')
+        self.register_event('owner_transfer', self.handle_owner_transfer, arity=2, lane='admin')
+        self.register_event('update_mods', self.handle_update_mods, lane='room')
+        self.register_event('update_room_admin', self.handle_update_room_admin, lane='room')
+        self.register_event('add_evidence', self.handle_add_evidence, lane='room')
+    
+    async def process_message(self, message: str):
+        """Process incoming WebSocket messages"""
+        try:
+            # Pings are answered before any handler runs to prevent disconnects during high load
+            await self.protocol.handle_frame(message)
+            
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error for frame: {e}")
         except Exception as e:
             print(f"❌ Error processing message: {e}")
     
-    async def start_auto_reconnect(self):
+    async def heartbeat_watchdog(self):
+        """Declare the connection dead when the server goes silent for pingInterval + pingTimeout.
+        
+        The server pings every pingInterval, so a healthy connection never stays quiet that long;
+        a half-open TCP connection otherwise goes unnoticed until a send fails.
+        """
+        websocket = self.websocket
+        while self.connected and self.websocket is websocket:
+            deadline = self.protocol.heartbeat_deadline()
+            await asyncio.sleep(min(deadline / 4, 5))
+            if not self.connected or self.websocket is not websocket:
+                return
+            silence = self.protocol.silence()
+            if silence > deadline:
+                print(f"💀 No frames from server for {silence:.1f}s (limit {deadline:.1f}s) - connection is dead, reconnecting...")
+                self.connected = False
+                # Don't wait on a close handshake the dead peer will never answer
+                websocket.transport.abort()
+                if self.auto_reconnect:
+                    await self.start_auto_reconnect(immediate=True)
+                return
+    
+    async def start_auto_reconnect(self, immediate=False):
         """Start the auto-reconnect process"""
         if self.reconnect_task and not self.reconnect_task.done():
             return  # Already attempting to reconnect
         
-        self.reconnect_task = asyncio.create_task(self.auto_reconnect_loop())
+        self.reconnect_task = asyncio.create_task(self.auto_reconnect_loop(immediate))
     
-    async def auto_reconnect_loop(self):
-        """Auto-reconnect loop with exponential backoff"""
+    async def auto_reconnect_loop(self, immediate=False):
+        """Auto-reconnect loop: promote the hot standby if one is ready, otherwise reconnect
+        with jittered exponential backoff (first attempt without delay if immediate)"""
+        try:
+            if self.auto_reconnect and not self.connected and await self._promote_standby():
+                metrics.inc('courtbot_reconnects_total{kind="standby"}')
+                return
+        except Exception as e:
+            print(f"❌ Hot-standby promotion failed: {e}")
+        
         while self.auto_reconnect and not self.connected and self.reconnect_attempts < self.max_reconnect_attempts:
             self.reconnect_attempts += 1
-            delay = min(self.reconnect_delay * (2 ** (self.reconnect_attempts - 1)), 60)  # Max 60 seconds
+            if immediate and self.reconnect_attempts == 1:
+                delay = 0
+            else:
+                delay = min(self.reconnect_delay * (2 ** (self.reconnect_attempts - 1)), 60)  # Max 60 seconds
+                delay = round(delay * random.uniform(0.5, 1.5), 1)  # Jitter so restarts don't reconnect in lockstep
             
             print(f"🔄 Auto-reconnect attempt {self.reconnect_attempts}/{self.max_reconnect_attempts} in {delay} seconds...")
             await asyncio.sleep(delay)
@@ -2816,6 +3806,7 @@ class ObjectionBot:
                 success = await self.connect_to_room()
                 if success:
                     print("✅ Auto-reconnect successful!")
+                    metrics.inc('courtbot_reconnects_total{kind="full"}')
                     # Notify Discord of reconnection
                     if self.discord_bot and self.discord_bot.bridge_channel:
                         embed = discord.Embed(
@@ -2849,7 +3840,7 @@ class ObjectionBot:
 
         # Check for pairing request message
         if "Please pair with me CourtDog-sama" in text and self._pending_pair_request and user_id != self.user_id:
-            log_verbose(f"[PAIRING] Auto-accepting pairing due to message: {text}")
+            log_verbose("[PAIRING] Auto-accepting pairing due to message: %s", text)
             await self.accept_pairing(self._pending_pair_request)
             self._pending_pair_request = None
             return
@@ -2885,7 +3876,7 @@ class ObjectionBot:
         
         if has_mod_request and self.is_admin and user_id != self.user_id:
             print(f"[MOD] Mod request from user: {text}")
-            await self.handle_mod_request(user_id)
+            self.command_executor.submit(self.handle_mod_request(user_id))
             return
 
         # Check for chat commands (only if bot name doesn't contain "jr" - junior bots don't respond)
@@ -2896,65 +3887,56 @@ class ObjectionBot:
         if 'jr' not in bot_username:
             # !8ball command - skip if message contains 🎱 (prevents feedback loop)
             if '!8ball' in text_lower and '🎱' not in text:
-                await self.handle_8ball_command(user_id, text)
+                self.command_executor.submit(self.handle_8ball_command(user_id, text))
                 # Still relay the question to Discord, so don't return here
             
             # !slap command - skip if message contains 🐟 (prevents feedback loop)
             if '!slap' in text_lower and '🐟' not in text:
-                await self.handle_slap_command(user_id, text)
+                self.command_executor.submit(self.handle_slap_command(user_id, text))
             
             # !roll command - skip if message contains 🎲 (prevents feedback loop)
             if '!roll' in text_lower and '🎲' not in text:
-                await self.handle_roll_command(user_id, text)
+                self.command_executor.submit(self.handle_roll_command(user_id, text))
             
             # !need command - skip if message contains 🎯 (prevents feedback loop)
             if '!need' in text_lower and '🎯' not in text:
-                await self.handle_need_command(user_id, text)
+                self.command_executor.submit(self.handle_need_command(user_id, text))
             
             # !greed command - skip if message contains 💰 (prevents feedback loop)
             if '!greed' in text_lower and '💰' not in text:
-                await self.handle_greed_command(user_id, text)
+                self.command_executor.submit(self.handle_greed_command(user_id, text))
             
             # !bgm command - skip if message contains 🎵 (prevents feedback loop)
             if '!bgm' in text_lower and '🎵' not in text:
-                await self.handle_random_bgm_command(user_id, text)
+                self.command_executor.submit(self.handle_random_bgm_command(user_id, text))
             
             # !bgs command - skip if message contains 🔊 (prevents feedback loop)
             if '!bgs' in text_lower and '🔊' not in text:
-                await self.handle_random_bgs_command(user_id, text)
+                self.command_executor.submit(self.handle_random_bgs_command(user_id, text))
             
             # !evd command - skip if message contains 📄 (prevents feedback loop)
             if '!evd' in text_lower and '📄' not in text:
-                await self.handle_random_evd_command(user_id, text)
+                self.command_executor.submit(self.handle_random_evd_command(user_id, text))
 
         if user_id != self.user_id:
             # Check ignore patterns 
-            ignore_patterns = self.config.get('settings', 'ignore_patterns')
-            if any(pattern in text for pattern in ignore_patterns):
+            if self.config.is_ignored(text):
                 return
             
             # Ignore messages with Discord user mentions (<@numbers>)
             if self._mention_pattern.search(text):
-                log_verbose(f"🚫 Ignoring objection.lol message with user mention: {text[:50]}...")
+                log_verbose("🚫 Ignoring objection.lol message with user mention: %s...", text[:50])
                 return
             
             # Get username from our stored mapping
-            username = self.user_names.get(user_id)
-            # If we don't have the username, request room update and wait for response
+            username = self.room.get(user_id)
+            # If we don't have the username, request a room update but don't wait for it here -
+            # the Discord queue processor resolves the name once the refresh arrives
+            room_refresh = None
             if username is None:
-                log_verbose(f"🔄 Unknown user {user_id[:8]}, requesting room update...")
-                await self.websocket.send('42["get_room"]')
-                # Wait a moment for the room update to be processed
-                await asyncio.sleep(0.5)
-                # Try again after the refresh
-                username = self.user_names.get(user_id)
-                if username is None:
-                    # Still unknown after refresh, use fallback
-                    username = f"User-{user_id[:8]}"
-                    log_verbose(f"⚠️ User {user_id[:8]} still unknown after refresh, using fallback: {username}")
-                else:
-                    log_verbose(f"✅ Found username after refresh: {username}")
-            log_verbose(f"📨 Received: {username}: {text}")
+                log_verbose("🔄 Unknown user %s, requesting room update...", user_id[:8])
+                room_refresh = await self.protocol.request_room_refresh()
+            log_verbose("📨 Received: %s: %s", username or user_id[:8], text)
             # Queue message for Discord - uses a dedicated queue processor to:
             # 1. Not block the WebSocket loop (prevents ping timeout disconnects)
             # 2. Preserve message order (messages arrive in Discord in the same order)
@@ -2962,7 +3944,10 @@ class ObjectionBot:
                 # Extract character and pose IDs from the message data
                 character_id = message.get('characterId')
                 pose_id = message.get('poseId')
-                self.queue_discord_message(username, text, character_id, pose_id)
+                if username is None:
+                    self.queue_discord_unresolved_message(user_id, room_refresh, text, character_id, pose_id)
+                else:
+                    self.queue_discord_message(username, text, character_id, pose_id)
     
     async def handle_plain_message(self, data):
         """Handle plain messages (without avatar/character info)"""
@@ -2971,48 +3956,42 @@ class ObjectionBot:
         
         if user_id != self.user_id:
             # Check ignore patterns
-            ignore_patterns = self.config.get('settings', 'ignore_patterns')
-            if any(pattern in text for pattern in ignore_patterns):
+            if self.config.is_ignored(text):
                 return
             
             # Ignore messages with Discord user mentions (<@numbers>)
             if self._mention_pattern.search(text):
-                log_verbose(f"🚫 Ignoring objection.lol plain message with user mention: {text[:50]}...")
+                log_verbose("🚫 Ignoring objection.lol plain message with user mention: %s...", text[:50])
                 return
             
             # Get username from our stored mapping
-            username = self.user_names.get(user_id)
-            # If we don't have the username, request room update and wait for response
+            username = self.room.get(user_id)
+            # If we don't have the username, request a room update but don't wait for it here -
+            # the Discord queue processor resolves the name once the refresh arrives
+            room_refresh = None
             if username is None:
-                log_verbose(f"🔄 Unknown user {user_id[:8]}, requesting room update...")
-                await self.websocket.send('42["get_room"]')
-                # Wait a moment for the room update to be processed
-                await asyncio.sleep(0.5)
-                # Try again after the refresh
-                username = self.user_names.get(user_id)
-                if username is None:
-                    # Still unknown after refresh, use fallback
-                    username = f"User-{user_id[:8]}"
-                    log_verbose(f"⚠️ User {user_id[:8]} still unknown after refresh, using fallback: {username}")
-                else:
-                    log_verbose(f"✅ Found username after refresh: {username}")
-            log_verbose(f"📨 Received (plain): {username}: {text}")
+                log_verbose("🔄 Unknown user %s, requesting room update...", user_id[:8])
+                room_refresh = await self.protocol.request_room_refresh()
+            log_verbose("📨 Received (plain): %s: %s", username or user_id[:8], text)
             # Queue message for Discord - plain messages don't have character/pose info
             if self.discord_bot:
-                self.queue_discord_message(username, text, None, None)
+                if username is None:
+                    self.queue_discord_unresolved_message(user_id, room_refresh, text, None, None)
+                else:
+                    self.queue_discord_message(username, text, None, None)
     
     async def handle_room_update(self, data):
         """Handle room updates to get user information"""
         # Log the raw data structure for debugging
-        log_verbose(f"[DEBUG] Room update data keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
+        log_verbose("[DEBUG] Room update data keys: %s", list(data.keys()) if isinstance(data, dict) else 'Not a dict')
         
         # The data parameter IS the room object, users are nested inside it
         users = data.get('users', [])
         
         # Validate room update data - only process if we have valid user data
         if not isinstance(users, list):
-            log_verbose(f"⚠️ Invalid room update: users is not a list: {type(users)}")
-            log_verbose(f"[DEBUG] Full data structure: {data}")
+            log_verbose("⚠️ Invalid room update: users is not a list: %s", type(users))
+            log_verbose("[DEBUG] Full data structure: %s", data)
             return
             
         # Check if this looks like a valid room update with actual user data
@@ -3021,57 +4000,48 @@ class ObjectionBot:
             if isinstance(user, dict) and 'id' in user and 'username' in user:
                 valid_users.append(user)
         
-        log_verbose(f"[DEBUG] Found {len(users)} users in update, {len(valid_users)} valid users")
+        log_verbose("[DEBUG] Found %s users in update, %s valid users", len(users), len(valid_users))
         
         # Don't update user mapping if we got empty or invalid user data
         # This prevents losing all users due to incomplete server responses
-        if not valid_users and self.user_names:
-            log_verbose(f"⚠️ Received empty user list in room update - keeping existing user data")
-            log_verbose(f"👥 Existing users preserved: {list(self.user_names.values())}")
+        if not valid_users and self.room:
+            log_verbose("⚠️ Received empty user list in room update - keeping existing user data")
+            log_verbose("👥 Existing users preserved: %s", self.room.values())
             # Still process other room data like mods, but don't touch user mapping
         else:
-            # Build new username mapping from authoritative room data
-            # This ensures we don't have stale entries from users who left
-            old_user_names = self.user_names.copy()
-            new_user_names = {}
-            
-            # Build the new mapping with current room users
-            for user in valid_users:
-                user_id = user['id']
-                username = user['username']
-                new_user_names[user_id] = username
-                log_verbose(f"[DEBUG] Mapping user: {user_id[:8]}... → {username}")
-            
-            # Atomically replace the old mapping to avoid race conditions
-            self.user_names = new_user_names
+            # Apply the authoritative room data as a delta - stale entries from users who
+            # left are dropped, unchanged users are left alone
+            added, removed, renamed = self.room.apply_users(valid_users)
             
-            # Log if we cleared any stale entries
-            current_user_ids = set(self.user_names.keys())
-            old_user_ids = set(old_user_names.keys())
-            removed_users = old_user_ids - current_user_ids
-            added_users = current_user_ids - old_user_ids
+            if removed:
+                log_verbose("🧹 Cleaned up %s stale user entries: %s", len(removed), list(removed.values()))
             
-            if removed_users:
-                removed_usernames = [old_user_names.get(uid, f"User-{uid[:8]}") for uid in removed_users]
-                log_verbose(f"🧹 Cleaned up {len(removed_users)} stale user entries: {removed_usernames}")
+            if added:
+                log_verbose("➕ Added %s new users: %s", len(added), list(added.values()))
             
-            if added_users:
-                added_usernames = [new_user_names.get(uid, f"User-{uid[:8]}") for uid in added_users]
-                log_verbose(f"➕ Added {len(added_users)} new users: {added_usernames}")
+            if renamed:
+                log_verbose("✏️ Renamed %s users: %s", len(renamed), [f'{old} → {new}' for old, new in renamed.values()])
             
             # Log current users
             usernames = [user.get('username') for user in valid_users]
             print(f"👥 Users in room: {usernames}")
+            
+            if self._sweep_on_room_update:
+                self._sweep_on_room_update = False
+                self.sweep_autobans("reconnect")
+        
+        if isinstance(data.get('slowModeSeconds'), int):
+            self._room_slowmode = data['slowModeSeconds']
         
         # Handle existing moderators when joining room
         if 'mods' in data:
             existing_mods = data.get('mods', [])
             if existing_mods:
-                self.current_mods = set(existing_mods)
+                self.room.set_mods(existing_mods)
                 # Get usernames for logging
                 mod_usernames = []
                 for mod_id in existing_mods:
-                    username = self.user_names.get(mod_id, f"User-{mod_id[:8]}")
+                    username = self.room.get(mod_id, f"User-{mod_id[:8]}")
                     mod_usernames.append(username)
                 print(f"[MOD] Found existing moderators in room: {mod_usernames}")
             else:
@@ -3081,19 +4051,20 @@ class ObjectionBot:
         if self.user_id:
             for user in valid_users:
                 if user.get('id') == self.user_id and self._pending_username:
-                    if user.get('username') == self._pending_username:
-                        log_verbose(f"[DEBUG] Username for our user_id matched pending username: {self._pending_username}")
-                        self._username_change_event.set()
+                    self._confirm_username_change(user.get('username'))
     
     async def handle_me_response(self, data):
         """Handle 'me' response to get our user ID"""
         if 'user' in data and 'id' in data['user']:
             self.user_id = data['user']['id']
-            log_verbose(f"🤖 Bot ID: {self.user_id}")
+            self._user_id_confirmed = True
+            self._schedule_room_snapshot()
+            log_verbose("🤖 Bot ID: %s", self.user_id)
+            self._on_admin_confirmed()
     
     async def handle_user_joined(self, data):
         """Handle user_joined events"""
-        log_verbose(f"[DEBUG] Received user_joined: {data}")
+        log_verbose("[DEBUG] Received user_joined: %s", data)
 
         if isinstance(data, dict):
             user_id = data.get('id')
@@ -3101,27 +4072,33 @@ class ObjectionBot:
 
             if user_id and username:
                 # Add to our user mapping
-                self.user_names[user_id] = username
-
-                # Don't show notification for the bot itself
-                if user_id != self.user_id:
+                self.room[user_id] = username
+
+                # Don't show notification for the bot itself (or its hot-standby connection,
+                # which joins under the bot's username before its 'me' reply tells us its ID)
+                is_standby_join = self.standby is not None and username == self.username
+                if user_id != self.user_id and user_id not in self._own_user_ids and not is_standby_join:
+                    if self.raid.record_join(time.monotonic()):
+                        self._start_raid_mode()
+                    
                     # Check autoban patterns
                     matched_pattern = self.check_autoban(username)
-                    if matched_pattern and self.is_admin:
+                    log_verbose("[AUTOBAN] Checked '%s' in %.0fµs", username, self.autoban_matcher.last_eval * 1e6)
+                    if matched_pattern and self.is_admin and not self._can_ban():
+                        # Restored admin not confirmed yet - screen them in the deferred sweep
+                        print(f"⏳ AUTOBAN: User '{username}' matched pattern '{matched_pattern}' - waiting for admin confirmation")
+                        self._sweep_deferred = True
+                    elif matched_pattern and self.is_admin and self.raid.active:
+                        # Raid: batch bans through the paced queue (one announcement)
+                        print(f"🚫 AUTOBAN: User '{username}' matched pattern '{matched_pattern}' - queued (raid mode)")
+                        self.queue_ban(user_id)
+                        return
+                    elif matched_pattern and self.is_admin:
                         print(f"🚫 AUTOBAN: User '{username}' matched pattern '{matched_pattern}' - banning immediately...")
                         
-                        # Send "Ruff (Banned undesirable)" message to courtroom
-                        original_username = self.config.get('objection', 'bot_username')
-                        await self.change_username_and_wait(original_username)
-                        await self.send_message("Ruff (Banned undesirable)")
-                        
-                        # Execute the ban
-                        await self.create_ban(user_id)
-                        
-                        # Remove from user mapping since they're banned
-                        if user_id in self.user_names:
-                            del self.user_names[user_id]
-                        
+                        # The ban waits on a username change confirmed by a later room event,
+                        # so it must not run inside the room lane
+                        self.command_executor.submit(self._execute_autoban(user_id))
                         return  # Don't send join notification for banned users
                     elif matched_pattern and not self.is_admin:
                         print(f"⚠️ AUTOBAN: User '{username}' matched pattern '{matched_pattern}' but bot is not admin - cannot ban")
@@ -3129,46 +4106,172 @@ class ObjectionBot:
                     # Always show join messages, even in non-verbose mode
                     print(f"👋 User joined: {username}")
 
+                    if self.raid.active:
+                        self._raid_joins.append(username)  # Sent as a digest by _raid_mode
                     # Queue join notification for Discord (preserves order, doesn't block WebSocket)
-                    if self.discord_bot:
-                        current_users = list(self.user_names.values())
+                    elif self.discord_bot:
+                        current_users = list(self.room.values())
                         self.queue_discord_notification(username, "joined", current_users)
     
+    async def _execute_autoban(self, user_id):
+        """Announce and ban a user that matched an autoban pattern"""
+        # Send "Ruff (Banned undesirable)" message to courtroom (the ban goes ahead either way)
+        await self.send_as_bot("Ruff (Banned undesirable)")
+        
+        # Execute the ban
+        await self.create_ban(user_id)
+        
+        # Remove from user mapping since they're banned
+        if user_id in self.room:
+            del self.room[user_id]
+    
+    RAID_DIGEST_INTERVAL = 10  # Seconds between join digests while a raid is active
+    
+    def _start_raid_mode(self):
+        now = time.monotonic()
+        print(f"🚨 RAID: {self.raid.rate(now)} joins in {self.raid.window}s - slow mode on, join digests, batched bans")
+        if not self._raid_task or self._raid_task.done():
+            self._raid_task = asyncio.create_task(self._raid_mode())
+    
+    async def _raid_mode(self):
+        """Hold raid measures until the join rate has been quiet for the cooldown, then revert"""
+        raid_slowmode = self.config.get('settings', 'raid_slowmode') or 10
+        previous_slowmode = self._room_slowmode
+        applied_slowmode = False
+        if self.is_admin and previous_slowmode < raid_slowmode:
+            applied_slowmode = await self.update_room_slowmode(raid_slowmode)
+        note = "Join surge detected - " + (f"slow mode set to {raid_slowmode}s" if applied_slowmode else "join notifications batched")
+        try:
+            while time.monotonic() < self.raid.until:
+                await asyncio.sleep(min(self.RAID_DIGEST_INTERVAL, max(0.1, self.raid.until - time.monotonic())))
+                if self._raid_joins:
+                    self._flush_raid_digest(note)
+                    note = None
+        finally:
+            self.raid.active = False
+            self._flush_raid_digest(note)
+            if applied_slowmode and self.is_admin and self.connected:
+                await self.update_room_slowmode(previous_slowmode)
+            print(f"✅ RAID: Quiet for {self.raid.cooldown}s - normal join handling restored")
+    
+    def _flush_raid_digest(self, note=None):
+        usernames, self._raid_joins = self._raid_joins, []
+        if usernames and self.discord_bot:
+            try:
+                self._discord_send_queue.put_nowait(("join_digest", (usernames, note), {'enqueue': time.monotonic()}))
+            except Exception as e:
+                print(f"❌ Failed to queue Discord join digest: {e}")
+    
+    BAN_PACE = 0.5  # Seconds between create_ban frames from the ban queue
+    
+    def _can_ban(self):
+        """Admin rights confirmed on this connection (not just restored from the snapshot)"""
+        return self.is_admin and self._admin_confirmed and self._user_id_confirmed
+    
+    def _on_admin_confirmed(self):
+        """Run the sweep and ban queue that were held back while admin was provisional"""
+        if not self._can_ban():
+            return
+        if self._sweep_deferred:
+            self._sweep_deferred = False
+            self.sweep_autobans("admin confirmed")
+        if self._ban_queue and (not self._ban_queue_task or self._ban_queue_task.done()):
+            self._ban_queue_task = asyncio.create_task(self._process_ban_queue())
+    
+    def sweep_autobans(self, reason):
+        """Run the autoban matcher over everyone in the room and queue the matches for banning"""
+        if not self.is_admin or not self.autoban_patterns:
+            return 0
+        if not self._can_ban():
+            self._sweep_deferred = True  # Runs once the server confirms admin
+            log_verbose("[AUTOBAN] Sweep (%s) deferred until admin is confirmed", reason)
+            return 0
+        start = time.perf_counter()
+        matches = []
+        for user_id, username in self.room.items():
+            if user_id == self.user_id or user_id in self._own_user_ids:
+                continue
+            pattern = self.autoban_matcher.match(username)
+            if pattern:
+                matches.append((user_id, username, pattern))
+        elapsed = time.perf_counter() - start
+        log_verbose("[AUTOBAN] Swept %s users in %.1fms (%s)", len(self.room), elapsed * 1000, reason)
+        for user_id, username, pattern in matches:
+            print(f"🚫 AUTOBAN SWEEP: User '{username}' matched pattern '{pattern}' - queued for ban")
+            self.queue_ban(user_id)
+        return len(matches)
+    
+    def queue_ban(self, user_id):
+        """Add a user to the paced ban queue (no-op if already queued)"""
+        if user_id in self._ban_queued:
+            return
+        self._ban_queued.add(user_id)
+        self._ban_queue.append(user_id)
+        if not self._ban_queue_task or self._ban_queue_task.done():
+            self._ban_queue_task = asyncio.create_task(self._process_ban_queue())
+    
+    async def _process_ban_queue(self):
+        """Announce once, then send the queued create_ban frames BAN_PACE apart"""
+        announced = False
+        try:
+            while self._ban_queue and self._can_ban() and self.connected:
+                if not announced:
+                    count = len(self._ban_queue)
+                    await self.send_as_bot(f"Ruff (Banned {count} undesirable{'s' if count != 1 else ''})")
+                    announced = True
+                user_id = self._ban_queue.popleft()
+                self._ban_queued.discard(user_id)
+                if user_id not in self.room:
+                    continue  # Already left
+                if await self.create_ban(user_id):
+                    del self.room[user_id]
+                await asyncio.sleep(self.BAN_PACE)
+        finally:
+            # While admin is only provisional the queue is kept for _on_admin_confirmed
+            if self._ban_queue and not (self.is_admin and self.connected):
+                print(f"⚠️ AUTOBAN: Dropped {len(self._ban_queue)} queued ban(s) - lost admin or connection")
+                self._ban_queue.clear()
+                self._ban_queued.clear()
+    
     async def handle_user_left(self, user_id):
         """Handle user_left events"""
-        log_verbose(f"[DEBUG] Received user_left: {user_id}")
+        log_verbose("[DEBUG] Received user_left: %s", user_id)
 
-        if user_id and user_id in self.user_names:
-            username = self.user_names[user_id]
+        if user_id and user_id in self.room:
+            username = self.room[user_id]
 
-            # Don't show notification for the bot itself
-            if user_id != self.user_id:
+            # Don't show notification for the bot itself or its standby/retired connections
+            if user_id != self.user_id and user_id not in self._own_user_ids:
                 # Always show leave messages, even in non-verbose mode
                 print(f"👋 User left: {username}")
 
                 # Queue leave notification for Discord (preserves order, doesn't block WebSocket)
                 if self.discord_bot:
                     # Remove from mapping first, then get current users
-                    del self.user_names[user_id]
-                    current_users = list(self.user_names.values())
+                    del self.room[user_id]
+                    current_users = list(self.room.values())
                     self.queue_discord_notification(username, "left", current_users)
             else:
                 # Still remove from mapping even if it's the bot
-                del self.user_names[user_id]
+                del self.room[user_id]
     
     async def handle_update_user(self, user_id, user_data):
         """Handle user updates (username changes)"""
-        log_verbose(f"[DEBUG] Received update_user: user_id={user_id}, data={user_data}")
+        log_verbose("[DEBUG] Received update_user: user_id=%s, data=%s", user_id, user_data)
 
         if isinstance(user_data, dict) and user_id:
             new_username = user_data.get('username')
 
             if new_username:
                 # Get the old username before updating
-                old_username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+                old_username = self.room.get(user_id, f"User-{user_id[:8]}")
 
                 # Update our user mapping with the new username
-                self.user_names[user_id] = new_username
+                self.room[user_id] = new_username
+
+                # Server confirmation of our own pending username change
+                if user_id == self.user_id and self._pending_username:
+                    self._confirm_username_change(new_username)
 
                 # Don't show notification for the bot itself
                 if user_id != self.user_id:
@@ -3184,11 +4287,11 @@ class ObjectionBot:
                         if self.discord_bot:
                             self.queue_discord_username_change(old_username, new_username)
                     else:
-                        log_verbose(f"🤖 Court bot name change ignored: {old_username} → {new_username}")
+                        log_verbose("🤖 Court bot name change ignored: %s → %s", old_username, new_username)
     
     async def handle_create_pair(self, data):
         """Handle pairing requests"""
-        log_verbose(f"[PAIRING] Received create_pair: {data}")
+        log_verbose("[PAIRING] Received create_pair: %s", data)
         # Only respond if our user_id is in the pairs list
         pairs = data.get('pairs', [])
         if not self.user_id:
@@ -3196,15 +4299,19 @@ class ObjectionBot:
             return
         found = any(pair.get('userId') == self.user_id for pair in pairs)
         if not found:
-            log_verbose(f"[PAIRING] Ignoring create_pair: bot user_id {self.user_id} not in pairs.")
+            log_verbose("[PAIRING] Ignoring create_pair: bot user_id %s not in pairs.", self.user_id)
             return
+        self._pending_pair_request = data
+        # The rename is confirmed by update_user/update_room in this same room lane, so
+        # announce from the command executor instead of blocking the lane on it
+        self.command_executor.submit(self._announce_pair_request(data))
+    
+    async def _announce_pair_request(self, data):
+        """Forward a pairing request to Discord and prompt for it in the courtroom"""
         if self.discord_bot:
             await self.discord_bot.send_pairing_request_to_discord(data, self)
-        self._pending_pair_request = data
         # Revert to original bot username when speaking as the bot itself
-        original_username = self.config.get('objection', 'bot_username')
-        await self.change_username_and_wait(original_username)
-        await self.send_message("Ruff (You want to pair? Say exactly this: Please pair with me CourtDog-sama)")
+        await self.send_as_bot("Ruff (You want to pair? Say exactly this: Please pair with me CourtDog-sama)")
     
     async def handle_owner_transfer(self, new_owner_id, room_code):
         """Handle owner/admin transfer events"""
@@ -3214,6 +4321,11 @@ class ObjectionBot:
         if new_owner_id == self.user_id:
             print("🎯 Bot has been granted admin/owner status!")
             self.is_admin = True
+            self._admin_confirmed = True
+            self._schedule_room_snapshot()
+            
+            # Screen everyone already in the room now that we can ban
+            self.sweep_autobans("admin granted")
             
             # Initialize room settings with admin permissions
             print("[ADMIN] Initializing room settings...")
@@ -3228,7 +4340,7 @@ class ObjectionBot:
             # Turn off restricting evidence
             try:
                 update_data = {"restrictEvidence": False}
-                message = f'42["update_room",{json.dumps(update_data)}]'
+                message = encode_event('update_room', update_data)
                 await self.websocket.send(message)
                 print("[ADMIN] ✅ Disabled evidence restrictions")
             except Exception as e:
@@ -3252,9 +4364,11 @@ class ObjectionBot:
             if self.is_admin:
                 print("👑 CourtDog is no longer admin")
                 self.is_admin = False
+                self._admin_confirmed = False
+                self._schedule_room_snapshot()
             
             # Someone else received admin status
-            username = self.user_names.get(new_owner_id, f"User-{new_owner_id[:8]}")
+            username = self.room.get(new_owner_id, f"User-{new_owner_id[:8]}")
             print(f"👑 {username} has been granted admin/owner status")
             
             # Optional: Send notification to Discord about other admin changes
@@ -3272,12 +4386,12 @@ class ObjectionBot:
         
         # Update our current moderators list with what the server tells us
         if isinstance(mod_list, list):
-            self.current_mods = set(mod_list)
+            self.room.set_mods(mod_list)
             
             # Get usernames for logging
             mod_usernames = []
             for mod_id in mod_list:
-                username = self.user_names.get(mod_id, f"User-{mod_id[:8]}")
+                username = self.room.get(mod_id, f"User-{mod_id[:8]}")
                 mod_usernames.append(username)
             
             print(f"[MOD] Current moderators: {mod_usernames}")
@@ -3288,12 +4402,17 @@ class ObjectionBot:
         """Handle admin-only room updates (includes ban list and other admin settings)"""
         print(f"[ADMIN] Received update_room_admin: {admin_data}")
         
+        # Only admins receive this, so it confirms admin rights restored from the snapshot
+        if self.is_admin and not self._admin_confirmed:
+            self._admin_confirmed = True
+            self._on_admin_confirmed()
+        
         # Extract ban list if present
         if isinstance(admin_data, dict) and 'bans' in admin_data:
-            self.banned_users = admin_data['bans']
-            if self.banned_users:
-                print(f"[ADMIN] Updated ban list: {len(self.banned_users)} banned user(s)")
-                for ban in self.banned_users:
+            self.room.set_bans(admin_data['bans'])
+            if self.room.bans:
+                print(f"[ADMIN] Updated ban list: {len(self.room.bans)} banned user(s)")
+                for ban in self.room.bans:
                     username = ban.get('username', 'Unknown')
                     user_id = ban.get('id', 'Unknown')
                     print(f"  - {username} (ID: {user_id[:8]}...)")
@@ -3363,11 +4482,11 @@ class ObjectionBot:
     
     async def handle_mod_request(self, user_id):
         """Handle moderator request from a user"""
-        username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+        username = self.room.get(user_id, f"User-{user_id[:8]}")
         print(f"[MOD] Processing mod request from {username} ({user_id})")
         
         # Check if user is already a moderator
-        if user_id in self.current_mods:
+        if user_id in self.room.mods:
             print(f"[MOD] {username} is already a moderator")
             return
         
@@ -3382,12 +4501,12 @@ class ObjectionBot:
             return False
         
         # Check if user is still in the room
-        if user_id not in self.user_names:
+        if user_id not in self.room:
             print(f"[MOD] Cannot add moderator - user {user_id[:8]} not in room")
             return False
         
         # Add to current mods set
-        self.current_mods.add(user_id)
+        self.room.add_mod(user_id)
         
         # Update moderators on server
         return await self.update_moderators()
@@ -3405,10 +4524,10 @@ class ObjectionBot:
         try:
             # Send ban message via WebSocket
             ban_data = {"userId": user_id}
-            message = f'42["create_ban",{json.dumps(ban_data)}]'
+            message = encode_event('create_ban', ban_data)
             await self.websocket.send(message)
             
-            username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+            username = self.room.get(user_id, f"User-{user_id[:8]}")
             print(f"[BAN] Banned user: {username} ({user_id[:8]}...)")
             return True
         except Exception as e:
@@ -3430,19 +4549,15 @@ class ObjectionBot:
             return False
         
         try:
-            # Find and remove the user from the banned_users list
-            user_to_unban = None
-            for ban in self.banned_users:
-                if ban.get('id') == user_id:
-                    user_to_unban = ban
-                    break
+            # Find the user in the ban list
+            user_to_unban = self.room.ban_for(user_id)
             
             if not user_to_unban:
                 print(f"[UNBAN] User ID {user_id[:8]}... not found in ban list")
                 return False
             
             # Create new ban list without the unbanned user
-            new_bans = [ban for ban in self.banned_users if ban.get('id') != user_id]
+            new_bans = [ban for ban in self.room.bans if ban.get('id') != user_id]
             
             # Send update_room_admin message with the new ban list
             # Format: 42["update_room_admin",{"bans":[{"id":"...","username":"..."},...],"password":"","autoTransferAdmin":true},"roomCode"]
@@ -3451,12 +4566,12 @@ class ObjectionBot:
                 "password": "",  # Keep existing password (empty string means no change)
                 "autoTransferAdmin": True  # Keep auto-transfer enabled
             }
-            message = f'42["update_room_admin",{json.dumps(update_data)},"{self.room_id}"]'
+            message = encode_event('update_room_admin', update_data, self.room_id)
             await self.websocket.send(message)
             
             # Update local ban list
             username = user_to_unban.get('username', f"User-{user_id[:8]}")
-            self.banned_users = new_bans
+            self.room.set_bans(new_bans)
             print(f"[UNBAN] Unbanned user: {username} ({user_id[:8]}...)")
             return True
         except Exception as e:
@@ -3464,17 +4579,15 @@ class ObjectionBot:
             return False
     
     def check_autoban(self, username):
-        """Check if a username matches any autoban pattern"""
-        for pattern in self.autoban_patterns:
-            try:
-                # Try to match as regex pattern
-                if re.search(pattern, username, re.IGNORECASE):
-                    return pattern
-            except re.error:
-                # If regex is invalid, try exact match (case-insensitive)
-                if pattern.lower() == username.lower():
-                    return pattern
-        return None
+        """Check if a username matches any autoban pattern (returns the matched pattern)"""
+        if not self.autoban_patterns:
+            return None
+        return self.autoban_matcher.match(username)
+    
+    def set_autoban_patterns(self, patterns):
+        """Replace the autoban pattern list and recompile the matcher"""
+        self.autoban_patterns = list(patterns)
+        self.autoban_matcher.compile(self.autoban_patterns)
     
     async def update_moderators(self):
         """Update the moderator list on the server"""
@@ -3483,17 +4596,17 @@ class ObjectionBot:
             return False
         
         # Filter out users who are no longer in the room
-        valid_mods = [mod_id for mod_id in self.current_mods if mod_id in self.user_names]
-        self.current_mods = set(valid_mods)
+        valid_mods = [mod_id for mod_id in self.room.mods if mod_id in self.room]
+        self.room.set_mods(valid_mods)
         
         # Send update to server
         try:
             # Send as object with "mods" key, not array directly
             update_data = {"mods": valid_mods}
-            message = f'42["update_mods",{json.dumps(update_data)}]'
+            message = encode_event('update_mods', update_data)
             await self.websocket.send(message)
             
-            mod_usernames = [self.user_names.get(mod_id, f"User-{mod_id[:8]}") for mod_id in valid_mods]
+            mod_usernames = [self.room.get(mod_id, f"User-{mod_id[:8]}") for mod_id in valid_mods]
             print(f"[MOD] Updated moderators: {mod_usernames}")
             return True
         except Exception as e:
@@ -3537,18 +4650,14 @@ class ObjectionBot:
         ]
         
         response = random.choice(responses)
-        username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+        username = self.room.get(user_id, f"User-{user_id[:8]}")
         
         print(f"[8BALL] {username} asked: {text}")
         print(f"[8BALL] Response: {response}")
         
-        # Change to bot's default username for command responses
-        original_username = self.config.get('objection', 'bot_username')
-        await self.change_username_and_wait(original_username)
-        self._last_queued_username = None  # Reset so next Discord message changes username
-        
         # Send the response to the courtroom
-        await self.send_message(f"🎱 {response}")
+        if not await self.send_as_bot(f"🎱 {response}"):
+            return
         
         # Also send the response to Discord so Discord users see it
         if self.discord_bot and self.discord_bot.bridge_channel:
@@ -3565,7 +4674,7 @@ class ObjectionBot:
         # Strip color codes for clean command parsing
         text = self.strip_color_codes(text)
         
-        username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+        username = self.room.get(user_id, f"User-{user_id[:8]}")
         
         # Extract the target name after !slap
         text_lower = text.lower()
@@ -3613,13 +4722,9 @@ class ObjectionBot:
         
         print(f"[SLAP] {username} slapped {target}")
         
-        # Change to bot's default username for command responses
-        original_username = self.config.get('objection', 'bot_username')
-        await self.change_username_and_wait(original_username)
-        self._last_queued_username = None  # Reset so next Discord message changes username
-        
         # Send the response to the courtroom
-        await self.send_message(response)
+        if not await self.send_as_bot(response):
+            return
         
         # Also send the response to Discord
         if self.discord_bot and self.discord_bot.bridge_channel:
@@ -3635,7 +4740,7 @@ class ObjectionBot:
         # Strip color codes for clean command parsing
         text = self.strip_color_codes(text)
         
-        username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+        username = self.room.get(user_id, f"User-{user_id[:8]}")
         
         # Default range
         max_roll = 1000
@@ -3660,13 +4765,9 @@ class ObjectionBot:
         
         print(f"[ROLL] {username} rolled {result} (1-{max_roll})")
         
-        # Change to bot's default username for command responses
-        original_username = self.config.get('objection', 'bot_username')
-        await self.change_username_and_wait(original_username)
-        self._last_queued_username = None  # Reset so next Discord message changes username
-        
         # Send the response to the courtroom
-        await self.send_message(response)
+        if not await self.send_as_bot(response):
+            return
         
         # Also send the response to Discord
         if self.discord_bot and self.discord_bot.bridge_channel:
@@ -3682,20 +4783,16 @@ class ObjectionBot:
         # Strip color codes for clean command parsing
         text = self.strip_color_codes(text)
         
-        username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+        username = self.room.get(user_id, f"User-{user_id[:8]}")
         
         result = random.randint(1, 100)
         response = f"🎯 {username} rolls Need: {result}"
         
         print(f"[NEED] {username} rolled {result}")
         
-        # Change to bot's default username for command responses
-        original_username = self.config.get('objection', 'bot_username')
-        await self.change_username_and_wait(original_username)
-        self._last_queued_username = None  # Reset so next Discord message changes username
-        
         # Send the response to the courtroom
-        await self.send_message(response)
+        if not await self.send_as_bot(response):
+            return
         
         # Also send the response to Discord
         if self.discord_bot and self.discord_bot.bridge_channel:
@@ -3711,20 +4808,16 @@ class ObjectionBot:
         # Strip color codes for clean command parsing
         text = self.strip_color_codes(text)
         
-        username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+        username = self.room.get(user_id, f"User-{user_id[:8]}")
         
         result = random.randint(1, 100)
         response = f"💰 {username} rolls Greed: {result}"
         
         print(f"[GREED] {username} rolled {result}")
         
-        # Change to bot's default username for command responses
-        original_username = self.config.get('objection', 'bot_username')
-        await self.change_username_and_wait(original_username)
-        self._last_queued_username = None  # Reset so next Discord message changes username
-        
         # Send the response to the courtroom
-        await self.send_message(response)
+        if not await self.send_as_bot(response):
+            return
         
         # Also send the response to Discord
         if self.discord_bot and self.discord_bot.bridge_channel:
@@ -3737,7 +4830,7 @@ class ObjectionBot:
     
     async def handle_random_bgm_command(self, user_id, text):
         """Handle !bgm command - roll a random BGM and play it in the courtroom"""
-        username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+        username = self.room.get(user_id, f"User-{user_id[:8]}")
         
         print(f"[BGM] {username} requested random BGM")
         
@@ -3774,14 +4867,10 @@ class ObjectionBot:
             print(f"[BGM] Failed to find valid BGM after {total_attempts} attempts")
             return
         
-        # Change to bot's default username for command responses
-        original_username = self.config.get('objection', 'bot_username')
-        await self.change_username_and_wait(original_username)
-        self._last_queued_username = None  # Reset so next Discord message changes username
-        
         # Send the BGM command to the courtroom
         bgm_command = f"🎵 [#bgm{bgm_data['id']}]"
-        await self.send_message(bgm_command)
+        if not await self.send_as_bot(bgm_command):
+            return
         
         # Also send the response to Discord
         if self.discord_bot and self.discord_bot.bridge_channel:
@@ -3814,7 +4903,7 @@ class ObjectionBot:
     
     async def handle_random_bgs_command(self, user_id, text):
         """Handle !bgs command - roll a random BGS/SFX and play it in the courtroom"""
-        username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+        username = self.room.get(user_id, f"User-{user_id[:8]}")
         
         print(f"[BGS] {username} requested random BGS/SFX")
         
@@ -3851,14 +4940,10 @@ class ObjectionBot:
             print(f"[BGS] Failed to find valid BGS after {total_attempts} attempts")
             return
         
-        # Change to bot's default username for command responses
-        original_username = self.config.get('objection', 'bot_username')
-        await self.change_username_and_wait(original_username)
-        self._last_queued_username = None  # Reset so next Discord message changes username
-        
         # Send the BGS command to the courtroom
         bgs_command = f"🔊 [#bgs{bgs_data['id']}]"
-        await self.send_message(bgs_command)
+        if not await self.send_as_bot(bgs_command):
+            return
         
         # Also send the response to Discord
         if self.discord_bot and self.discord_bot.bridge_channel:
@@ -3891,7 +4976,7 @@ class ObjectionBot:
     
     async def handle_random_evd_command(self, user_id, text):
         """Handle !evd command - roll a random evidence and display it in the courtroom"""
-        username = self.user_names.get(user_id, f"User-{user_id[:8]}")
+        username = self.room.get(user_id, f"User-{user_id[:8]}")
         
         print(f"[EVD] {username} requested random evidence")
         
@@ -3928,14 +5013,10 @@ class ObjectionBot:
             print(f"[EVD] Failed to find valid evidence after {total_attempts} attempts")
             return
         
-        # Change to bot's default username for command responses
-        original_username = self.config.get('objection', 'bot_username')
-        await self.change_username_and_wait(original_username)
-        self._last_queued_username = None  # Reset so next Discord message changes username
-        
         # Send the evidence command to the courtroom
         evd_command = f"📄 [#evd{evd_data['id']}]"
-        await self.send_message(evd_command)
+        if not await self.send_as_bot(evd_command):
+            return
         
         # Also send the response to Discord
         if self.discord_bot and self.discord_bot.bridge_channel:
@@ -3989,33 +5070,53 @@ class ObjectionBot:
                     print("📋 Queue processor received shutdown signal")
                     break
                 
-                username, message_text, character_id, pose_id = queue_item
+                outbox_id, username, message_text, character_id, pose_id, stamps = queue_item
+                stamps['dequeue'] = time.monotonic()
+                self.latency.record('d2c_queue', stamps['dequeue'] - stamps['enqueue'])
                 
                 # Use lock to ensure the entire sequence is atomic
                 async with self._message_lock:
-                    # Only change username if it's different from the last one
-                    # This optimization skips username changes when same user sends multiple messages
-                    if username != self._last_queued_username:
-                        log_verbose(f"[QUEUE] Username change needed: {self._last_queued_username} → {username}")
+                    # Only change username if it differs from the confirmed current one
+                    # (commands and other out-of-band renames update _current_username too)
+                    if username != self._current_username:
+                        log_verbose("[QUEUE] Username change needed: %s → %s", self._current_username, username)
                         success = await self._send_username_change(username)
                         if not success:
-                            log_verbose(f"[QUEUE] Failed to change username, skipping message")
+                            if self.connected:
+                                log_verbose("[QUEUE] Failed to change username, skipping message")
+                                self.outbox.ack(outbox_id)
+                            else:
+                                log_verbose("[QUEUE] Disconnected during username change, message kept in outbox")
+                            self.tracer.finish(stamps, 'd2c', 'username_failed' if self.connected else 'disconnected',
+                                               user=username, outbox=outbox_id, source_message=stamps.get('source_message'))
                             self._relay_queue.task_done()
                             continue
                         self._last_queued_username = username
                     else:
                         # Same user - skip username change but still add delay for server processing
-                        log_verbose(f"[QUEUE] Username unchanged ({username}), skipping username change")
+                        log_verbose("[QUEUE] Username unchanged (%s), skipping username change", username)
                         await asyncio.sleep(0.08)  # Small delay for server processing
+                    stamps['username_done'] = time.monotonic()
+                    self.latency.record('d2c_username', stamps['username_done'] - stamps['dequeue'])
                     
                     # Send the message with rate limit protection
                     # Courtroom has 1 message per second rate limit per user account
                     success = await self._send_message_internal(message_text, character_id, pose_id, enforce_rate_limit=True)
                 
                 if success:
-                    log_verbose(f"[QUEUE] ✓ Sent: {username}: {message_text[:50]}...")
+                    self.outbox.ack(outbox_id)
+                    stamps['sent'] = self._last_send_at
+                    self.latency.record('d2c_send', stamps['sent'] - stamps['username_done'])
+                    self.latency.record('d2c_total', stamps['sent'] - (stamps.get('ingress') or stamps['enqueue']))
+                    metrics.inc('courtbot_messages_relayed_total{direction="discord_to_court"}')
+                    log_verbose("[QUEUE] ✓ Sent: %s: %s...", username, message_text[:50])
+                elif self.connected:
+                    self.outbox.ack(outbox_id)
+                    log_verbose("[QUEUE] ✗ Failed to send message from %s", username)
                 else:
-                    log_verbose(f"[QUEUE] ✗ Failed to send message from {username}")
+                    log_verbose("[QUEUE] ✗ Disconnected, message from %s kept in outbox for replay", username)
+                self.tracer.finish(stamps, 'd2c', 'sent' if success else ('send_failed' if self.connected else 'disconnected'),
+                                   user=username, outbox=outbox_id, source_message=stamps.get('source_message'))
                 
                 # Mark task as done
                 self._relay_queue.task_done()
@@ -4048,18 +5149,38 @@ class ObjectionBot:
                     break
                 
                 # Unpack the queue item
-                send_type, args = queue_item
+                send_type, args, stamps = queue_item
+                stamps['dequeue'] = time.monotonic()
                 
                 try:
+                    if send_type == "unresolved_message":
+                        # Sender wasn't in the user list yet - wait (in order) for the room refresh
+                        user_id, room_refresh, text, character_id, pose_id = args
+                        username = await self._resolve_username(user_id, room_refresh)
+                        stamps['resolved'] = time.monotonic()
+                        send_type, args = "message", (username, text, character_id, pose_id)
+                    
                     if send_type == "message" and self.discord_bot:
                         username, text, character_id, pose_id = args
-                        await self.discord_bot.send_to_discord(username, text, character_id, pose_id)
+                        try:
+                            await self.discord_bot.send_to_discord(username, text, character_id, pose_id, stamps=stamps)
+                        finally:
+                            self.tracer.finish(stamps, 'c2d', 'posted' if 'posted' in stamps else 'failed',
+                                               user=username, discord_message=stamps.get('discord_message'))
+                        sent_at = time.monotonic()
+                        self.latency.record('c2d_queue', stamps['dequeue'] - stamps['enqueue'])
+                        self.latency.record('c2d_send', sent_at - stamps['dequeue'])
+                        self.latency.record('c2d_total', sent_at - (stamps.get('ingress') or stamps['enqueue']))
+                        metrics.inc('courtbot_messages_relayed_total{direction="court_to_discord"}')
                     elif send_type == "user_notification" and self.discord_bot:
                         username, action, user_list = args
                         await self.discord_bot.send_user_notification(username, action, user_list)
                     elif send_type == "username_change" and self.discord_bot:
                         old_username, new_username = args
                         await self.discord_bot.send_username_change_notification(old_username, new_username)
+                    elif send_type == "join_digest" and self.discord_bot:
+                        usernames, note = args
+                        await self.discord_bot.send_join_digest(usernames, note)
                 except Exception as e:
                     print(f"❌ Error sending to Discord: {e}")
                 
@@ -4078,30 +5199,119 @@ class ObjectionBot:
     def queue_discord_message(self, username, text, character_id=None, pose_id=None):
         """Queue a message to be sent to Discord (preserves order)"""
         try:
-            self._discord_send_queue.put_nowait(("message", (username, text, character_id, pose_id)))
+            stamps = {'ingress': self.protocol.frame_received_at(), 'enqueue': time.monotonic()}
+            self.tracer.start(stamps)
+            self._discord_send_queue.put_nowait(("message", (username, text, character_id, pose_id), stamps))
         except Exception as e:
             print(f"❌ Failed to queue Discord message: {e}")
     
+    def queue_discord_unresolved_message(self, user_id, room_refresh, text, character_id=None, pose_id=None):
+        """Queue a message whose sender name is resolved after the pending room refresh"""
+        try:
+            stamps = {'ingress': self.protocol.frame_received_at(), 'enqueue': time.monotonic()}
+            self.tracer.start(stamps)
+            self._discord_send_queue.put_nowait(("unresolved_message", (user_id, room_refresh, text, character_id, pose_id), stamps))
+        except Exception as e:
+            print(f"❌ Failed to queue Discord message: {e}")
+    
+    async def _resolve_username(self, user_id, room_refresh, timeout=2.0):
+        """Look up a username, waiting for an outstanding room refresh if needed"""
+        username = self.room.get(user_id)
+        if username is None and room_refresh is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(room_refresh), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            username = self.room.get(user_id)
+            if username is not None:
+                log_verbose("✅ Found username after refresh: %s", username)
+        if username is None:
+            # Still unknown after refresh, use fallback
+            username = f"User-{user_id[:8]}"
+            log_verbose("⚠️ User %s still unknown after refresh, using fallback: %s", user_id[:8], username)
+        return username
+    
     def queue_discord_notification(self, username, action, user_list=None):
         """Queue a user notification to be sent to Discord (preserves order)"""
         try:
-            self._discord_send_queue.put_nowait(("user_notification", (username, action, user_list)))
+            self._discord_send_queue.put_nowait(("user_notification", (username, action, user_list), {'enqueue': time.monotonic()}))
         except Exception as e:
             print(f"❌ Failed to queue Discord notification: {e}")
     
     def queue_discord_username_change(self, old_username, new_username):
         """Queue a username change notification to be sent to Discord (preserves order)"""
         try:
-            self._discord_send_queue.put_nowait(("username_change", (old_username, new_username)))
+            self._discord_send_queue.put_nowait(("username_change", (old_username, new_username), {'enqueue': time.monotonic()}))
         except Exception as e:
             print(f"❌ Failed to queue Discord username change: {e}")
     
+    def _confirm_username_change(self, username):
+        """Resolve the pending username change if the server reports our new name"""
+        if username != self._pending_username or self._username_change_event.is_set():
+            return
+        if self._username_change_sent_at is not None:
+            latency = time.monotonic() - self._username_change_sent_at
+            self._username_confirm_samples.append(latency)
+            log_verbose("[DEBUG] Username change to %s confirmed in %.0fms", username, latency * 1000)
+        self._username_change_event.set()
+    
+    def _username_confirm_timeout(self):
+        """Adaptive confirmation timeout learned from recently observed confirmation latency"""
+        samples = sorted(self._username_confirm_samples)
+        if len(samples) < 5:
+            return self._username_confirm_max_timeout
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        # Allow generous headroom over p95 so a slightly slow server doesn't cause false failures
+        return max(self._username_confirm_min_timeout, min(p95 * 2 + 0.1, self._username_confirm_max_timeout))
+    
+    async def _request_username_change(self, new_username):
+        """Send change_username and wait until the server confirms it for our user_id.
+        
+        Returns True once the server has echoed the new name back (via update_user or
+        update_room). Returns False if confirmation never arrives, in which case the
+        current username is treated as unknown so nothing is sent under a stale name.
+        Callers must hold _message_lock or otherwise guarantee sequential execution.
+        """
+        if not self.user_id:
+            print("❌ Cannot confirm username change - bot user ID not known yet")
+            return False
+        
+        self._pending_username = new_username
+        self._username_change_event.clear()
+        self._username_change_sent_at = time.monotonic()
+        
+        message_data = {"username": new_username}
+        message = encode_event('change_username', message_data)
+        await self.websocket.send(message)
+        
+        timeout = self._username_confirm_timeout()
+        try:
+            await asyncio.wait_for(self._username_change_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            # The echo may have been missed - ask for authoritative room state once
+            log_verbose("⚠️ No confirmation for username %s after %.2fs, requesting room update...", new_username, timeout)
+            try:
+                await self.protocol.send_event('get_room')
+                await asyncio.wait_for(self._username_change_event.wait(), timeout=self._username_confirm_max_timeout)
+            except (asyncio.TimeoutError, Exception):
+                print(f"❌ Username change to {new_username} was not confirmed by the server")
+                self._current_username = None  # Unknown - force a fresh change next time
+                self._pending_username = None
+                self._username_change_sent_at = None
+                return False
+        
+        metrics.inc('courtbot_username_changes_total')
+        self._current_username = new_username
+        self._pending_username = None
+        self._username_change_sent_at = None
+        return True
+    
     async def _send_username_change(self, new_username):
         """Internal method to change username (used by queue processor)"""
         # No lock needed - queue processor ensures sequential execution
         # Skip if username is already current
         if self._current_username == new_username:
-            log_verbose(f"[DEBUG] Username already set to {new_username}, skipping change")
+            log_verbose("[DEBUG] Username already set to %s, skipping change", new_username)
             return True
         
         # Check if WebSocket is still connected
@@ -4110,20 +5320,10 @@ class ObjectionBot:
             return False
         
         try:
-            # Send username change via WebSocket
-            message_data = {"username": new_username}
-            message = f'42["change_username",{json.dumps(message_data)}]'
-            await self.websocket.send(message)
-            
-            # Username changes are also subject to the 1-second rate limit
-            # Wait for both propagation AND rate limit
-            await asyncio.sleep(1.0)
-            
-            # Update current username tracking
-            self._current_username = new_username
-            return True
+            # Wait for the server to confirm the new name instead of sleeping blindly
+            return await self._request_username_change(new_username)
         except Exception as e:
-            log_verbose(f"❌ Username change failed: {e}")
+            log_verbose("❌ Username change failed: %s", e)
             return False
     
     async def _send_message_internal(self, text, character_id=None, pose_id=None, enforce_rate_limit=False):
@@ -4142,8 +5342,9 @@ class ObjectionBot:
         }
         
         try:
-            message = f'42["message",{json.dumps(message_data)}]'
+            message = encode_event('message', message_data)
             await self.websocket.send(message)
+            self._last_send_at = time.monotonic()
             
             # Courtroom enforces 1 message per second rate limit per user account
             # For queued Discord messages, we must respect this 1-second limit
@@ -4154,82 +5355,92 @@ class ObjectionBot:
                 await asyncio.sleep(0.05)  # Minimal delay for direct messages
             return True
         except Exception as e:
-            log_verbose(f"❌ Send failed: {e}")
+            log_verbose("❌ Send failed: %s", e)
             return False
     
-    async def queue_message(self, username, message_text, character_id=None, pose_id=None):
+    async def queue_message(self, username, message_text, character_id=None, pose_id=None, received_at=None, source_message_id=None):
         """
         Queue a message for high-performance relay.
         Messages are processed in order by the background queue processor.
+        received_at is the monotonic time the message arrived (for latency stats);
+        source_message_id is the Discord message it came from (for tracing).
         """
         try:
-            await self._relay_queue.put((username, message_text, character_id, pose_id))
-            log_verbose(f"[QUEUE] Queued message from {username} (queue size: {self._relay_queue.qsize()})")
+            outbox_id = self.outbox.add(username, message_text, character_id, pose_id)
+            stamps = {'ingress': received_at, 'enqueue': time.monotonic()}
+            if self.tracer.start(stamps) and source_message_id:
+                stamps['source_message'] = source_message_id
+            await self._relay_queue.put((outbox_id, username, message_text, character_id, pose_id, stamps))
+            log_verbose("[QUEUE] Queued message from %s (queue size: %s)", username, self._relay_queue.qsize())
             return True
         except Exception as e:
             print(f"❌ Failed to queue message: {e}")
             return False
     
+    def _replay_outbox(self):
+        """Rebuild the relay queue from the durable outbox, preserving order"""
+        # Drop in-memory copies (and stale shutdown sentinels) - the outbox is the source of truth
+        while not self._relay_queue.empty():
+            self._relay_queue.get_nowait()
+            self._relay_queue.task_done()
+        
+        entries = self.outbox.pending_entries()
+        for entry in entries:
+            stamps = {'enqueue': time.monotonic()}
+            self._relay_queue.put_nowait((entry['id'], entry['username'], entry['text'], entry['character_id'], entry['pose_id'], stamps))
+        if entries:
+            print(f"📮 Replaying {len(entries)} pending message(s) from outbox")
+    
     async def change_username_and_wait(self, new_username, timeout=2.0):
         """Change the bot's username using WebSocket with proper locking"""
         # Use lock to ensure username changes happen sequentially
         async with self._message_lock:
-            log_verbose(f"[DEBUG] Requesting username change to: {new_username}")
-            
-            # Skip if username is already current
-            if self._current_username == new_username:
-                log_verbose(f"[DEBUG] Username already set to {new_username}, skipping change")
-                return True
-            
-            # Check if WebSocket is still connected
-            if not self.connected:
-                log_verbose("❌ Cannot change username - Bot marked as disconnected")
-                # Trigger auto-reconnect if not already in progress
-                if self.auto_reconnect:
-                    await self.start_auto_reconnect()
-                return False
-                
-            if not self.websocket:
-                print("❌ Cannot change username - WebSocket is None")
-                self.connected = False
-                # Trigger auto-reconnect if not already in progress
-                if self.auto_reconnect:
-                    await self.start_auto_reconnect()
-                return False
-                
-            if self.websocket.close_code is not None:
-                print(f"❌ Cannot change username - WebSocket closed with code {self.websocket.close_code}")
-                self.connected = False
-                # Trigger auto-reconnect if not already in progress
-                if self.auto_reconnect:
-                    await self.start_auto_reconnect()
-                return False
-                
-            self._pending_username = new_username
-            self._username_change_event.clear()
-            
-            try:
-                # Send username change via WebSocket
-                message_data = {"username": new_username}
-                message = f'42["change_username",{json.dumps(message_data)}]'
-                await self.websocket.send(message)
-                
-                # Reduced delay for faster username propagation (was 0.15s)
-                # This is still safe but improves message throughput
-                await asyncio.sleep(0.08)
-                
-                # Update current username tracking
-                self._current_username = new_username
-                self._pending_username = None
-                return True
-            except Exception as e:
-                print(f"❌ Username change failed: {e}")
-                self.connected = False
-                # Trigger auto-reconnect if not already in progress
-                if self.auto_reconnect:
-                    await self.start_auto_reconnect()
-                return False
+            return await self._change_username_locked(new_username)
     
+    async def _change_username_locked(self, new_username):
+        """change_username_and_wait body; the caller holds _message_lock"""
+        log_verbose("[DEBUG] Requesting username change to: %s", new_username)
+
+        # Skip if username is already current
+        if self._current_username == new_username:
+            log_verbose("[DEBUG] Username already set to %s, skipping change", new_username)
+            return True
+
+        # Check if WebSocket is still connected
+        if not self.connected:
+            log_verbose("❌ Cannot change username - Bot marked as disconnected")
+            # Trigger auto-reconnect if not already in progress
+            if self.auto_reconnect:
+                await self.start_auto_reconnect()
+            return False
+
+        if not self.websocket:
+            print("❌ Cannot change username - WebSocket is None")
+            self.connected = False
+            # Trigger auto-reconnect if not already in progress
+            if self.auto_reconnect:
+                await self.start_auto_reconnect()
+            return False
+
+        if self.websocket.close_code is not None:
+            print(f"❌ Cannot change username - WebSocket closed with code {self.websocket.close_code}")
+            self.connected = False
+            # Trigger auto-reconnect if not already in progress
+            if self.auto_reconnect:
+                await self.start_auto_reconnect()
+            return False
+
+        try:
+            # Send username change and wait for the server to confirm it
+            return await self._request_username_change(new_username)
+        except Exception as e:
+            print(f"❌ Username change failed: {e}")
+            self.connected = False
+            # Trigger auto-reconnect if not already in progress
+            if self.auto_reconnect:
+                await self.start_auto_reconnect()
+            return False
+
     def set_discord_bot(self, discord_bot):
         """Link the Discord bot"""
         self.discord_bot = discord_bot
@@ -4243,7 +5454,7 @@ class ObjectionBot:
             pair_id = pair_data.get('id')
         if pair_id:
             response_data = {"pairId": pair_id, "status": "accepted"}
-            message = f'42["respond_to_pair",{json.dumps(response_data)}]'
+            message = encode_event('respond_to_pair', response_data)
             await self.websocket.send(message)
         else:
             print("[PAIRING] Could not find pairId in pair_data, not sending respond_to_pair.")
@@ -4257,7 +5468,7 @@ class ObjectionBot:
             pair_id = pair_data.get('id')
         if pair_id:
             response_data = {"pairId": pair_id, "status": "rejected"}
-            message = f'42["respond_to_pair",{json.dumps(response_data)}]'
+            message = encode_event('respond_to_pair', response_data)
             await self.websocket.send(message)
             await self.websocket.send('42["leave_pair"]')
         else:
@@ -4268,6 +5479,9 @@ class ObjectionBot:
         """Gracefully disconnect: clean up Discord, update room, disconnect socket."""
         print("🔄 Starting graceful disconnect...")
         
+        # Save the latest room state so a restart starts with known users
+        self.flush_room_snapshot()
+        
         # Stop the queue processor first
         if self._queue_processor_task and not self._queue_processor_task.done():
             print("🛑 Stopping message queue processor...")
@@ -4307,6 +5521,13 @@ class ObjectionBot:
             except asyncio.CancelledError:
                 pass
         
+        # Drop the hot standby too, otherwise it stays in the room
+        if self._standby_task and not self._standby_task.done():
+            self._standby_task.cancel()
+        if self.standby:
+            await self.standby.close()
+            self.standby = None
+        
         if self.discord_bot:
             try:
                 await self.discord_bot.full_cleanup()
@@ -4316,15 +5537,15 @@ class ObjectionBot:
         if self.connected and self.websocket:
             try:
                 # Try to emit final room update before disconnecting
-                await self.websocket.send('42["get_room"]')
+                await self.protocol.send_event('get_room')
                 await asyncio.sleep(0.5)  # Give server time to process
             except Exception as e:
                 print(f"⚠️ Could not emit get_room on disconnect: {e}")
             
             try:
-                # Explicitly close the websocket
+                # Close the websocket and stop the protocol's lane workers with it
                 print("🔌 Closing WebSocket connection...")
-                await self.websocket.close()
+                await self.protocol.close()
                 
                 # Wait for disconnection to complete
                 await asyncio.sleep(1)
@@ -4338,53 +5559,72 @@ class ObjectionBot:
         self.connected = False
         print("✅ Graceful disconnect completed")
     
+    async def send_as_bot(self, text):
+        """Send text under the bot's own username; nothing is sent unless the rename is confirmed"""
+        original_username = self.config.get('objection', 'bot_username')
+        # One lock hold for rename and send, so the relay queue can't rename in between
+        async with self._message_lock:
+            if not await self._change_username_locked(original_username):
+                print(f"❌ Not sending as {original_username} - username change was not confirmed")
+                return False
+            return await self._send_message_locked(text, expected_username=original_username)
+    
     async def send_message(self, text, character_id=None, pose_id=None):
         """Send a message to the chatroom with optional character/pose override"""
         # Use lock to ensure messages are sent sequentially
         async with self._message_lock:
-            if not self.connected:
-                print("❌ Not connected - cannot send message")
-                # Trigger auto-reconnect if not already in progress
-                if self.auto_reconnect:
-                    await self.start_auto_reconnect()
-                return False
-                
-            # Check if socket is actually connected before sending
-            if not self.websocket or self.websocket.close_code is not None:
-                print("❌ WebSocket connection lost - cannot send message")
+            return await self._send_message_locked(text, character_id, pose_id)
+    
+    async def _send_message_locked(self, text, character_id=None, pose_id=None, expected_username=None):
+        """send_message body; the caller holds _message_lock. With expected_username set,
+        nothing is sent unless that is the bot's confirmed current name."""
+        if expected_username is not None and self._current_username != expected_username:
+            print(f"❌ Not sending - bot is named {self._current_username}, expected {expected_username}")
+            return False
+        
+        if not self.connected:
+            print("❌ Not connected - cannot send message")
+            # Trigger auto-reconnect if not already in progress
+            if self.auto_reconnect:
+                await self.start_auto_reconnect()
+            return False
+
+        # Check if socket is actually connected before sending
+        if not self.websocket or self.websocket.close_code is not None:
+            print("❌ WebSocket connection lost - cannot send message")
+            self.connected = False
+            # Trigger auto-reconnect if not already in progress
+            if self.auto_reconnect:
+                await self.start_auto_reconnect()
+            return False
+
+        # Use provided character/pose or fall back to config defaults
+        char_id = character_id if character_id is not None else self.config.get('settings', 'character_id')
+        p_id = pose_id if pose_id is not None else self.config.get('settings', 'pose_id')
+        message_data = {
+            "characterId": char_id,
+            "poseId": p_id,
+            "text": text
+        }
+
+        try:
+            message = encode_event('message', message_data)
+            await self.websocket.send(message)
+            log_verbose("📤 Sent: %s", text)
+            # Reduced delay for faster message throughput (was 0.1s)
+            # Still prevents rate limiting but improves responsiveness
+            await asyncio.sleep(0.05)
+            return True
+        except Exception as e:
+            print(f"❌ Send failed: {e}")
+            # If send fails, it indicates connection issues
+            if "closed" in str(e).lower() or "disconnected" in str(e).lower():
+                print("🔗 Send failure suggests connection loss - marking as disconnected")
                 self.connected = False
                 # Trigger auto-reconnect if not already in progress
                 if self.auto_reconnect:
                     await self.start_auto_reconnect()
-                return False
-                
-            # Use provided character/pose or fall back to config defaults
-            char_id = character_id if character_id is not None else self.config.get('settings', 'character_id')
-            p_id = pose_id if pose_id is not None else self.config.get('settings', 'pose_id')
-            message_data = {
-                "characterId": char_id,
-                "poseId": p_id,
-                "text": text
-            }
-            
-            try:
-                message = f'42["message",{json.dumps(message_data)}]'
-                await self.websocket.send(message)
-                log_verbose(f"📤 Sent: {text}")
-                # Reduced delay for faster message throughput (was 0.1s)
-                # Still prevents rate limiting but improves responsiveness
-                await asyncio.sleep(0.05)
-                return True
-            except Exception as e:
-                print(f"❌ Send failed: {e}")
-                # If send fails, it indicates connection issues
-                if "closed" in str(e).lower() or "disconnected" in str(e).lower():
-                    print("🔗 Send failure suggests connection loss - marking as disconnected")
-                    self.connected = False
-                    # Trigger auto-reconnect if not already in progress
-                    if self.auto_reconnect:
-                        await self.start_auto_reconnect()
-                return False
+            return False
     def start_input_thread(self):
         """Start a thread to handle console input"""
         def input_worker():
@@ -4439,7 +5679,7 @@ class ObjectionBot:
         # Send update to server
         try:
             update_data = {"title": title}
-            message = f'42["update_room",{json.dumps(update_data)}]'
+            message = encode_event('update_room', update_data)
             await self.websocket.send(message)
             print(f"[TITLE] Updated room title: {title}")
             return True
@@ -4460,7 +5700,7 @@ class ObjectionBot:
         # Send update to server
         try:
             update_data = {"slowModeSeconds": seconds}
-            message = f'42["update_room",{json.dumps(update_data)}]'
+            message = encode_event('update_room', update_data)
             await self.websocket.send(message)
             if seconds == 0:
                 print(f"[SLOWMODE] Disabled slow mode")
@@ -4480,7 +5720,7 @@ class ObjectionBot:
         # Send update to server using update_room_admin
         try:
             update_data = {"password": password}
-            message = f'42["update_room_admin",{json.dumps(update_data)}]'
+            message = encode_event('update_room_admin', update_data)
             await self.websocket.send(message)
             print(f"[PASSWORD] Updated room password")
             return True
@@ -4501,7 +5741,7 @@ class ObjectionBot:
         # Send update to server
         try:
             update_data = {"chatbox": textbox_id}
-            message = f'42["update_room",{json.dumps(update_data)}]'
+            message = encode_event('update_room', update_data)
             await self.websocket.send(message)
             print(f"[TEXTBOX] Updated room textbox: {textbox_id}")
             return True
@@ -4524,7 +5764,7 @@ class ObjectionBot:
         # Send update to server
         try:
             update_data = {"aspectRatio": aspect_ratio}
-            message = f'42["update_room",{json.dumps(update_data)}]'
+            message = encode_event('update_room', update_data)
             await self.websocket.send(message)
             print(f"[ASPECT] Updated room aspect ratio: {aspect_ratio}")
             return True
@@ -4541,7 +5781,7 @@ class ObjectionBot:
         # Send update to server
         try:
             update_data = {"enableSpectating": enable_spectating}
-            message = f'42["update_room",{json.dumps(update_data)}]'
+            message = encode_event('update_room', update_data)
             await self.websocket.send(message)
             status = "enabled" if enable_spectating else "disabled"
             print(f"[SPECTATING] {status.capitalize()} spectating in room")
@@ -4558,7 +5798,7 @@ class ObjectionBot:
         
         try:
             print("🔄 Refreshing room data...")
-            await self.websocket.send('42["get_room"]')
+            await self.protocol.send_event('get_room')
             return True
         except Exception as e:
             print(f"[REFRESH] Error refreshing room data: {e}")
@@ -4582,17 +5822,49 @@ class ObjectionBot:
 
     def get_user_id_by_username(self, username):
         """Get user ID by username (case-insensitive search)"""
-        username_lower = username.lower()
-        for user_id, stored_username in self.user_names.items():
-            if stored_username.lower() == username_lower:
-                return user_id
-        return None
+        return self.room.id_for(username)
+
+def apply_config_changes(objection_bot, changed):
+    """Push reloaded settings into state that was captured at startup"""
+    global VERBOSE_MODE
+    config = objection_bot.config
+    keys = {key for _, key in changed}
+    if 'verbose' in keys:
+        verbose = config.get('settings', 'verbose')
+        VERBOSE_MODE = True if verbose is None else verbose
+    if keys & {'raid_join_threshold', 'raid_window', 'raid_cooldown'}:
+        objection_bot.raid.threshold = config.get('settings', 'raid_join_threshold') or 8
+        objection_bot.raid.window = config.get('settings', 'raid_window') or 10
+        objection_bot.raid.cooldown = config.get('settings', 'raid_cooldown') or 60
+    if 'outbox_max_age' in keys:
+        objection_bot.outbox.max_age = config.get('settings', 'outbox_max_age') or 300
+    if 'trace_sample_rate' in keys:
+        objection_bot.tracer.sample_rate = config.get('settings', 'trace_sample_rate') or 0.0
+    if 'loop_slow_threshold' in keys:
+        loop_monitor.slow_threshold = config.get('settings', 'loop_slow_threshold') or 0.1
+
+async def watch_config(objection_bot, interval=2.0):
+    """Poll config.json's mtime and hot-reload it (connections stay up)"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            changed = objection_bot.config.reload_if_changed()
+            if changed:
+                apply_config_changes(objection_bot, changed)
+        except Exception as e:
+            print(f"❌ Error watching config: {e}")
 
 async def shutdown(objection_bot, discord_bot):
     print("Shutting down bots...")
     await objection_bot.disconnect()
     await discord_bot.close()
+    # Commit any preference changes still waiting in the write-behind queue
+    get_preference_store().close()
+    objection_bot.outbox.close()
     print("Bots disconnected. Exiting.")
+    objection_bot.tracer.close()
+    loop_monitor.stop()
+    stop_logging()
     sys.exit(0)
 
 def setup_signal_handlers(loop, objection_bot, discord_bot):
@@ -4603,12 +5875,130 @@ def setup_signal_handlers(loop, objection_bot, discord_bot):
             # add_signal_handler may not be implemented on Windows event loop
             pass
 
+class LiveDiagnostics:
+    """CPU profiling (cProfile) and allocation tracking (tracemalloc) for the running bot.
+    
+    The profiler is enabled on the event loop thread, so it covers all coroutines.
+    Merging, sorting and writing reports runs on worker threads. tracemalloc snapshots
+    hold the GIL while they're taken, so the loop still pauses for that part; traces
+    keep a single frame and reports group by file to keep the pause short. Reports are
+    written to DIAGNOSTICS_DIR as text (plus a .prof file for snakeviz/pstats).
+    """
+    TOP = 30
+    MEM_FRAMES = 1  # Frames stored per traced allocation (memory and snapshot cost scale with it)
+    MEM_KEY = 'filename'  # Grouping for memory reports; 'lineno' is finer but much larger
+    
+    def __init__(self, directory=DIAGNOSTICS_DIR):
+        self.directory = directory
+        self.profiler = None
+        self.profile_started = None
+        self.profile_stats = None  # Stats from profilers retired by earlier dumps
+        self.mem_baseline = None
+    
+    def _report_path(self, prefix, ext):
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]  # ms: dump and stop can land in one second
+        return os.path.join(self.directory, f"{prefix}-{stamp}.{ext}")
+    
+    @staticmethod
+    def _write_text(path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    
+    def profile_start(self):
+        if self.profiler is not None:
+            return "⚠️ Profiler already running (use 'profile dump' or 'profile stop')"
+        self.profiler = cProfile.Profile()
+        self.profile_started = time.monotonic()
+        self.profile_stats = None
+        self.profiler.enable()
+        return "🔬 CPU profiler started"
+    
+    async def profile_dump(self, stop=False):
+        """Write the stats collected so far (and stop profiling if stop=True)"""
+        if self.profiler is None:
+            return "⚠️ Profiler is not running (use 'profile start')"
+        profiler = self.profiler
+        profiler.disable()
+        elapsed = time.monotonic() - self.profile_started
+        if stop:
+            self.profiler = None
+        else:
+            # Keep profiling into a fresh profiler; the finished one is merged off the loop
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        path = self._report_path('profile', 'txt')
+        stats = await asyncio.to_thread(self._write_profile, profiler, self.profile_stats, elapsed, path)
+        self.profile_stats = None if stop else stats
+        return f"📝 Profile report ({elapsed:.1f}s{', stopped' if stop else ''}): {path}"
+    
+    def _write_profile(self, profiler, previous, elapsed, path):
+        """Worker thread: merge, sort and write one profile report; returns the merged stats"""
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        if previous is not None:
+            stats.add(previous)
+        out.write(f"CPU profile over {elapsed:.1f}s (top {self.TOP} by cumulative time)\n\n")
+        stats.sort_stats('cumulative').print_stats(self.TOP)
+        out.write(f"\nTop {self.TOP} by own time\n\n")
+        stats.sort_stats('tottime').print_stats(self.TOP)
+        self._write_text(path, out.getvalue())
+        stats.dump_stats(path[:-len('txt')] + 'prof')
+        return stats
+    
+    async def mem_snapshot(self):
+        """Start tracemalloc if needed and write the top allocation sites"""
+        started = False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.MEM_FRAMES)
+            started = True
+        current, peak = tracemalloc.get_traced_memory()
+        path = self._report_path('mem-snapshot', 'txt')
+        self.mem_baseline = await asyncio.to_thread(self._write_mem_snapshot, current, peak, path)
+        note = " (tracemalloc just started - only allocations from now on are tracked)" if started else ""
+        return f"📝 Memory snapshot: {path}{note}"
+    
+    def _write_mem_snapshot(self, current, peak, path):
+        """Worker thread: take a snapshot and write its top allocating files"""
+        snapshot = tracemalloc.take_snapshot()
+        lines = [f"Traced memory: {current / 1024 / 1024:.1f} MiB (peak {peak / 1024 / 1024:.1f} MiB)",
+                 f"Top {self.TOP} allocation sites (by {self.MEM_KEY})", ""]
+        lines += [str(stat) for stat in snapshot.statistics(self.MEM_KEY)[:self.TOP]]
+        self._write_text(path, "\n".join(lines) + "\n")
+        return snapshot
+    
+    async def mem_diff(self):
+        """Compare against the previous snapshot; the new snapshot becomes the baseline"""
+        if self.mem_baseline is None or not tracemalloc.is_tracing():
+            return "⚠️ No baseline (use 'mem snapshot' first)"
+        path = self._report_path('mem-diff', 'txt')
+        self.mem_baseline = await asyncio.to_thread(self._write_mem_diff, self.mem_baseline, path)
+        return f"📝 Memory diff: {path}"
+    
+    def _write_mem_diff(self, baseline, path):
+        """Worker thread: take a snapshot and write its top changes against baseline"""
+        snapshot = tracemalloc.take_snapshot()
+        diff = snapshot.compare_to(baseline, self.MEM_KEY)
+        lines = [f"Top {self.TOP} allocation changes since the previous snapshot (by {self.MEM_KEY})", ""]
+        lines += [str(stat) for stat in diff[:self.TOP]]
+        self._write_text(path, "\n".join(lines) + "\n")
+        return snapshot
+    
+    def mem_stop(self):
+        if not tracemalloc.is_tracing():
+            return "⚠️ tracemalloc is not running"
+        tracemalloc.stop()
+        self.mem_baseline = None
+        return "🛑 tracemalloc stopped"
+
 async def terminal_command_listener(objection_bot, discord_bot):
     """Listen for terminal commands and handle them."""
+    diagnostics = LiveDiagnostics()
     while True:
         try:
             cmd = (await aioconsole.ainput("CourtBot> ")).strip()
             cmd_lower = cmd.lower()
+            cmd_name = cmd_lower.split(maxsplit=1)[0] if cmd_lower else ""
             
             if cmd_lower == "disconnect":
                 print("🛑 Disconnect command received. Disconnecting bots (but script will keep running)...")
@@ -4627,11 +6017,8 @@ async def terminal_command_listener(objection_bot, discord_bot):
                 if message.strip():
                     if objection_bot.connected:
                         # Revert to original bot username when speaking as the bot itself
-                        original_username = objection_bot.config.get('objection', 'bot_username')
-                        await objection_bot.change_username_and_wait(original_username)
-                        # Small delay after username change before sending message
-                        await objection_bot.send_message(message)
-                        print(f"📤 Sent to courtroom: {message}")
+                        if await objection_bot.send_as_bot(message):
+                            print(f"📤 Sent to courtroom: {message}")
                     else:
                         print("❌ Not connected to objection.lol. Use 'reconnect' first.")
                 else:
@@ -4654,7 +6041,7 @@ async def terminal_command_listener(objection_bot, discord_bot):
                         else:
                             print(f"❌ User '{username}' not found in courtroom.")
                             print("Current users:")
-                            for uid, uname in objection_bot.user_names.items():
+                            for uid, uname in objection_bot.room.items():
                                 print(f"   - {uname} (ID: {uid[:8]}...)")
                     else:
                         print("❌ Not connected to objection.lol. Use 'reconnect' first.")
@@ -4668,22 +6055,29 @@ async def terminal_command_listener(objection_bot, discord_bot):
                 print(f"   Admin Status: {'🛡️ Yes' if objection_bot.is_admin else '❌ No'}")
                 print(f"   Room ID: {objection_bot.room_id}")
                 print(f"   Bot Username: {objection_bot.username}")
-                print(f"   Users in Room: {len(objection_bot.user_names)}")
-                if objection_bot.current_mods:
-                    mod_names = [objection_bot.user_names.get(mod_id, f"User-{mod_id[:8]}") for mod_id in objection_bot.current_mods]
+                print(f"   Users in Room: {len(objection_bot.room)}")
+                if objection_bot.room.mods:
+                    mod_names = [objection_bot.room.get(mod_id, f"User-{mod_id[:8]}") for mod_id in objection_bot.room.mods]
                     print(f"   Moderators: {', '.join(mod_names)}")
                 else:
                     print(f"   Moderators: None")
                 print(f"   Reconnect Attempts: {objection_bot.reconnect_attempts}/{objection_bot.max_reconnect_attempts}")
+                latency_lines = objection_bot.latency.summary_lines()
+                if latency_lines:
+                    print("   Relay Latency:")
+                    for line in latency_lines:
+                        print(f"      {line}")
+                else:
+                    print("   Relay Latency: No relayed messages yet")
             elif cmd_lower == "users":
                 # List all users in the courtroom
-                if objection_bot.user_names:
-                    print(f"👥 Users in Courtroom ({len(objection_bot.user_names)}):")
-                    for user_id, username in objection_bot.user_names.items():
+                if objection_bot.room:
+                    print(f"👥 Users in Courtroom ({len(objection_bot.room)}):")
+                    for user_id, username in objection_bot.room.items():
                         status_indicators = []
                         if user_id == objection_bot.user_id:
                             status_indicators.append("🤖 Bot")
-                        if user_id in objection_bot.current_mods:
+                        if user_id in objection_bot.room.mods:
                             status_indicators.append("🛡️ Mod")
                         status_text = f" ({', '.join(status_indicators)})" if status_indicators else ""
                         print(f"   - {username}{status_text} (ID: {user_id[:8]}...)")
@@ -4696,7 +6090,7 @@ async def terminal_command_listener(objection_bot, discord_bot):
                     success = await objection_bot.refresh_room_data()
                     if success:
                         await asyncio.sleep(1)  # Wait for response
-                        print(f"✅ Room data refreshed. Found {len(objection_bot.user_names)} users.")
+                        print(f"✅ Room data refreshed. Found {len(objection_bot.room)} users.")
                     else:
                         print("❌ Failed to refresh room data.")
                 else:
@@ -4797,6 +6191,12 @@ async def terminal_command_listener(objection_bot, discord_bot):
                 if discord_config:
                     print(f"   Discord Channel ID: {discord_config.get('channel_id')}")
                     print(f"   Discord Guild ID: {discord_config.get('guild_id')}")
+            elif cmd_lower == "reload":
+                changed = objection_bot.config.reload_if_changed(force=True)
+                if changed:
+                    apply_config_changes(objection_bot, changed)
+                else:
+                    print("ℹ️ Config unchanged")
             elif cmd_lower == "debug":
                 # Show debug information
                 print("🐛 Debug Information:")
@@ -4807,6 +6207,17 @@ async def terminal_command_listener(objection_bot, discord_bot):
                 print(f"   Pending Pair Request: {bool(objection_bot._pending_pair_request)}")
                 print(f"   Terminal Queue Size: {objection_bot.message_queue.qsize()}")
                 print(f"   Relay Queue Size: {objection_bot._relay_queue.qsize()} (Discord→Courtroom)")
+                print(f"   Outbox Pending: {len(objection_bot.outbox.pending)}")
+                print(f"   Handler Lanes: {objection_bot.protocol.lane_depths() or 'idle'}")
+                print(f"   Hot Standby: {'ready' if objection_bot.standby and objection_bot._standby_user_id else ('connecting' if objection_bot.standby else 'off')}")
+                print(f"   Last Server Frame: {objection_bot.protocol.silence():.1f}s ago (dead after {objection_bot.protocol.heartbeat_deadline():.0f}s)")
+                print(f"   Command Executor: {objection_bot.command_executor.pending} pending, {objection_bot.command_executor.rejected} rejected")
+                print(f"   Autoban Matcher: {objection_bot.autoban_matcher.status()}")
+                print(f"   Ban Queue: {len(objection_bot._ban_queue)} pending")
+                print(f"   Event Loop: {loop_monitor.summary_lines(n=0)[0]}")
+                for offender in loop_monitor.summary_lines(n=5)[1:]:
+                    print(f"      {offender}")
+                print(f"   Raid Mode: {'ACTIVE' if objection_bot.raid.active else 'off'} ({objection_bot.raid.rate(time.monotonic())}/{objection_bot.raid.threshold} joins in {objection_bot.raid.window}s, {objection_bot.raid.raids} raids)")
                 print(f"   Last Queued Username: {objection_bot._last_queued_username}")
                 print(f"   Queue Processor Running: {objection_bot._queue_processor_task and not objection_bot._queue_processor_task.done()}")
                 print(f"   Discord Nicknames: {len(discord_bot.nicknames)} users")
@@ -4838,6 +6249,32 @@ async def terminal_command_listener(objection_bot, discord_bot):
                     print("   ws 2  (ping)")
                     print("   ws 3  (pong)")
                     print("   ws 40  (handshake ack)")
+            elif cmd_name == "profile":
+                # Live CPU profiling of the running process
+                action = cmd_lower[7:].strip()
+                try:
+                    if action == "start":
+                        print(diagnostics.profile_start())
+                    elif action in ("stop", "dump"):
+                        print(await diagnostics.profile_dump(stop=(action == "stop")))
+                    else:
+                        print("Usage: profile start|stop|dump")
+                except Exception as e:
+                    print(f"❌ Profiler error: {e}")
+            elif cmd_name == "mem":
+                # Allocation tracking with tracemalloc
+                action = cmd_lower[3:].strip()
+                try:
+                    if action == "snapshot":
+                        print(await diagnostics.mem_snapshot())
+                    elif action == "diff":
+                        print(await diagnostics.mem_diff())
+                    elif action == "stop":
+                        print(diagnostics.mem_stop())
+                    else:
+                        print("Usage: mem snapshot|diff|stop")
+                except Exception as e:
+                    print(f"❌ Memory diagnostics error: {e}")
             elif cmd_lower.startswith("autoban "):
                 # Autoban pattern management commands
                 autoban_cmd = cmd[8:].strip()  # Remove "autoban " prefix
@@ -4848,18 +6285,18 @@ async def terminal_command_listener(objection_bot, discord_bot):
                 if autoban_action == "add" and autoban_arg:
                     # Add a new autoban pattern
                     pattern = autoban_arg
-                    # Validate regex pattern
-                    try:
-                        re.compile(pattern)
+                    # Validate regex pattern (it must compile under re2)
+                    error = AutobanMatcher.check_pattern(pattern)
+                    if error is None:
                         if pattern not in objection_bot.autoban_patterns:
-                            objection_bot.autoban_patterns.append(pattern)
-                            save_autobans(objection_bot.autoban_patterns)
+                            objection_bot.set_autoban_patterns(objection_bot.autoban_patterns + [pattern])
+                            objection_bot.prefs.put('autobans', pattern)
                             print(f"✅ Added autoban pattern: '{pattern}'")
                             print(f"   Total patterns: {len(objection_bot.autoban_patterns)}")
                         else:
                             print(f"⚠️ Pattern '{pattern}' already exists in autoban list")
-                    except re.error as e:
-                        print(f"❌ Invalid regex pattern: {e}")
+                    else:
+                        print(f"❌ {error}")
                         print("   Tip: For exact username match, just type the username")
                         print("   Tip: For prefix match, use: ^prefix")
                         print("   Tip: For suffix match, use: suffix$")
@@ -4869,8 +6306,8 @@ async def terminal_command_listener(objection_bot, discord_bot):
                     # Remove an autoban pattern
                     pattern = autoban_arg
                     if pattern in objection_bot.autoban_patterns:
-                        objection_bot.autoban_patterns.remove(pattern)
-                        save_autobans(objection_bot.autoban_patterns)
+                        objection_bot.set_autoban_patterns(p for p in objection_bot.autoban_patterns if p != pattern)
+                        objection_bot.prefs.delete('autobans', pattern)
                         print(f"✅ Removed autoban pattern: '{pattern}'")
                         print(f"   Remaining patterns: {len(objection_bot.autoban_patterns)}")
                     else:
@@ -4894,8 +6331,8 @@ async def terminal_command_listener(objection_bot, discord_bot):
                     # Clear all autoban patterns
                     if objection_bot.autoban_patterns:
                         count = len(objection_bot.autoban_patterns)
-                        objection_bot.autoban_patterns = []
-                        save_autobans(objection_bot.autoban_patterns)
+                        objection_bot.set_autoban_patterns([])
+                        objection_bot.prefs.clear('autobans')
                         print(f"✅ Cleared all {count} autoban pattern(s)")
                     else:
                         print("⚠️ No autoban patterns to clear")
@@ -4910,6 +6347,7 @@ async def terminal_command_listener(objection_bot, discord_bot):
                     else:
                         print(f"✅ Username '{test_username}' would NOT be banned")
                         print(f"   No patterns matched ({len(objection_bot.autoban_patterns)} patterns checked)")
+                    print(f"   Evaluated in {objection_bot.autoban_matcher.last_eval * 1e6:.0f}µs ({AutobanMatcher.ENGINE} engine)")
                 
                 else:
                     print("🚫 Autoban Commands:")
@@ -4935,9 +6373,9 @@ async def terminal_command_listener(objection_bot, discord_bot):
                     await objection_bot.refresh_room_data()
                     await asyncio.sleep(0.5)  # Wait for response
                     
-                    if objection_bot.banned_users:
-                        print(f"🚫 Banned Users ({len(objection_bot.banned_users)}):")
-                        for i, ban in enumerate(objection_bot.banned_users, 1):
+                    if objection_bot.room.bans:
+                        print(f"🚫 Banned Users ({len(objection_bot.room.bans)}):")
+                        for i, ban in enumerate(objection_bot.room.bans, 1):
                             username = ban.get('username', 'Unknown')
                             user_id = ban.get('id', 'Unknown')
                             print(f"   {i}. {username} (ID: {user_id[:8]}...)")
@@ -4971,7 +6409,7 @@ async def terminal_command_listener(objection_bot, discord_bot):
                                 print(f"❌ User '{username_to_ban}' not found in courtroom.")
                                 print("   Note: User must be in the room to ban them.")
                                 print("   Current users:")
-                                for uid, uname in objection_bot.user_names.items():
+                                for uid, uname in objection_bot.room.items():
                                     print(f"      - {uname}")
                         else:
                             print("❌ Bot is not admin. Cannot ban users.")
@@ -4988,7 +6426,7 @@ async def terminal_command_listener(objection_bot, discord_bot):
                         if objection_bot.is_admin:
                             # Find the user in the ban list
                             ban_to_remove = None
-                            for ban in objection_bot.banned_users:
+                            for ban in objection_bot.room.bans:
                                 if ban.get('username', '').lower() == username_to_unban.lower():
                                     ban_to_remove = ban
                                     break
@@ -5002,9 +6440,9 @@ async def terminal_command_listener(objection_bot, discord_bot):
                                     print(f"❌ Failed to unban '{username_to_unban}'")
                             else:
                                 print(f"❌ User '{username_to_unban}' not found in ban list.")
-                                if objection_bot.banned_users:
+                                if objection_bot.room.bans:
                                     print("   Currently banned users:")
-                                    for ban in objection_bot.banned_users:
+                                    for ban in objection_bot.room.bans:
                                         print(f"      - {ban.get('username', 'Unknown')}")
                                 else:
                                     print("   No users are currently banned.")
@@ -5047,7 +6485,10 @@ async def terminal_command_listener(objection_bot, discord_bot):
                 print("  websocket <msg>  - Send raw WebSocket message (alias)")
                 print("\n🛠️ Utility:")
                 print("  config           - Show current configuration")
+                print("  reload           - Reload config.json now (also picked up automatically)")
                 print("  debug            - Show debug information")
+                print("  profile start|stop|dump - CPU profile the live bot (reports in /app/data)")
+                print("  mem snapshot|diff|stop  - Track allocations with tracemalloc (reports in /app/data)")
                 print("  clear            - Clear terminal screen")
                 print("  help             - Show this help message")
                 print("  quit/exit/stop   - Shutdown and exit")
@@ -5066,6 +6507,12 @@ async def main():
     VERBOSE_MODE = config.get('settings', 'verbose')
     if VERBOSE_MODE is None:
         VERBOSE_MODE = True  # Default to verbose if not set
+    setup_logging(config.get('settings', 'log_format') or 'text')
+    
+    # Watch for blocking work on the event loop (shows up in /status and 'debug')
+    loop_monitor.slow_threshold = config.get('settings', 'loop_slow_threshold') or 0.1
+    loop_monitor.debug = bool(config.get('settings', 'loop_debug'))
+    loop_monitor.start()
     
     # Validate configuration
     errors = config.validate()
@@ -5077,9 +6524,9 @@ async def main():
         return
     
     log_verbose("📋 Configuration loaded successfully!")
-    log_verbose(f"🏠 Room: {config.get('objection', 'room_id')}")
-    log_verbose(f"🤖 Username: {config.get('objection', 'bot_username')}")
-    log_verbose(f"🎭 Mode: {config.get('settings', 'mode')}")
+    log_verbose("🏠 Room: %s", config.get('objection', 'room_id'))
+    log_verbose("🤖 Username: %s", config.get('objection', 'bot_username'))
+    log_verbose("🎭 Mode: %s", config.get('settings', 'mode'))
     
     if not VERBOSE_MODE:
         print("💬 Simple logging mode enabled (set VERBOSE=true for detailed logs)")
@@ -5099,6 +6546,18 @@ async def main():
         discord_task = asyncio.create_task(discord_bot.start(config.get('discord', 'token')))
         # Start terminal command listener in background
         terminal_task = asyncio.create_task(terminal_command_listener(objection_bot, discord_bot))
+        # Pick up config.json edits without a restart
+        config_watch_task = asyncio.create_task(watch_config(objection_bot))
+        
+        # Optional Prometheus endpoint (off unless metrics_port is set)
+        metrics_port = config.get('settings', 'metrics_port')
+        if metrics_port:
+            metrics_host = config.get('settings', 'metrics_host') or '127.0.0.1'
+            try:
+                await start_metrics_server(metrics_host, metrics_port)
+                print(f"📈 Metrics endpoint: http://{metrics_host}:{metrics_port}/metrics")
+            except OSError as e:
+                print(f"❌ Could not start metrics endpoint on {metrics_host}:{metrics_port}: {e}")
         
         # Setup signal handlers for graceful shutdown
         setup_signal_handlers(asyncio.get_running_loop(), objection_bot, discord_bot)
@@ -5106,9 +6565,7 @@ async def main():
         # Send initial greeting
         await asyncio.sleep(3)  # Wait for Discord bot to connect
         # Revert to original bot username for initial greeting
-        original_username = objection_bot.config.get('objection', 'bot_username')
-        await objection_bot.change_username_and_wait(original_username)
-        await objection_bot.send_message("[#bgs20412]Ruff (Relaying messages)")
+        await objection_bot.send_as_bot("[#bgs20412]Ruff (Relaying messages)")
         
         # Choose mode based on configuration
         mode = config.get('settings', 'mode')
@@ -5130,6 +6587,7 @@ async def main():
             print("\n🛑 Stopping bots...")
             discord_task.cancel()
             terminal_task.cancel()
+            config_watch_task.cancel()
             await shutdown(objection_bot, discord_bot)
     else:
         print("❌ Failed to connect to objection.lol")
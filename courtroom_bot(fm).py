@@ -8,6 +8,7 @@ import re
 import time
 from typing import Dict, List, Optional
 import config
+from courtroom_protocol import CourtroomProtocolClient, RoomState, encode_event
 from emotion_classifier import EmotionClassifier
 from popular_thread_fetcher import PopularThreadFetcher
 
@@ -18,7 +19,7 @@ class CourtroomBot:
         self.shapes_api_key = shapes_api_key
         self.shapes_base_url = config.API_URL.replace('/chat/completions', '')  # Remove endpoint to get base URL
         self.shape_username = shape_username or config.SHAPESINC_SHAPE_USERNAME
-        self.users = {}  # Store user info for name mentions
+        self.users = RoomState()  # Room users with O(1) lookups by ID and username (for name mentions)
         self.message_count = 0
         self.response_threshold = config.RESPONSE_THRESHOLD
         self.connected = False
@@ -69,57 +70,42 @@ class CourtroomBot:
         self.recent_exchanges = []  # Track recent user-to-user exchanges
         self.max_exchange_tracking = 10  # Number of recent exchanges to track
         
+        # Shared courtroom protocol client (handshake, ping replies, event dispatch)
+        self.protocol = CourtroomProtocolClient(self.ping_interval, self.ping_timeout, log=self.log_protocol)
+        # Chat (AI replies can take seconds) gets its own lane so room state keeps up
+        self.protocol.on('message', self.handle_message, arg_type=dict, lane='chat')
+        self.protocol.on('update_room', self.handle_room_joined, lane='room')
+        self.protocol.on('me', self.handle_me_message, lane='room')
+        self.protocol.on('joined_room', self.handle_joined_room, arity=0, lane='room')
+        self.protocol.on('user_joined', self.handle_user_joined, lane='room')
+        self.protocol.on('user_left', self.handle_user_left, lane='room')  # user_left sends user_id as string
+        self.protocol.on('update_user', self.handle_update_user, arity=2, lane='room')
+        self.protocol.on('create_pair', self.handle_incoming_pair_request, lane='room')
+        self.protocol.on('respond_to_pair', self.handle_pair_event, lane='room')
+        self.protocol.on('leave_pair', self.handle_pair_event, lane='room')
+        self.protocol.on('error', self.handle_server_error)
+        
     async def connect(self):
         """Connect to the courtroom WebSocket"""
         # Use the correct WebSocket URL with required parameters
         uri = f"{config.WEBSOCKET_BASE_URL}?roomId={self.courtroom_id}&username={config.BOT_USERNAME}&password=&{config.WEBSOCKET_PARAMS}"
         try:
-            self.websocket = await websockets.connect(uri)
-            print(f"WebSocket connection established")
-            
-            # Wait for initial handshake message
-            print("Waiting for server handshake...")
-            initial_message = await self.websocket.recv()
-            if config.SHOW_RAW_MESSAGES:
-                print(f"Received: {initial_message}")
-            
-            if initial_message.startswith('0'):
-                # Parse ping interval and timeout
-                try:
-                    handshake_data = json.loads(initial_message[1:])
-                    self.ping_interval = handshake_data.get('pingInterval', config.PING_INTERVAL)
-                    self.ping_timeout = handshake_data.get('pingTimeout', config.PING_TIMEOUT)
-                    print(f"Ping interval: {self.ping_interval}ms, Timeout: {self.ping_timeout}ms")
-                except:
-                    print("Could not parse handshake data, using defaults")
-                
-                # Send handshake acknowledgment
-                print("Sending handshake acknowledgment...")
-                await self.websocket.send("40")
-                
-                # Wait for server response
-                response = await self.websocket.recv()
-                if config.SHOW_RAW_MESSAGES:
-                    print(f"Server response: {response}")
-                
-                if response.startswith('40'):
-                    print("Handshake completed successfully")
-                    
-                    # Send "me" message to get user info
-                    print("Sending 'me' message...")
-                    await self.websocket.send('42["me"]')
-                    
-                    # Send "get_room" message to join/get room info
-                    print("Sending 'get_room' message...")
-                    await self.websocket.send('42["get_room"]')
-                    
-                    return True
-                else:
-                    print(f"Unexpected response after handshake: {response}")
-                    return False
-            else:
-                print(f"Unexpected initial message: {initial_message}")
-                return False
+            await self.protocol.connect(uri)
+            self.websocket = self.protocol.websocket
+            self.ping_interval = self.protocol.ping_interval
+            self.ping_timeout = self.protocol.ping_timeout
+            print(f"Ping interval: {self.ping_interval}ms, Timeout: {self.ping_timeout}ms")
+            print("Handshake completed successfully")
+            
+            # Send "me" message to get user info
+            print("Sending 'me' message...")
+            await self.protocol.send_event('me')
+            
+            # Send "get_room" message to join/get room info
+            print("Sending 'get_room' message...")
+            await self.protocol.send_event('get_room')
+            
+            return True
             
         except Exception as e:
             print(f"Failed to connect: {e}")
@@ -168,7 +154,7 @@ class CourtroomBot:
             "text": text
         }
         
-        message = f'42["message",{json.dumps(message_data)}]'
+        message = encode_event('message', message_data)
         await self.websocket.send(message)
         print(f"Sent: {text} [Pose ID: {pose_id}]")
         
@@ -178,7 +164,7 @@ class CourtroomBot:
     async def send_ping(self):
         """Send ping message to keep connection alive"""
         if self.websocket and self.connected:
-            await self.websocket.send("2")
+            await self.protocol.send_ping()
             self.last_ping_time = asyncio.get_event_loop().time()
             print("Sent ping")
     
@@ -714,10 +700,16 @@ class CourtroomBot:
                     user_id = data["userId"]
                     username = self.get_username(user_id)
                     
-                    # If we don't have this user, refresh room data
+                    # If we don't have this user, refresh room data (shared with other unknowns)
+                    # and wait for it here in the chat lane - update_room is handled in the room lane
                     if user_id not in self.users:
                         print(f"Unknown user ID {user_id}, refreshing room data...")
-                        await self.refresh_room_data()
+                        room_refresh = await self.refresh_room_data()
+                        if room_refresh is not None:
+                            try:
+                                await asyncio.wait_for(asyncio.shield(room_refresh), timeout=2.0)
+                            except asyncio.TimeoutError:
+                                print(f"Room refresh timed out, {user_id} is still unknown")
                         username = self.get_username(user_id)
                 
                 print(f"Message from {username or f'Character {character_id}'}: {text}")
@@ -798,19 +790,14 @@ class CourtroomBot:
         try:
             if "users" in data:
                 print(f"Updating user list from room update...")
-                for user in data["users"]:
-                    if "id" in user and "username" in user:
-                        user_id = user["id"]
-                        username = user["username"]
-                        # Update our user mapping
-                        old_username = self.users.get(user_id)
-                        self.users[user_id] = username
-                        
-                        if old_username != username:
-                            if old_username:
-                                print(f"User updated: {old_username} -> {username}")
-                            else:
-                                print(f"User joined: {username}")
+                valid_users = [user for user in data["users"] if "id" in user and "username" in user]
+                # Apply as a delta against the users we already know (an empty list is
+                # treated as an incomplete update rather than everyone leaving)
+                added, removed, renamed = self.users.apply_users(valid_users) if valid_users else ({}, {}, {})
+                for old_username, username in renamed.values():
+                    print(f"User updated: {old_username} -> {username}")
+                for username in added.values():
+                    print(f"User joined: {username}")
                 
                 print(f"Total users in room: {len(self.users)}")
                 # Don't list all users to avoid AI confusion
@@ -965,10 +952,13 @@ class CourtroomBot:
             return f"User-{user_id[:8]}"
     
     async def refresh_room_data(self):
-        """Manually refresh room data if usernames are missing"""
+        """Manually refresh room data if usernames are missing.
+        
+        Returns a future that resolves once the fresh update_room has been handled
+        (None when not connected)."""
         if self.websocket and self.connected:
             print("Refreshing room data to get latest user list...")
-            await self.websocket.send('42["get_room"]')
+            return await self.protocol.request_room_refresh()
     
     def list_users(self):
         """List all known users for debugging"""
@@ -1023,7 +1013,7 @@ class CourtroomBot:
             "backgroundUserId": self.my_user_id
         }
         
-        message = f'42["create_pair",{json.dumps(pair_data)}]'
+        message = encode_event('create_pair', pair_data)
         
         try:
             await self.websocket.send(message)
@@ -1052,7 +1042,7 @@ class CourtroomBot:
             "status": status
         }
         
-        message = f'42["respond_to_pair",{json.dumps(response_data)}]'
+        message = encode_event('respond_to_pair', response_data)
         try:
             await self.websocket.send(message)
             print(f"Sent pair response: {message}")
@@ -1353,10 +1343,7 @@ class CourtroomBot:
     
     def get_user_id(self, username: str) -> Optional[str]:
         """Get user ID from username"""
-        for user_id, stored_username in self.users.items():
-            if stored_username == username:
-                return user_id
-        return None
+        return self.users.id_for(username)
     
     def should_avoid_interrupting(self, current_username: str, current_message: str) -> bool:
         """Determine if bot should avoid interrupting this conversation"""
@@ -1656,212 +1643,46 @@ class CourtroomBot:
         except Exception as e:
             print(f"Error handling me message: {e}")
     
+    async def handle_room_joined(self, data: Dict):
+        """Handle room updates; the first one means we are in the room"""
+        await self.handle_room_update(data)
+        # Set connected when we get room info
+        if not self.connected:
+            print("Successfully connected to room!")
+            self.mark_connected()
+    
+    async def handle_joined_room(self):
+        print("Successfully joined the room!")
+        self.mark_connected()
+    
+    def mark_connected(self):
+        """Mark the bot as connected and start idle message tracking"""
+        self.connected = True
+        # Initialize idle message tracking when we connect
+        if config.ENABLE_IDLE_MESSAGES:
+            self.last_user_message_time = time.time()
+            asyncio.create_task(self.schedule_next_idle_message())
+    
+    async def handle_pair_event(self, data):
+        """Log pairing events we don't act on"""
+        print(f"Pairing event received: {str(data)[:50]}...")
+    
+    def log_protocol(self, message):
+        """Handshake and ping chatter from the protocol client (only with SHOW_RAW_MESSAGES)"""
+        if config.SHOW_RAW_MESSAGES:
+            print(message)
+    
+    async def handle_server_error(self, error):
+        print(f"Error from server: {error}")
+    
     async def process_message(self, message: str):
         """Process incoming WebSocket messages"""
+        if config.SHOW_RAW_MESSAGES:
+            print(f"Raw message: {message}")
         try:
-            # Handle different message types
-            if message.startswith('42["message"'):
-                # Extract message data - handle extra data after JSON
-                start = message.find('[')
-                if start > 0:
-                    # Find the end of the JSON array, ignoring extra data
-                    bracket_count = 0
-                    end = start
-                    for i, char in enumerate(message[start:], start):
-                        if char == '[':
-                            bracket_count += 1
-                        elif char == ']':
-                            bracket_count -= 1
-                            if bracket_count == 0:
-                                end = i + 1
-                                break
-                    
-                    if end > start:
-                        json_str = message[start:end]
-                        try:
-                            data = json.loads(json_str)
-                            if len(data) > 1:
-                                await self.handle_message(data[1])
-                        except json.JSONDecodeError as e:
-                            print(f"JSON decode error: {e} for string: {json_str}")
-            
-            elif message.startswith('42["update_room"'):
-                # Extract room update data - handle extra data after JSON
-                start = message.find('[')
-                if start > 0:
-                    # Find the end of the JSON array, ignoring extra data
-                    bracket_count = 0
-                    end = start
-                    for i, char in enumerate(message[start:], start):
-                        if char == '[':
-                            bracket_count += 1
-                        elif char == ']':
-                            bracket_count -= 1
-                            if bracket_count == 0:
-                                end = i + 1
-                                break
-                    
-                    if end > start:
-                        json_str = message[start:end]
-                        try:
-                            data = json.loads(json_str)
-                            if len(data) > 1:
-                                await self.handle_room_update(data[1])
-                                # Set connected when we get room info
-                                if not self.connected:
-                                    print("Successfully connected to room!")
-                                    self.connected = True
-                                    # Initialize idle message tracking when we connect
-                                    if config.ENABLE_IDLE_MESSAGES:
-                                        self.last_user_message_time = time.time()
-                                        asyncio.create_task(self.schedule_next_idle_message())
-                        except json.JSONDecodeError as e:
-                            print(f"JSON decode error: {e} for string: {json_str}")
-            
-            elif message.startswith('42["me"'):
-                # Extract me message data - handle extra data after JSON
-                start = message.find('[')
-                if start > 0:
-                    # Find the end of the JSON array, ignoring extra data
-                    bracket_count = 0
-                    end = start
-                    for i, char in enumerate(message[start:], start):
-                        if char == '[':
-                            bracket_count += 1
-                        elif char == ']':
-                            bracket_count -= 1
-                            if bracket_count == 0:
-                                end = i + 1
-                                break
-                    
-                    if end > start:
-                        json_str = message[start:end]
-                        try:
-                            data = json.loads(json_str)
-                            if len(data) > 1:
-                                await self.handle_me_message(data[1])
-                        except json.JSONDecodeError as e:
-                            print(f"JSON decode error: {e} for string: {json_str}")
-            
-            elif message.startswith('40'):
-                print("Connected to Socket.IO")
-                # Don't set connected yet, wait for room info
-            elif message.startswith('42["joined_room"'):
-                print("Successfully joined the room!")
-                self.connected = True
-                # Initialize idle message tracking when we connect
-                if config.ENABLE_IDLE_MESSAGES:
-                    self.last_user_message_time = time.time()
-                    asyncio.create_task(self.schedule_next_idle_message())
-            elif message.startswith('42["user_joined"'):
-                # Handle user joined events
-                start = message.find('[')
-                if start > 0:
-                    bracket_count = 0
-                    end = start
-                    for i, char in enumerate(message[start:], start):
-                        if char == '[':
-                            bracket_count += 1
-                        elif char == ']':
-                            bracket_count -= 1
-                            if bracket_count == 0:
-                                end = i + 1
-                                break
-                    
-                    if end > start:
-                        json_str = message[start:end]
-                        try:
-                            data = json.loads(json_str)
-                            if len(data) > 1:
-                                await self.handle_user_joined(data[1])
-                        except json.JSONDecodeError as e:
-                            print(f"JSON decode error: {e} for string: {json_str}")
-            elif message.startswith('42["user_left"'):
-                # Handle user left events - format: 42["user_left","user-id","session-id"]
-                start = message.find('[')
-                if start > 0:
-                    bracket_count = 0
-                    end = start
-                    for i, char in enumerate(message[start:], start):
-                        if char == '[':
-                            bracket_count += 1
-                        elif char == ']':
-                            bracket_count -= 1
-                            if bracket_count == 0:
-                                end = i + 1
-                                break
-                    
-                    if end > start:
-                        json_str = message[start:end]
-                        try:
-                            data = json.loads(json_str)
-                            if len(data) > 1:
-                                # user_left sends user_id as string in data[1]
-                                user_id = data[1]
-                                await self.handle_user_left(user_id)
-                        except json.JSONDecodeError as e:
-                            print(f"JSON decode error: {e} for string: {json_str}")
-            elif message.startswith('42["update_user"'):
-                # Handle user update events
-                start = message.find('[')
-                if start > 0:
-                    bracket_count = 0
-                    end = start
-                    for i, char in enumerate(message[start:], start):
-                        if char == '[':
-                            bracket_count += 1
-                        elif char == ']':
-                            bracket_count -= 1
-                            if bracket_count == 0:
-                                end = i + 1
-                                break
-                    
-                    if end > start:
-                        json_str = message[start:end]
-                        try:
-                            data = json.loads(json_str)
-                            if len(data) > 2:
-                                user_id = data[1]
-                                user_data = data[2]
-                                await self.handle_update_user(user_id, user_data)
-                        except json.JSONDecodeError as e:
-                            print(f"JSON decode error: {e} for string: {json_str}")
-            elif message.startswith('42["create_pair"'):
-                # Handle incoming pair requests
-                start = message.find('[')
-                if start > 0:
-                    bracket_count = 0
-                    end = start
-                    for i, char in enumerate(message[start:], start):
-                        if char == '[':
-                            bracket_count += 1
-                        elif char == ']':
-                            bracket_count -= 1
-                            if bracket_count == 0:
-                                end = i + 1
-                                break
-                    
-                    if end > start:
-                        json_str = message[start:end]
-                        try:
-                            data = json.loads(json_str)
-                            if len(data) > 1:
-                                await self.handle_incoming_pair_request(data[1])
-                        except json.JSONDecodeError as e:
-                            print(f"JSON decode error: {e} for string: {json_str}")
-            elif message.startswith('42["respond_to_pair"') or message.startswith('42["leave_pair"'):
-                # Log other pairing events
-                print(f"Pairing event received: {message[:50]}...")
-            elif message.startswith('42["error"'):
-                print(f"Error from server: {message}")
-            elif message.startswith('2'):
-                # Ping message, respond with pong
-                await self.websocket.send("3")
-                print("Received ping, sent pong")
-            elif message.startswith('3'):
-                # Pong message
-                print("Received pong")
-            
+            await self.protocol.handle_frame(message)
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error: {e} for string: {message}")
         except Exception as e:
             print(f"Error processing message: {e}")
     
@@ -1882,10 +1703,7 @@ class CourtroomBot:
             ping_task = asyncio.create_task(self.ping_loop())
             
             # Main message loop
-            async for message in self.websocket:
-                if config.SHOW_RAW_MESSAGES:
-                    print(f"Raw message: {message}")
-                await self.process_message(message)
+            await self.protocol.run(self.process_message)
                 
         except websockets.exceptions.ConnectionClosed:
             print("WebSocket connection closed")
@@ -1896,8 +1714,8 @@ class CourtroomBot:
             # Cancel any pending idle message tasks
             if self.idle_task and not self.idle_task.done():
                 self.idle_task.cancel()
-            if self.websocket:
-                await self.websocket.close()
+            # Closes the socket and stops the protocol's lane workers
+            await self.protocol.close()
 
 async def main():
     # Get configuration from config.py or environment variables
@@ -0,0 +1,360 @@
+"""Local stand-in for the objection.lol courtroom WebSocket server, for load testing.
+
+Speaks the Engine.IO v4 / Socket.IO frames the bots use: the 0{...}/40 handshake, server
+pings, me, get_room/update_room, message, change_username, user_joined/user_left,
+create_ban, update_mods, update_room_admin and owner_transfer. Each account may send one
+message per second (or the room's slow mode, if longer); faster messages are dropped
+with an error event, like the real site. Simulated chatty users can be added so the
+bridge and the AI bot can be benchmarked offline.
+
+Usage:
+    python courtroom_emulator.py                          # empty rooms on ws://127.0.0.1:8765
+    python courtroom_emulator.py --clients 50 --rate 0.5  # 50 simulated users, ~0.5 msg/s each
+    python courtroom_emulator.py --burst 40 --burst-after 10  # 40 joins in 2s after 10s (raid)
+
+Point courtbot.py at it with "server_url" in the "objection" config section (or the
+OBJECTION_SERVER_URL environment variable), and the AI bot with
+WEBSOCKET_BASE_URL in its config:
+    ws://127.0.0.1:8765/courtroom-api/socket.io/
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+import websockets
+
+from courtroom_protocol import (EIO_MESSAGE, EIO_OPEN, EIO_PING, EIO_PONG, SIO_CONNECT,
+                                decode_socketio_frame, encode_event, json_dumps)
+
+MESSAGE_INTERVAL = 1.0  # objection.lol allows one message per second per account
+MAX_USERNAME = 30
+MAX_MESSAGE = 500
+WORDS = ("objection", "hold it", "take that", "the witness", "is lying", "your honor", "evidence",
+         "the defense", "rests", "court record", "guilty", "not guilty", "ruff", "gavel", "cross-examine")
+
+
+class Participant:
+    """A user in the room: a real WebSocket client, or a simulated one (websocket is None)"""
+    __slots__ = ('id', 'username', 'websocket', 'last_message_at', 'awaiting_pong')
+
+    def __init__(self, username, websocket=None):
+        self.id = str(uuid.uuid4())
+        self.username = username[:MAX_USERNAME]
+        self.websocket = websocket
+        self.last_message_at = 0.0
+        self.awaiting_pong = False
+
+    async def send(self, frame):
+        if self.websocket is not None:
+            try:
+                await self.websocket.send(frame)
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+
+class EmulatedCourtroom:
+    """One room's state and event handling"""
+
+    def __init__(self, room_id, stats):
+        self.room_id = room_id
+        self.stats = stats
+        self.users = {}  # user id -> Participant
+        self.mods = []
+        self.bans = []  # [{'id', 'username'}] like update_room_admin
+        self.owner = None
+        self.settings = {
+            'title': 'Emulated Courtroom',
+            'aspectRatio': '16:9',
+            'slowModeSeconds': 0,
+            'enableSpectating': True,
+            'restrictEvidence': False,
+            'textBoxAppearance': '1',
+        }
+
+    def room_data(self):
+        return {
+            'id': self.room_id,
+            'users': [{'id': p.id, 'username': p.username} for p in self.users.values()],
+            'mods': list(self.mods),
+            'owner': self.owner,
+            **self.settings,
+        }
+
+    def admin_data(self):
+        return {'bans': list(self.bans), 'password': '', 'autoTransferAdmin': True}
+
+    def is_banned(self, username):
+        folded = username.casefold()
+        return any(ban.get('username', '').casefold() == folded for ban in self.bans)
+
+    async def broadcast(self, event, *args, exclude=None):
+        frame = encode_event(event, *args)
+        targets = [p for p in self.users.values() if p.websocket is not None and p is not exclude]
+        self.stats['frames_out'] += len(targets)
+        await asyncio.gather(*(p.send(frame) for p in targets))
+
+    async def reply(self, participant, event, *args):
+        self.stats['frames_out'] += 1
+        await participant.send(encode_event(event, *args))
+
+    async def join(self, participant):
+        self.users[participant.id] = participant
+        self.stats['joins'] += 1
+        await self.broadcast('user_joined', {'id': participant.id, 'username': participant.username},
+                             exclude=participant)
+        # The first real client owns the room (like the creator on the real site)
+        if self.owner is None and participant.websocket is not None:
+            await self.transfer_owner(participant.id)
+
+    async def leave(self, participant):
+        if self.users.pop(participant.id, None) is None:
+            return
+        self.stats['leaves'] += 1
+        if participant.id in self.mods:
+            self.mods.remove(participant.id)
+        await self.broadcast('user_left', participant.id)
+        if self.owner == participant.id:
+            # autoTransferAdmin: hand the room to the next real client
+            self.owner = None
+            successor = next((p for p in self.users.values() if p.websocket is not None), None)
+            if successor:
+                await self.transfer_owner(successor.id)
+
+    async def transfer_owner(self, user_id):
+        self.owner = user_id
+        await self.broadcast('owner_transfer', user_id, self.room_id)
+
+    def _is_admin(self, participant):
+        return participant.id == self.owner
+
+    async def handle_event(self, participant, event, args):
+        """Dispatch one client event"""
+        self.stats[f"event:{event}"] += 1
+        data = args[0] if args else None
+
+        if event == 'me':
+            await self.reply(participant, 'me', {'user': {'id': participant.id, 'username': participant.username}})
+        elif event == 'get_room':
+            await self.reply(participant, 'update_room', self.room_data())
+            await self.reply(participant, 'joined_room')
+            if self._is_admin(participant):
+                await self.reply(participant, 'update_room_admin', self.admin_data())
+        elif event == 'message' and isinstance(data, dict):
+            await self.post_message(participant, data)
+        elif event == 'change_username' and isinstance(data, dict):
+            username = str(data.get('username', '')).strip()
+            if not username or len(username) > MAX_USERNAME:
+                await self.reply(participant, 'error', f"Username must be 1-{MAX_USERNAME} characters")
+                return
+            participant.username = username
+            self.stats['username_changes'] += 1
+            await self.broadcast('update_user', participant.id, {'username': username})
+        elif event == 'create_ban' and isinstance(data, dict):
+            if not (self._is_admin(participant) or participant.id in self.mods):
+                await self.reply(participant, 'error', "Only the room owner or moderators can ban")
+                return
+            target = self.users.get(data.get('userId'))
+            if target is None:
+                return
+            self.bans.append({'id': target.id, 'username': target.username})
+            self.stats['bans'] += 1
+            await self.kick(target)
+            owner = self.users.get(self.owner)
+            if owner:
+                await self.reply(owner, 'update_room_admin', self.admin_data())
+        elif event == 'update_mods' and isinstance(data, dict) and self._is_admin(participant):
+            self.mods = [user_id for user_id in data.get('mods', []) if user_id in self.users]
+            await self.broadcast('update_mods', self.mods)
+        elif event == 'update_room' and isinstance(data, dict) and self._is_admin(participant):
+            self.settings.update({k: v for k, v in data.items() if k not in ('id', 'users', 'mods', 'owner')})
+            await self.broadcast('update_room', self.room_data())
+        elif event == 'update_room_admin' and isinstance(data, dict) and self._is_admin(participant):
+            if isinstance(data.get('bans'), list):
+                self.bans = data['bans']
+            await self.reply(participant, 'update_room_admin', self.admin_data())
+        else:
+            self.stats['ignored_events'] += 1
+
+    async def post_message(self, participant, data):
+        """Apply the per-account rate limit and slow mode, then broadcast the message"""
+        if participant.id not in self.users:
+            return  # Kicked or banned
+        now = time.monotonic()
+        interval = MESSAGE_INTERVAL
+        if not (self._is_admin(participant) or participant.id in self.mods):
+            interval = max(interval, self.settings.get('slowModeSeconds') or 0)
+        if now - participant.last_message_at < interval:
+            self.stats['rate_limited'] += 1
+            await self.reply(participant, 'error', "You are sending messages too quickly")
+            return
+        participant.last_message_at = now
+        self.stats['messages'] += 1
+        await self.broadcast('message', {
+            'userId': participant.id,
+            'message': {
+                'text': str(data.get('text', ''))[:MAX_MESSAGE],
+                'characterId': data.get('characterId'),
+                'poseId': data.get('poseId'),
+            },
+        })
+
+    async def kick(self, participant):
+        if participant.websocket is not None:
+            await participant.websocket.close(code=4003, reason="Banned")
+        await self.leave(participant)
+
+
+class CourtroomEmulator:
+    """WebSocket server hosting any number of emulated rooms (created on first join)"""
+
+    def __init__(self, ping_interval=25000, ping_timeout=20000):
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.rooms = {}
+        self.stats = Counter()
+
+    def room(self, room_id):
+        if room_id not in self.rooms:
+            self.rooms[room_id] = EmulatedCourtroom(room_id, self.stats)
+        return self.rooms[room_id]
+
+    async def handle_connection(self, websocket, path=None):
+        """One client: Engine.IO/Socket.IO handshake, heartbeat, then events until it leaves"""
+        if path is None:
+            # websockets >= 13 exposes the request path on the connection
+            path = getattr(websocket, 'path', None) or websocket.request.path
+        query = parse_qs(urlsplit(path).query)
+        room = self.room(query.get('roomId', ['emulated'])[0])
+        username = query.get('username', ['Guest'])[0] or 'Guest'
+        if room.is_banned(username):
+            await websocket.close(code=4003, reason="Banned")
+            return
+
+        await websocket.send(EIO_OPEN + json_dumps({
+            'sid': uuid.uuid4().hex, 'upgrades': [], 'maxPayload': 1000000,
+            'pingInterval': self.ping_interval, 'pingTimeout': self.ping_timeout,
+        }))
+        try:
+            connect = await asyncio.wait_for(websocket.recv(), timeout=10)
+        except (asyncio.TimeoutError, websockets.exceptions.ConnectionClosed):
+            return
+        if not connect.startswith(EIO_MESSAGE + SIO_CONNECT):
+            await websocket.close(code=4000, reason="Expected Socket.IO connect")
+            return
+        await websocket.send(EIO_MESSAGE + SIO_CONNECT + json_dumps({'sid': uuid.uuid4().hex}))
+
+        participant = Participant(username, websocket)
+        self.stats['connections'] += 1
+        await room.join(participant)
+        heartbeat = asyncio.create_task(self._heartbeat(participant))
+        try:
+            async for frame in websocket:
+                self.stats['frames_in'] += 1
+                if frame == EIO_PONG:
+                    participant.awaiting_pong = False
+                    continue
+                try:
+                    _, event, args = decode_socketio_frame(frame)
+                except ValueError:
+                    self.stats['bad_frames'] += 1
+                    continue
+                if event is not None:
+                    await room.handle_event(participant, event, args)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            heartbeat.cancel()
+            await room.leave(participant)
+
+    async def _heartbeat(self, participant):
+        """Server-initiated pings; clients that miss a pong within ping_timeout are dropped"""
+        while True:
+            await asyncio.sleep(self.ping_interval / 1000)
+            participant.awaiting_pong = True
+            await participant.send(EIO_PING)
+            await asyncio.sleep(self.ping_timeout / 1000)
+            if participant.awaiting_pong:
+                self.stats['ping_timeouts'] += 1
+                await participant.websocket.close(code=4001, reason="Ping timeout")
+                return
+
+
+async def simulate_chatter(room, count, rate, churn):
+    """count simulated users, each sending about `rate` messages per second"""
+    async def chatty_user(n):
+        participant = Participant(f"Sim{n:03d}")
+        await room.join(participant)
+        while True:
+            await asyncio.sleep(random.expovariate(rate))
+            if participant.id not in room.users:
+                return  # Banned by the bot under test
+            if churn and random.random() < churn:
+                await room.leave(participant)
+                participant = Participant(f"Sim{n:03d}")
+                await room.join(participant)
+            text = " ".join(random.choices(WORDS, k=random.randint(2, 12)))
+            await room.post_message(participant, {'text': text})
+
+    await asyncio.gather(*(chatty_user(n) for n in range(count)))
+
+
+async def simulate_burst(room, count, after, spread=2.0):
+    """count users joining within `spread` seconds (a raid), after a delay"""
+    await asyncio.sleep(after)
+    print(f"🚨 Burst: {count} users joining {room.room_id}")
+    for n in range(count):
+        await room.join(Participant(f"Raider{n:03d}"))
+        await asyncio.sleep(spread / max(count, 1))
+
+
+async def report_stats(emulator, interval):
+    previous = Counter()
+    while True:
+        await asyncio.sleep(interval)
+        stats = emulator.stats
+        delta = {key: stats[key] - previous[key] for key in ('messages', 'frames_in', 'frames_out', 'rate_limited')}
+        previous = stats.copy()
+        users = sum(len(room.users) for room in emulator.rooms.values())
+        real = sum(1 for room in emulator.rooms.values() for p in room.users.values() if p.websocket is not None)
+        print(f"📊 rooms {len(emulator.rooms)} · users {users} ({real} connected) · "
+              f"msg/s {delta['messages'] / interval:.1f} · frames in/out {delta['frames_in'] / interval:.1f}/"
+              f"{delta['frames_out'] / interval:.1f} per s · rate-limited {delta['rate_limited']} · "
+              f"bans {stats['bans']} · username changes {stats['username_changes']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--room', default='emulated', help="room for simulated users (clients may join any room)")
+    parser.add_argument('--clients', type=int, default=0, help="number of simulated chatty users")
+    parser.add_argument('--rate', type=float, default=0.2, help="messages per second per simulated user")
+    parser.add_argument('--churn', type=float, default=0.0, help="chance a simulated user rejoins before a message")
+    parser.add_argument('--burst', type=int, default=0, help="users joining at once after --burst-after seconds")
+    parser.add_argument('--burst-after', type=float, default=10.0)
+    parser.add_argument('--ping-interval', type=int, default=25000, help="ms")
+    parser.add_argument('--ping-timeout', type=int, default=20000, help="ms")
+    parser.add_argument('--stats', type=float, default=10.0, help="seconds between stats lines")
+    args = parser.parse_args()
+
+    emulator = CourtroomEmulator(args.ping_interval, args.ping_timeout)
+    async with websockets.serve(emulator.handle_connection, args.host, args.port):
+        print(f"⚖️ Courtroom emulator on ws://{args.host}:{args.port}/courtroom-api/socket.io/")
+        tasks = [asyncio.create_task(report_stats(emulator, args.stats))]
+        room = emulator.room(args.room)
+        if args.clients and args.rate > 0:
+            tasks.append(asyncio.create_task(simulate_chatter(room, args.clients, args.rate, args.churn)))
+        if args.burst:
+            tasks.append(asyncio.create_task(simulate_burst(room, args.burst, args.burst_after)))
+        await asyncio.gather(*tasks)
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
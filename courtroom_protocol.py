@@ -0,0 +1,517 @@
+"""Shared objection.lol courtroom protocol client (Engine.IO v4 / Socket.IO over raw websockets).
+
+Used by both CourtBot (courtbot.py) and the AI courtroom bot (courtroom_bot(fm).py) so the
+handshake, heartbeat replies, frame decoding and event dispatch live in one place.
+"""
+import asyncio
+import contextvars
+import json
+import time
+
+import websockets
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Engine.IO packet types (first character of every WebSocket frame)
+EIO_OPEN = '0'
+EIO_CLOSE = '1'
+EIO_PING = '2'
+EIO_PONG = '3'
+EIO_MESSAGE = '4'
+# Socket.IO packet types (second character of an Engine.IO message)
+SIO_CONNECT = '0'
+SIO_EVENT = '2'
+
+_json_decoder = json.JSONDecoder()
+
+# Receive time of the frame whose handler is running in the current task
+_frame_received_at = contextvars.ContextVar('frame_received_at', default=None)
+
+# JSON codec for the WebSocket hot path: orjson when installed, stdlib otherwise.
+# Both raise json.JSONDecodeError (orjson.JSONDecodeError subclasses it) on bad input.
+if orjson is not None:
+    JSON_BACKEND = 'orjson'
+
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    json_loads = orjson.loads
+else:
+    JSON_BACKEND = 'json'
+    json_dumps = json.dumps
+    json_loads = json.loads
+
+
+def _decode_payload(frame, pos):
+    """Decode the JSON value starting at pos, ignoring any trailing data"""
+    if orjson is not None:
+        try:
+            return orjson.loads(frame[pos:])
+        except orjson.JSONDecodeError:
+            pass  # Usually trailing data after the array; let raw_decode find the end
+    payload, _ = _json_decoder.raw_decode(frame, pos)
+    return payload
+
+
+class CourtroomProtocolError(Exception):
+    """Raised when the server does not follow the expected handshake"""
+
+
+def decode_socketio_frame(frame):
+    """Decode a raw Engine.IO/Socket.IO frame in a single pass.
+
+    Returns (engine_io_type, event_name, args). event_name and args are only set for
+    Socket.IO EVENT packets (42...); any data after the JSON array is ignored.
+    Raises json.JSONDecodeError for malformed event payloads.
+    """
+    if not frame:
+        return None, None, ()
+    frame_type = frame[0]
+    if frame_type != EIO_MESSAGE or len(frame) < 2 or frame[1] != SIO_EVENT:
+        return frame_type, None, ()
+
+    # Skip optional namespace ("/nsp,") and ack id digits before the JSON array
+    pos = 2
+    if frame.startswith('/', pos):
+        comma = frame.find(',', pos)
+        pos = comma + 1 if comma != -1 else len(frame)
+    while pos < len(frame) and frame[pos].isdigit():
+        pos += 1
+
+    # raw_decode stops at the end of the array, so trailing data needs no bracket counting
+    payload = _decode_payload(frame, pos)
+    if not isinstance(payload, list) or not payload or not isinstance(payload[0], str):
+        return frame_type, None, ()
+    return frame_type, payload[0], payload[1:]
+
+
+def encode_event(event, *args):
+    """Encode a Socket.IO EVENT frame: 42["event",arg1,...]"""
+    return '42' + json_dumps([event, *args])
+
+
+class CourtroomProtocolClient:
+    """Async courtroom connection: handshake, heartbeat replies and event callbacks.
+
+    Handlers are registered per event name with a declared arity and a lane. The reader
+    only decodes frames, answers server pings and enqueues events; each lane has its own
+    worker task, so events in the same lane are handled in arrival order while a slow
+    handler in one lane never delays another lane or the heartbeat.
+    """
+    def __init__(self, ping_interval=25000, ping_timeout=20000, log=None):
+        self.websocket = None
+        self.ping_interval = ping_interval  # ms, replaced by the server handshake value
+        self.ping_timeout = ping_timeout    # ms, replaced by the server handshake value
+        self.handshake = {}
+        self.last_frame_at = None  # Monotonic time the last frame was received
+        self.last_ping_at = None   # Monotonic time the last server ping was received
+        self._handlers = {}  # event name -> (handler, arity, first arg type, lane)
+        self._lanes = {}  # lane name -> (asyncio.Queue, worker task)
+        self._room_refresh = None  # Future resolved once the next update_room has been handled
+        self._log = log or (lambda message: None)
+
+    def on(self, event, handler, arity=1, arg_type=None, lane='default'):
+        """Register an async event handler.
+
+        arity is the number of event arguments passed to the handler; frames with fewer
+        arguments are ignored. If arg_type is given, the first argument must be of that type.
+        Handlers sharing a lane run one at a time in frame order.
+        """
+        self._handlers[event] = (handler, arity, arg_type, lane)
+
+    def lane_depths(self):
+        """Number of events waiting in each handler lane"""
+        return {lane: queue.qsize() for lane, (queue, _) in self._lanes.items()}
+
+    async def connect(self, url, **connect_kwargs):
+        """Open the WebSocket and complete the Engine.IO/Socket.IO handshake.
+
+        Returns the parsed handshake data. Raises CourtroomProtocolError (after closing
+        the socket) if the server does not answer with the expected packets.
+        """
+        self.websocket = await websockets.connect(url, **connect_kwargs)
+        try:
+            initial_message = await self.websocket.recv()
+            self._log(f"📨 Received handshake: {initial_message}")
+            if not initial_message.startswith(EIO_OPEN):
+                raise CourtroomProtocolError(f"Unexpected initial message: {initial_message}")
+
+            try:
+                self.handshake = json_loads(initial_message[1:])
+                self.ping_interval = self.handshake.get('pingInterval', self.ping_interval)
+                self.ping_timeout = self.handshake.get('pingTimeout', self.ping_timeout)
+            except ValueError:
+                self.handshake = {}
+                self._log("⚠️ Could not parse handshake data, using defaults")
+
+            # Socket.IO connect to the default namespace
+            await self.websocket.send(EIO_MESSAGE + SIO_CONNECT)
+            response = await self.websocket.recv()
+            self._log(f"📨 Server response: {response}")
+            if not response.startswith(EIO_MESSAGE + SIO_CONNECT):
+                raise CourtroomProtocolError(f"Unexpected response after handshake: {response}")
+        except Exception:
+            await self.close()
+            raise
+
+        self.last_frame_at = self.last_ping_at = time.monotonic()
+        return self.handshake
+
+    def adopt(self, other):
+        """Take over another client's live, handshaked connection (hot-standby promotion).
+
+        Both clients' lane workers are stopped (anything still queued came from the old
+        sockets); the other client's socket now belongs to this client.
+        """
+        self._stop_lanes()
+        self.websocket, other.websocket = other.websocket, None
+        self.ping_interval = other.ping_interval
+        self.ping_timeout = other.ping_timeout
+        self.handshake = other.handshake
+        self.last_frame_at = other.last_frame_at
+        self.last_ping_at = other.last_ping_at
+        other._stop_lanes()
+
+    async def handle_frame(self, frame):
+        """Answer heartbeats and queue one frame's event for its handler lane"""
+        frame_type, event, args = decode_socketio_frame(frame)
+
+        if frame_type == EIO_PING:
+            # Server pings must be answered quickly or the connection will be closed
+            self.last_ping_at = time.monotonic()
+            await self.websocket.send(EIO_PONG)
+            self._log("📡 Received ping, sent pong")
+            return
+        if frame_type == EIO_PONG:
+            self._log("📡 Received pong")
+            return
+        if event is None:
+            return
+
+        entry = self._handlers.get(event)
+        if entry is None:
+            if event == 'update_room':
+                self._resolve_room_refresh()
+            return  # No handler registered for this event
+        handler, arity, arg_type, lane = entry
+        if len(args) < arity or (arg_type is not None and not isinstance(args[0], arg_type)):
+            if event == 'update_room':
+                self._resolve_room_refresh()
+            return
+
+        item = (event, handler, args[:arity], self.last_frame_at or time.monotonic())
+        self._lane_queue(lane).put_nowait(item)
+
+    def _lane_queue(self, lane):
+        """Queue for a lane, starting its worker on first use"""
+        entry = self._lanes.get(lane)
+        if entry is None or entry[1].done():
+            queue = entry[0] if entry else asyncio.Queue()
+            worker = asyncio.create_task(self._lane_worker(lane, queue))
+            entry = self._lanes[lane] = (queue, worker)
+        return entry[0]
+
+    async def _lane_worker(self, lane, queue):
+        """Run one lane's handlers sequentially, in the order their frames arrived"""
+        while True:
+            event, handler, args, received_at = await queue.get()
+            _frame_received_at.set(received_at)
+            try:
+                await handler(*args)
+            except Exception as e:
+                print(f"❌ Error in {event} handler ({lane} lane): {e}")
+            finally:
+                if event == 'update_room':
+                    self._resolve_room_refresh()
+                queue.task_done()
+
+    def heartbeat_deadline(self):
+        """Seconds of silence after which the server would have dropped us (pingInterval + pingTimeout)"""
+        return (self.ping_interval + self.ping_timeout) / 1000
+
+    def silence(self):
+        """Seconds since the last frame of any kind (including server pings) was received"""
+        if self.last_frame_at is None:
+            return 0.0
+        return time.monotonic() - self.last_frame_at
+
+    @staticmethod
+    def frame_received_at():
+        """Receive time of the frame being handled by the calling task (None outside handlers)"""
+        return _frame_received_at.get()
+
+    async def request_room_refresh(self):
+        """Ask for fresh room state without waiting for it.
+
+        Returns a future that resolves after the next update_room has been handled. Callers
+        that ask while a refresh is already outstanding share it instead of sending another
+        get_room.
+        """
+        future = self._room_refresh
+        if future is None or future.done():
+            future = self._room_refresh = asyncio.get_running_loop().create_future()
+            try:
+                await self.send_event('get_room')
+            except Exception:
+                self._room_refresh = None
+                future.set_result(False)
+                raise
+        return future
+
+    def _resolve_room_refresh(self):
+        future, self._room_refresh = self._room_refresh, None
+        if future is not None and not future.done():
+            future.set_result(True)
+
+    async def run(self, frame_handler=None):
+        """Read frames until the socket closes (ConnectionClosed propagates to the caller).
+
+        frame_handler defaults to handle_frame; bots pass a wrapper that adds their own
+        logging and error handling around it. Handlers themselves run in lane workers.
+        """
+        frame_handler = frame_handler or self.handle_frame
+        async for frame in self.websocket:
+            self.last_frame_at = time.monotonic()
+            await frame_handler(frame)
+
+    async def send_event(self, event, *args):
+        """Emit a Socket.IO event"""
+        await self.websocket.send(encode_event(event, *args))
+
+    async def send_ping(self):
+        """Send a client-initiated Engine.IO ping"""
+        await self.websocket.send(EIO_PING)
+
+    def _stop_lanes(self):
+        """Cancel the lane workers, dropping their queued events, and fail any pending refresh"""
+        for queue, worker in self._lanes.values():
+            worker.cancel()
+        self._lanes.clear()
+        future, self._room_refresh = self._room_refresh, None
+        if future is not None and not future.done():
+            future.set_result(False)
+
+    async def close(self):
+        # Events from a dead connection are stale - drop them with their workers
+        self._stop_lanes()
+        if self.websocket:
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
+
+
+class BoundedExecutor:
+    """Runs heavy handler work as background tasks with a concurrency cap.
+
+    submit() never blocks the caller; once max_pending tasks are queued or running, new
+    work is rejected so a command flood can't grow memory or starve the event loop.
+    """
+    def __init__(self, name, max_concurrent=4, max_pending=32):
+        self.name = name
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._tasks = set()
+        self.rejected = 0
+
+    def submit(self, coro):
+        """Schedule a coroutine; returns False (and closes it) if the executor is full"""
+        if len(self._tasks) >= self.max_pending:
+            coro.close()
+            self.rejected += 1
+            print(f"⚠️ {self.name} executor full ({self.max_pending} pending) - dropping task")
+            return False
+        task = asyncio.create_task(self._run(coro))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, coro):
+        async with self._semaphore:
+            try:
+                await coro
+            except Exception as e:
+                print(f"❌ Error in {self.name} task: {e}")
+
+    @property
+    def pending(self):
+        return len(self._tasks)
+
+    def cancel_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+
+class RoomUser:
+    """One courtroom user (kept small: rooms can hold many spectators)"""
+    __slots__ = ('id', 'username', 'key')
+
+    def __init__(self, user_id, username):
+        self.id = user_id
+        self.username = username
+        self.key = username.casefold()
+
+
+class RoomState:
+    """Courtroom users, moderators and bans with O(1) lookups.
+
+    Behaves like a dict of user ID -> username for reading and simple writes, and keeps a
+    case-insensitive username -> user ID index in step with every change. Room updates
+    are applied as deltas against the current users instead of rebuilding everything.
+    """
+    def __init__(self):
+        self.users = {}     # user ID -> RoomUser
+        self._by_name = {}  # casefolded username -> {user ID: None} (names aren't unique)
+        self.mods = set()   # Moderator user IDs
+        self._bans = {}     # user ID -> ban record as sent by the server ({"id", "username", ...})
+        self.provisional = False  # True while holding a restored snapshot not yet confirmed by the server
+        self.on_change = None  # Optional callable invoked after any change (e.g. to persist a snapshot)
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    # Mapping interface: user ID -> username
+    def get(self, user_id, default=None):
+        user = self.users.get(user_id)
+        return user.username if user is not None else default
+
+    def __getitem__(self, user_id):
+        return self.users[user_id].username
+
+    def __setitem__(self, user_id, username):
+        self.add(user_id, username)
+
+    def __delitem__(self, user_id):
+        if self.remove(user_id) is None:
+            raise KeyError(user_id)
+
+    def __contains__(self, user_id):
+        return user_id in self.users
+
+    def __len__(self):
+        return len(self.users)
+
+    def __iter__(self):
+        return iter(self.users)
+
+    def keys(self):
+        return self.users.keys()
+
+    def values(self):
+        return [user.username for user in self.users.values()]
+
+    def items(self):
+        return [(user_id, user.username) for user_id, user in self.users.items()]
+
+    # Incremental updates
+    def add(self, user_id, username):
+        """Add or rename a user; returns the previous username (None if new)"""
+        user = self.users.get(user_id)
+        if user is not None:
+            if user.username == username:
+                return username
+            old_username = user.username
+            self._unindex(user)
+            user.username, user.key = username, username.casefold()
+        else:
+            old_username = None
+            user = self.users[user_id] = RoomUser(user_id, username)
+        self._by_name.setdefault(user.key, {})[user_id] = None
+        self._changed()
+        return old_username
+
+    def remove(self, user_id):
+        """Remove a user; returns their username (None if unknown)"""
+        user = self.users.pop(user_id, None)
+        if user is None:
+            return None
+        self._unindex(user)
+        self._changed()
+        return user.username
+
+    def apply_users(self, users):
+        """Apply an authoritative user list (update_room) as a delta.
+
+        users is an iterable of {"id", "username", ...} dicts. Returns (added, removed,
+        renamed): dicts of user ID -> username, user ID -> username and
+        user ID -> (old, new).
+        """
+        incoming = {user['id']: user['username'] for user in users}
+        removed = {user_id: self.users[user_id].username for user_id in self.users.keys() - incoming.keys()}
+        added, renamed = {}, {}
+        # One on_change for the whole batch rather than one per user
+        on_change, self.on_change = self.on_change, None
+        try:
+            for user_id in removed:
+                self.remove(user_id)
+            for user_id, username in incoming.items():
+                old_username = self.add(user_id, username)
+                if old_username is None:
+                    added[user_id] = username
+                elif old_username != username:
+                    renamed[user_id] = (old_username, username)
+        finally:
+            self.on_change = on_change
+        was_provisional, self.provisional = self.provisional, False  # Authoritative user list from the server
+        if added or removed or renamed or was_provisional:
+            self._changed()
+        return added, removed, renamed
+
+    def id_for(self, username):
+        """User ID for a username (case-insensitive), or None"""
+        ids = self._by_name.get(username.casefold())
+        return next(iter(ids)) if ids else None
+
+    def _unindex(self, user):
+        ids = self._by_name.get(user.key)
+        if ids is not None:
+            ids.pop(user.id, None)
+            if not ids:
+                del self._by_name[user.key]
+
+    # Moderators and bans
+    def set_mods(self, mod_ids):
+        self.mods = set(mod_ids)
+        self._changed()
+
+    def add_mod(self, user_id):
+        self.mods.add(user_id)
+        self._changed()
+
+    @property
+    def bans(self):
+        """Ban records in server order"""
+        return list(self._bans.values())
+
+    def set_bans(self, bans):
+        self._bans = {ban.get('id'): ban for ban in bans if isinstance(ban, dict)}
+        self._changed()
+
+    def ban_for(self, user_id):
+        """Ban record for a user ID, or None if not banned"""
+        return self._bans.get(user_id)
+
+    # Snapshots
+    def to_snapshot(self):
+        return {
+            'users': [{'id': user.id, 'username': user.username} for user in self.users.values()],
+            'mods': list(self.mods),
+            'bans': self.bans,
+        }
+
+    def load_snapshot(self, snapshot):
+        """Restore users, mods and bans as provisional state (replaced by the next update_room)"""
+        on_change, self.on_change = self.on_change, None
+        try:
+            for user in snapshot.get('users', []):
+                if isinstance(user, dict) and user.get('id') and user.get('username'):
+                    self.add(user['id'], user['username'])
+            self.set_mods(snapshot.get('mods', []))
+            self.set_bans(snapshot.get('bans', []))
+        finally:
+            self.on_change = on_change
+        self.provisional = bool(self.users)
@@ -0,0 +1,229 @@
+"""Relay health metrics in Prometheus text format, served from an optional local HTTP endpoint,
+plus the event-loop lag monitor.
+
+Counters are plain dict increments keyed by the full series name (labels included), so
+recording on the relay path costs one dict update. Gauges are callables that are only
+evaluated when /metrics is scraped.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+
+from aiohttp import web
+
+
+class Metrics:
+    """Counter and gauge registry rendered as Prometheus exposition text"""
+
+    def __init__(self):
+        self.counters = {}  # 'name{label="x"}' -> value
+        self.gauges = {}  # 'name{label="x"}' -> zero-argument callable
+        self.help = {}  # base name -> (type, help text)
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, series, amount=1):
+        self.counters[series] = self.counters.get(series, 0) + amount
+
+    def gauge(self, series, func):
+        self.gauges[series] = func
+
+    def render(self):
+        """Prometheus text exposition of every series, grouped by metric name"""
+        series = {}
+        for name, value in self.counters.items():
+            series.setdefault(name.split('{', 1)[0], []).append((name, value))
+        for name, func in self.gauges.items():
+            try:
+                value = func()
+            except Exception:
+                continue  # A gauge whose owner isn't ready yet is just left out
+            if value is not None:
+                series.setdefault(name.split('{', 1)[0], []).append((name, value))
+        lines = []
+        for base in sorted(series):
+            kind, text = self.help.get(base, ('untyped', ''))
+            if text:
+                lines.append(f"# HELP {base} {text}")
+            lines.append(f"# TYPE {base} {kind}")
+            for name, value in series[base]:
+                lines.append(f"{name} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+class LoopMonitor:
+    """Samples event-loop lag and names the code that blocked the loop.
+
+    A task sleeps `interval` seconds and records how late it wakes up. A watcher thread
+    notices when that task is overdue by more than `slow_threshold` and captures the loop
+    thread's stack while it is still stuck, so the blocking function is known without
+    timing every callback. With debug=True asyncio's own debug mode is enabled as well
+    and its slow-callback reports (which name the handle/coroutine) are recorded too;
+    that mode slows every callback down, so it is off by default.
+    """
+
+    def __init__(self, interval=0.25, slow_threshold=0.1, debug=False):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.debug = debug
+        self.last = 0.0
+        self.max = 0.0
+        self.stalls = 0
+        self.offenders = {}  # label -> [count, worst seconds, total seconds]
+        self._beat = None
+        self._suspect = None  # Label captured by the watcher during the current stall
+        self._loop_thread_id = None
+        self._task = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self._own_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def start(self):
+        """Start sampling on the running loop (idempotent)"""
+        if self._task and not self._task.done():
+            return
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._watcher = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watcher.start()
+        if self.debug:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.slow_threshold
+            logging.getLogger('asyncio').addHandler(_SlowCallbackRecorder(self))
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _sample(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._beat = now
+            self.last = max(0.0, now - start - self.interval)
+            self.max = max(self.max, self.last)
+            if self.last >= self.slow_threshold:
+                self.stalls += 1
+                metrics.inc('courtbot_event_loop_stalls_total')
+                self.record(self._suspect or "unknown (stall ended before it was sampled)", self.last)
+            self._suspect = None
+
+    def _watch(self):
+        """Watcher thread: grab the loop thread's stack while the loop is stuck"""
+        poll = min(self.interval, self.slow_threshold) / 2
+        captured_for = None
+        while not self._stop.wait(poll):
+            beat = self._beat
+            if beat is None or beat == captured_for:
+                continue
+            if time.perf_counter() - beat > self.interval + self.slow_threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._suspect = self._describe(frame)
+                    captured_for = beat
+
+    def _describe(self, frame):
+        """Innermost frame in our own code (the caller of whatever library call blocked)"""
+        innermost = frame
+        while frame is not None:
+            code = frame.f_code
+            if os.path.dirname(os.path.abspath(code.co_filename)) == self._own_dir:
+                return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+            frame = frame.f_back
+        code = innermost.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{innermost.f_lineno})"
+
+    def record(self, label, seconds):
+        entry = self.offenders.setdefault(label, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] = max(entry[1], seconds)
+        entry[2] += seconds
+        if len(self.offenders) > 50:
+            # Keep the table bounded: drop the mildest offender
+            del self.offenders[min(self.offenders, key=lambda k: self.offenders[k][1])]
+
+    def worst(self, n=5):
+        """[(label, count, worst, total)] sorted by worst single stall"""
+        rows = [(label, *entry) for label, entry in self.offenders.items()]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows[:n]
+
+    def summary_lines(self, n=5):
+        lines = [f"Lag: last {self.last * 1000:.0f}ms · max {self.max * 1000:.0f}ms · "
+                 f"{self.stalls} stall(s) ≥{self.slow_threshold * 1000:.0f}ms"]
+        for label, count, worst, total in self.worst(n):
+            lines.append(f"{label}: worst {worst * 1000:.0f}ms ×{count}")
+        return lines
+
+
+class _SlowCallbackRecorder(logging.Handler):
+    """Records asyncio debug mode's 'Executing <handle> took N seconds' warnings"""
+
+    def __init__(self, monitor):
+        super().__init__(level=logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record):
+        if record.msg.startswith('Executing') and len(record.args or ()) == 2:
+            handle, seconds = record.args
+            self.monitor.record(f"asyncio: {str(handle)[:120]}", seconds)
+
+
+class RateLimitLogCounter(logging.Handler):
+    """Counts discord.py's 429 warnings (the library retries them internally, so they
+    never reach our code as exceptions)"""
+
+    def __init__(self, metrics):
+        super().__init__(level=logging.WARNING)
+        self.metrics = metrics
+
+    def emit(self, record):
+        message = record.msg if isinstance(record.msg, str) else str(record.msg)
+        if '429' in message or 'rate limit' in message.lower():
+            self.metrics.inc('courtbot_discord_rate_limited_total')
+        # Attaching a handler disables logging's last-resort stderr output for this logger;
+        # keep printing warnings as before when nothing else is configured
+        if not logging.getLogger().handlers and logging.lastResort:
+            logging.lastResort.handle(record)
+
+
+metrics = Metrics()
+metrics.describe('courtbot_messages_relayed_total', 'counter', "Messages relayed, by direction")
+metrics.describe('courtbot_username_changes_total', 'counter', "Confirmed bot username changes")
+metrics.describe('courtbot_asset_api_calls_total', 'counter', "objection.lol asset API requests, by asset kind")
+metrics.describe('courtbot_relay_profile_cache_total', 'counter', "Relay identity cache lookups, by result")
+metrics.describe('courtbot_discord_rest_calls_total', 'counter', "Discord REST API requests")
+metrics.describe('courtbot_discord_rate_limited_total', 'counter', "Discord 429 responses (retried by discord.py)")
+metrics.describe('courtbot_reconnects_total', 'counter', "Successful reconnects, by kind")
+metrics.describe('courtbot_queue_depth', 'gauge', "Items waiting in the relay queues")
+metrics.describe('courtbot_connected', 'gauge', "1 while the courtroom WebSocket is connected")
+metrics.describe('courtbot_event_loop_lag_seconds', 'gauge', "Event-loop lag (last sample and max since start)")
+metrics.describe('courtbot_event_loop_stalls_total', 'counter', "Event-loop stalls above the slow threshold")
+
+loop_monitor = LoopMonitor()
+metrics.gauge('courtbot_event_loop_lag_seconds{stat="last"}', lambda: loop_monitor.last)
+metrics.gauge('courtbot_event_loop_lag_seconds{stat="max"}', lambda: loop_monitor.max)
+
+
+async def start_metrics_server(host, port):
+    """Serve GET /metrics on host:port. Returns the runner."""
+    async def handle_metrics(request):
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.getLogger('discord.http').addHandler(RateLimitLogCounter(metrics))
+    return runner
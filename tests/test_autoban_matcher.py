@@ -0,0 +1,76 @@
+import pytest
+
+pytest.importorskip("discord")
+pytest.importorskip("aioconsole")
+
+import courtbot
+from courtbot import AutobanMatcher
+
+needs_re2 = pytest.mark.skipif(courtbot.re2 is None, reason="google-re2 not installed")
+
+
+@pytest.fixture
+def without_re2(monkeypatch):
+    monkeypatch.setattr(courtbot, 're2', None)
+
+
+@needs_re2
+def test_literal_pattern_matches_substring():
+    matcher = AutobanMatcher(['spam'])
+    assert matcher.match('xXSpAmBotXx') == 'spam'
+    assert matcher.match('Phoenix') is None
+
+
+def test_literal_pattern_without_re2(without_re2):
+    matcher = AutobanMatcher(['spam', 'Bad Word'])
+    assert matcher.match('xXSpAmBotXx') == 'spam'
+    assert matcher.match('a bad word here') == 'Bad Word'
+    assert matcher.match('Phoenix') is None
+    assert matcher.skipped == []
+    assert AutobanMatcher.check_pattern('spam') is None
+
+
+@needs_re2
+def test_regex_pattern():
+    matcher = AutobanMatcher([r'^bot\d+$', 'troll'])
+    assert matcher.match('BOT123') == r'^bot\d+$'
+    assert matcher.match('bot123x') is None
+    assert matcher.match('TrollFace') == 'troll'
+    assert AutobanMatcher.check_pattern(r'^bot\d+$') is None
+
+
+def test_regex_pattern_is_disabled_without_re2(without_re2):
+    matcher = AutobanMatcher([r'^bot\d+$', 'troll'])
+    assert matcher.skipped == [r'^bot\d+$']
+    assert matcher.match('bot123') is None
+    assert matcher.match('TrollFace') == 'troll'
+    assert AutobanMatcher.check_pattern(r'^bot\d+$') is not None
+
+
+@pytest.mark.parametrize('use_re2', [
+    pytest.param(True, marks=needs_re2),
+    False,
+])
+def test_invalid_regex_falls_back_to_exact_match(use_re2, monkeypatch):
+    if not use_re2:
+        monkeypatch.setattr(courtbot, 're2', None)
+    matcher = AutobanMatcher(['bad[name'])
+    assert matcher.match('BAD[NAME') == 'bad[name'
+    assert matcher.match('very bad[name') is None
+    assert AutobanMatcher.check_pattern('bad[name').startswith("Invalid regex pattern")
+
+
+@needs_re2
+def test_re2_unsupported_construct_is_skipped():
+    matcher = AutobanMatcher([r'(a)\1', 'spam'])
+    assert matcher.skipped == [r'(a)\1']
+    assert matcher.match('aa') is None
+    assert matcher.match('spammer') == 'spam'
+    assert 'not supported by the re2 engine' in AutobanMatcher.check_pattern(r'(?=a)a')
+
+
+@needs_re2
+def test_patterns_sharing_a_group_name_are_matched_one_at_a_time():
+    matcher = AutobanMatcher([r'(?P<x>foo)', r'(?P<x>bar)'])
+    assert matcher.match('xbarx') == r'(?P<x>bar)'
+    assert matcher.match('FOO') == r'(?P<x>foo)'
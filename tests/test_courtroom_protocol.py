@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+pytest.importorskip("websockets")
+
+import courtroom_protocol
+from courtroom_protocol import decode_socketio_frame, encode_event
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request, monkeypatch):
+    """Run each decode test with orjson (when installed) and with the stdlib fallback"""
+    if request.param == 'orjson':
+        if courtroom_protocol.orjson is None:
+            pytest.skip("orjson not installed")
+    else:
+        monkeypatch.setattr(courtroom_protocol, 'orjson', None)
+    return request.param
+
+
+def test_event_frame(backend):
+    frame = '42["message",{"userId":"u1","message":{"text":"hi"}}]'
+    assert decode_socketio_frame(frame) == ('4', 'message', [{'userId': 'u1', 'message': {'text': 'hi'}}])
+
+
+def test_encode_round_trip():
+    frame = encode_event('update_user', 'u1', {'username': 'Phoenix'})
+    assert frame.startswith('42[')
+    assert decode_socketio_frame(frame) == ('4', 'update_user', ['u1', {'username': 'Phoenix'}])
+
+
+def test_event_with_several_args(backend):
+    assert decode_socketio_frame('42["update_user","u1",{"username":"Phoenix"}]') == \
+        ('4', 'update_user', ['u1', {'username': 'Phoenix'}])
+
+
+def test_namespace_and_ack_id_are_skipped(backend):
+    assert decode_socketio_frame('42/court,17["user_left","u1"]') == ('4', 'user_left', ['u1'])
+
+
+def test_trailing_data_after_array_is_ignored(backend):
+    assert decode_socketio_frame('42["user_left","u1"]\x1e42["ignored"]') == ('4', 'user_left', ['u1'])
+    assert decode_socketio_frame('42["me",{"user":{"id":"a]"}}] trailing') == ('4', 'me', [{'user': {'id': 'a]'}}])
+
+
+def test_non_event_frames(backend):
+    assert decode_socketio_frame('2') == ('2', None, ())
+    assert decode_socketio_frame('3') == ('3', None, ())
+    assert decode_socketio_frame('40{"sid":"abc"}') == ('4', None, ())
+    assert decode_socketio_frame('') == (None, None, ())
+
+
+def test_payloads_without_an_event_name(backend):
+    assert decode_socketio_frame('42[]') == ('4', None, ())
+    assert decode_socketio_frame('42[1,2]') == ('4', None, ())
+    assert decode_socketio_frame('42{"event":"message"}') == ('4', None, ())
+
+
+@pytest.mark.parametrize('frame', ['42', '42["message",', '42["message"', '42not json', '42/court,'])
+def test_malformed_event_frames_raise(backend, frame):
+    with pytest.raises(json.JSONDecodeError):
+        decode_socketio_frame(frame)
@@ -0,0 +1,101 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+pytest.importorskip("discord")
+pytest.importorskip("aioconsole")
+
+from courtbot import PreferenceStore
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    # Keep the one-time JSON migration away from any real data files
+    monkeypatch.setattr(PreferenceStore, 'LEGACY_FILES', {})
+    return str(tmp_path / "preferences.db")
+
+
+def test_flush_persists_changes(db_path):
+    async def scenario():
+        store = PreferenceStore(path=db_path, write_delay=60)
+        store.put('nicknames', '1', 'Phoenix')
+        store.put('colors', '1', 'F77337')
+        await store.flush()
+        reopened = PreferenceStore(path=db_path)
+        assert reopened.load('nicknames') == {'1': 'Phoenix'}
+        assert reopened.load('colors') == {'1': 'F77337'}
+        reopened.close()
+        store.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_writes_queued_changes(db_path):
+    async def scenario():
+        store = PreferenceStore(path=db_path, write_delay=60)
+        store.put('nicknames', '1', 'Phoenix')
+        store.put('nicknames', '1', 'Nick')  # Later change to the same row wins
+        store.put('autobans', 'spam')
+        store.close()
+
+    asyncio.run(scenario())
+    store = PreferenceStore(path=db_path)
+    assert store.load('nicknames') == {'1': 'Nick'}
+    assert store.load_list('autobans') == ['spam']
+    store.close()
+
+
+def test_without_an_event_loop_changes_are_written_immediately(db_path):
+    store = PreferenceStore(path=db_path)
+    store.put('characters', '1', {'character_id': 5, 'pose_id': 2})
+    reopened = PreferenceStore(path=db_path)
+    assert reopened.load('characters') == {'1': {'character_id': 5, 'pose_id': 2}}
+    reopened.close()
+    store.close()
+
+
+def test_delete_and_clear(db_path):
+    store = PreferenceStore(path=db_path)
+    for key in ('1', '2', '3'):
+        store.put('nicknames', key, f'user{key}')
+    store.put('colors', '1', 'F77337')
+    store.close()
+
+    async def scenario():
+        store = PreferenceStore(path=db_path, write_delay=60)
+        store.delete('nicknames', '2')
+        store.clear('colors')
+        store.put('colors', '2', '00FF00')  # Queued after the clear, so it survives it
+        store.close()
+
+    asyncio.run(scenario())
+    store = PreferenceStore(path=db_path)
+    assert store.load('nicknames') == {'1': 'user1', '3': 'user3'}
+    assert store.load('colors') == {'2': '00FF00'}
+    store.close()
+
+
+def test_put_during_inflight_flush_is_written(db_path):
+    """A change made while a batch is being committed gets written by a later pass"""
+    async def scenario():
+        store = PreferenceStore(path=db_path, write_delay=0.01)
+        # Another connection holds the write lock, so the first batch waits inside its commit
+        blocker = sqlite3.connect(db_path, isolation_level=None)
+        blocker.execute("BEGIN IMMEDIATE")
+        store.put('nicknames', '1', 'first')
+        await asyncio.sleep(0.2)
+        store.put('nicknames', '2', 'second')
+        blocker.execute("COMMIT")
+        blocker.close()
+
+        reopened = PreferenceStore(path=db_path)
+        for _ in range(200):
+            if reopened.load('nicknames') == {'1': 'first', '2': 'second'}:
+                break
+            await asyncio.sleep(0.01)
+        assert reopened.load('nicknames') == {'1': 'first', '2': 'second'}
+        reopened.close()
+        store.close()
+
+    asyncio.run(scenario())
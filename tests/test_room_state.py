@@ -0,0 +1,113 @@
+import pytest
+
+pytest.importorskip("websockets")
+
+from courtroom_protocol import RoomState
+
+
+def users(*pairs):
+    return [{'id': user_id, 'username': username} for user_id, username in pairs]
+
+
+def test_apply_users_reports_added_removed_and_renamed():
+    room = RoomState()
+    assert room.apply_users(users(('u1', 'Phoenix'), ('u2', 'Maya'))) == \
+        ({'u1': 'Phoenix', 'u2': 'Maya'}, {}, {})
+
+    added, removed, renamed = room.apply_users(users(('u1', 'Nick'), ('u3', 'Edgeworth')))
+    assert added == {'u3': 'Edgeworth'}
+    assert removed == {'u2': 'Maya'}
+    assert renamed == {'u1': ('Phoenix', 'Nick')}
+    assert dict(room.items()) == {'u1': 'Nick', 'u3': 'Edgeworth'}
+
+
+def test_apply_users_clears_provisional_state():
+    room = RoomState()
+    room.load_snapshot({'users': users(('u1', 'Phoenix'))})
+    assert room.provisional
+    room.apply_users(users(('u1', 'Phoenix')))
+    assert not room.provisional
+
+
+def test_id_for_is_case_insensitive_and_follows_renames():
+    room = RoomState()
+    room['u1'] = 'Phoenix'
+    assert room.id_for('phoenix') == 'u1'
+    assert room.id_for('PHOENIX') == 'u1'
+
+    room['u1'] = 'Nick'
+    assert room.id_for('Phoenix') is None
+    assert room.id_for('nick') == 'u1'
+
+    del room['u1']
+    assert room.id_for('Nick') is None
+    assert room.id_for('nobody') is None
+
+
+def test_id_for_with_duplicate_names():
+    room = RoomState()
+    room['u1'] = 'Maya'
+    room['u2'] = 'maya'
+    assert room.id_for('MAYA') in ('u1', 'u2')
+    room.remove('u1')
+    assert room.id_for('Maya') == 'u2'
+
+
+def test_set_bans_and_ban_for():
+    room = RoomState()
+    room.set_bans([{'id': 'u1', 'username': 'Larry'}, 'not a ban', {'id': 'u2', 'username': 'Oldbag'}])
+    assert room.ban_for('u1') == {'id': 'u1', 'username': 'Larry'}
+    assert room.ban_for('u3') is None
+    assert [ban['id'] for ban in room.bans] == ['u1', 'u2']
+
+    room.set_bans([{'id': 'u2', 'username': 'Oldbag'}])
+    assert room.ban_for('u1') is None
+    assert room.ban_for('u2') is not None
+
+
+def test_snapshot_round_trip():
+    room = RoomState()
+    room.apply_users(users(('u1', 'Phoenix'), ('u2', 'Maya')))
+    room.set_mods(['u1'])
+    room.set_bans([{'id': 'u9', 'username': 'Larry'}])
+
+    restored = RoomState()
+    changes = []
+    restored.on_change = lambda: changes.append(1)
+    restored.load_snapshot(room.to_snapshot())
+
+    assert dict(restored.items()) == {'u1': 'Phoenix', 'u2': 'Maya'}
+    assert restored.mods == {'u1'}
+    assert restored.ban_for('u9') == {'id': 'u9', 'username': 'Larry'}
+    assert restored.id_for('maya') == 'u2'
+    assert restored.provisional
+    assert changes == []  # Restoring a snapshot doesn't trigger a re-save
+
+
+def test_load_snapshot_skips_malformed_users():
+    room = RoomState()
+    room.load_snapshot({'users': [{'id': 'u1'}, 'junk', {'id': 'u2', 'username': 'Maya'}]})
+    assert dict(room.items()) == {'u2': 'Maya'}
+
+
+def test_apply_users_notifies_once_per_batch():
+    room = RoomState()
+    changes = []
+    room.on_change = lambda: changes.append(room.provisional)
+    room.apply_users(users(('u1', 'Phoenix'), ('u2', 'Maya'), ('u3', 'Edgeworth')))
+    assert changes == [False]
+
+    room.apply_users(users(('u1', 'Phoenix'), ('u2', 'Maya'), ('u3', 'Edgeworth')))
+    assert changes == [False]  # No change, no notification
+
+    room.apply_users(users(('u1', 'Nick'), ('u4', 'Gumshoe')))
+    assert changes == [False, False]
+
+
+def test_apply_users_notifies_when_confirming_a_snapshot():
+    room = RoomState()
+    room.load_snapshot({'users': users(('u1', 'Phoenix'))})
+    changes = []
+    room.on_change = lambda: changes.append(room.provisional)
+    room.apply_users(users(('u1', 'Phoenix')))
+    assert changes == [False]